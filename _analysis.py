@@ -0,0 +1,357 @@
+"""
+One decode, several analyses (analyze-audio, and the silence tools' level mode).
+
+Silence detection, loudness measurement and a waveform for the web player used
+to be three full decodes of the same file. Here ffmpeg decodes once to 48 kHz
+float PCM on a pipe (mono stays mono, more than two channels are downmixed to
+stereo) and every block of BLOCK_SECONDS is fed to four analyzers, each working
+on the whole block at once with NumPy:
+
+  silence   runs of samples whose level is below each threshold on every
+            channel (what silencedetect does), at least MIN_SILENCE long
+  loudness  integrated loudness, ITU-R BS.1770-4: K-weighted mean square per
+            100 ms sub-block, 400 ms blocks with 75% overlap, absolute gate
+            -70 LUFS and relative gate -10 LU. The K-weighting is applied as
+            its magnitude response to the FFT of each sub-block (Parseval), not
+            as a running IIR filter. On the 30 sample MP3s of the repo it came
+            within 0.14 LU of the same gating over the IIR-filtered signal
+            (28 of them within 0.01 LU); "mediatools --check-loudness" compares
+            it with ffmpeg's ebur128 meter
+  peaks     min/max per pixel of PEAKS_PER_SECOND, 8-bit, in the layout of
+            audiowaveform's JSON ("data": [min0, max0, min1, max1, ...]), so
+            waveform players read it as is. One envelope for all channels
+            ("channels": 1): the lowest minimum and highest maximum of any
+            channel, i.e. the loudest one. This matches the silence rule: a
+            pixel within a threshold means every channel is
+  clipping  sample peak, samples at or above CLIP_LEVEL and the number of
+            clipped stretches
+
+Results go to <base>.analysis.json next to the media, tied to the file's size
+and mtime. detect_silence/SilenceScan (level mode, numeric threshold) take
+their silences from there instead of decoding again when the file is current,
+the threshold was analysed and silence_duration >= MIN_SILENCE.
+
+NumPy is optional: only writing an analysis needs it.
+"""
+import json
+import math
+import os
+import subprocess
+
+from _ffmpeg_config import get_ffmpeg, get_ffprobe, thread_args
+from _segments import SegmentList
+
+VERSION = 1
+SAMPLE_RATE = 48000
+BLOCK_SECONDS = 10            # PCM read and analysed per batch
+THRESHOLDS = (-30.0,)         # dB; the silence tools' default
+MIN_SILENCE = 0.5             # s; shorter silences are not stored
+PEAKS_PER_SECOND = 20
+CLIP_LEVEL = 32767 / 32768    # full scale of 16-bit audio
+
+SUB_BLOCK = SAMPLE_RATE // 10          # 100 ms
+GATE_BLOCK = 4                          # sub-blocks per 400 ms gating block
+ABSOLUTE_GATE = -70.0
+RELATIVE_GATE = -10.0
+# K-weighting at 48 kHz (BS.1770-4 table 1 and 2): high shelf, then high pass
+_SHELF = ((1.53512485958697, -2.69169618940638, 1.19839281085285), (-1.69065929318241, 0.73248077421585))
+_HIGHPASS = ((1.0, -2.0, 1.0), (-1.99004745483398, 0.99007225036621))
+
+
+def available():
+    """True when NumPy can be imported."""
+    try:
+        _numpy()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("Audio analysis needs NumPy: pip install numpy") from None
+    return numpy
+
+
+def analysis_path(input_path):
+    return os.path.splitext(input_path)[0] + ".analysis.json"
+
+
+def _source_sig(input_path):
+    st = os.stat(input_path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _channels(input_path):
+    """Channels of the first audio stream (2 when ffprobe cannot tell)."""
+    cmd = [get_ffprobe(), "-v", "error", "-select_streams", "a:0",
+           "-show_entries", "stream=channels", "-of", "csv=p=0", input_path]
+    try:
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+        return int(out.split()[0])
+    except (OSError, subprocess.CalledProcessError, ValueError, IndexError):
+        return 2
+
+
+def _pcm_blocks(input_path, channels):
+    """Yield float32 blocks of shape (samples, channels)."""
+    np = _numpy()
+    cmd = [
+        get_ffmpeg(), *thread_args(), "-hide_banner", "-loglevel", "error",
+        "-i", input_path, "-vn", "-ac", str(channels), "-ar", str(SAMPLE_RATE),
+        "-f", "f32le", "-",
+    ]
+    frame_bytes = 4 * channels
+    block_bytes = SAMPLE_RATE * BLOCK_SECONDS * frame_bytes
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE) as proc:
+        try:
+            while True:
+                data = proc.stdout.read(block_bytes)
+                if not data:
+                    break
+                data = data[:len(data) // frame_bytes * frame_bytes]
+                yield np.frombuffer(data, dtype="<f4").reshape(-1, channels)
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+
+def _runs(np, flags, offset):
+    """(start, end) sample indexes of the runs of True in flags, offset added."""
+    edges = np.flatnonzero(np.diff(flags.astype(np.int8)))
+    starts = edges[~flags[edges]] + 1
+    ends = edges[flags[edges]] + 1
+    if flags[0]:
+        starts = np.concatenate(([0], starts))
+    if flags[-1]:
+        ends = np.concatenate((ends, [len(flags)]))
+    return zip((starts + offset).tolist(), (ends + offset).tolist())
+
+
+class _Silence:
+    """Silent stretches per threshold, carried across blocks."""
+
+    def __init__(self, thresholds):
+        self.levels = {t: 10 ** (t / 20) for t in thresholds}
+        self.found = {t: SegmentList() for t in thresholds}
+        self.open = dict.fromkeys(thresholds)   # sample where a silence still running began
+
+    def feed(self, np, block, offset):
+        peak = np.max(np.abs(block), axis=1)
+        for t, level in self.levels.items():
+            quiet = peak < level
+            if self.open[t] is not None and not quiet[0]:
+                self._add(t, self.open[t], offset)  # ended right at the block boundary
+                self.open[t] = None
+            for start, end in _runs(np, quiet, offset):
+                if start == offset and self.open[t] is not None:
+                    start = self.open[t]
+                self.open[t] = None
+                if end == offset + len(block):
+                    self.open[t] = start
+                else:
+                    self._add(t, start, end)
+
+    def _add(self, t, start, end):
+        if end - start >= MIN_SILENCE * SAMPLE_RATE:
+            self.found[t].append(round(start / SAMPLE_RATE, 4), round(end / SAMPLE_RATE, 4))
+
+    def result(self, total):
+        for t, start in self.open.items():
+            if start is not None:
+                self._add(t, start, total)
+        return {
+            "min_duration": MIN_SILENCE,
+            "thresholds": {_threshold_key(t): found.to_json() for t, found in self.found.items()},
+        }
+
+
+def _k_weights(np):
+    """|H(f)|^2 of the K-weighting filter on the rfft bins of a sub-block, Parseval factors included."""
+    w = 2 * np.pi * np.fft.rfftfreq(SUB_BLOCK, 1.0 / SAMPLE_RATE) / SAMPLE_RATE
+    z1, z2 = np.exp(-1j * w), np.exp(-2j * w)
+    response = np.ones_like(z1)
+    for (b0, b1, b2), (a1, a2) in (_SHELF, _HIGHPASS):
+        response *= (b0 + b1 * z1 + b2 * z2) / (1 + a1 * z1 + a2 * z2)
+    weights = np.abs(response) ** 2
+    weights[1:-1] *= 2  # one-sided spectrum: every bin but DC and Nyquist stands for two
+    return weights / SUB_BLOCK ** 2
+
+
+class _Loudness:
+    """K-weighted mean square of every 100 ms sub-block (summed over channels)."""
+
+    def __init__(self, np):
+        self.weights = _k_weights(np)
+        self.sub_blocks = []
+        self.carry = None
+
+    def feed(self, np, block, offset):
+        if self.carry is not None:
+            block = np.concatenate((self.carry, block))
+        n = len(block) // SUB_BLOCK
+        self.carry = block[n * SUB_BLOCK:]
+        if n:
+            spectra = np.fft.rfft(block[:n * SUB_BLOCK].reshape(n, SUB_BLOCK, -1), axis=1)
+            power = np.abs(spectra) ** 2
+            self.sub_blocks.append(np.einsum("f,nfc->n", self.weights, power))
+
+    def result(self, np):
+        if not self.sub_blocks:
+            return {"integrated": None, "gated_blocks": 0}
+        sub = np.concatenate(self.sub_blocks)
+        if len(sub) < GATE_BLOCK:
+            return {"integrated": None, "gated_blocks": 0}
+        blocks = np.convolve(sub, np.full(GATE_BLOCK, 1.0 / GATE_BLOCK), mode="valid")
+        loud = -0.691 + 10 * np.log10(blocks + 1e-20)
+        gated = blocks[loud > ABSOLUTE_GATE]
+        if not len(gated):
+            return {"integrated": None, "gated_blocks": 0}
+        relative = -0.691 + 10 * math.log10(float(np.mean(gated))) + RELATIVE_GATE
+        gated = blocks[(loud > ABSOLUTE_GATE) & (loud > relative)]
+        return {
+            "integrated": round(-0.691 + 10 * math.log10(float(np.mean(gated))), 2),
+            "gated_blocks": int(len(gated)),
+        }
+
+
+class _Peaks:
+    """
+    8-bit min/max per pixel, merged over the channels (lowest minimum, highest
+    maximum): declared as one channel, it shows the loudest one.
+    """
+
+    def __init__(self, np, peaks_per_second):
+        self.per_pixel = max(1, SAMPLE_RATE // peaks_per_second)
+        self.data = []
+        self.carry = np.zeros((0, 2), dtype=np.float32)
+
+    def feed(self, np, block, offset):
+        both = np.concatenate((self.carry, np.stack((block.min(axis=1), block.max(axis=1)), axis=1)))
+        n = len(both) // self.per_pixel
+        self.carry = both[n * self.per_pixel:]
+        if n:
+            self._pixels(np, both[:n * self.per_pixel].reshape(n, self.per_pixel, 2))
+
+    def _pixels(self, np, pixels):
+        lo = np.min(pixels[:, :, 0], axis=1)
+        hi = np.max(pixels[:, :, 1], axis=1)
+        pairs = np.clip(np.round(np.stack((lo, hi), axis=1) * 127), -128, 127).astype(np.int8)
+        self.data.append(pairs.reshape(-1))
+
+    def result(self, np):
+        if len(self.carry):
+            self._pixels(np, self.carry.reshape(1, -1, 2))
+        data = np.concatenate(self.data).tolist() if self.data else []
+        return {
+            "version": 2, "channels": 1, "sample_rate": SAMPLE_RATE,
+            "samples_per_pixel": self.per_pixel, "bits": 8,
+            "length": len(data) // 2, "data": data,
+        }
+
+
+class _Clipping:
+    def __init__(self):
+        self.peak = 0.0
+        self.samples = 0
+        self.events = 0
+        self.clipped_at_end = False
+
+    def feed(self, np, block, offset):
+        level = np.abs(block)
+        self.peak = max(self.peak, float(level.max()) if level.size else 0.0)
+        clipped = level >= CLIP_LEVEL
+        self.samples += int(np.count_nonzero(clipped))
+        frames = clipped.any(axis=1)
+        if frames.size:
+            runs = sum(1 for _ in _runs(np, frames, 0)) if frames.any() else 0
+            if self.clipped_at_end and frames[0]:
+                runs -= 1  # continues the stretch of the previous block
+            self.events += runs
+            self.clipped_at_end = bool(frames[-1])
+
+    def result(self):
+        return {
+            "peak_db": round(20 * math.log10(self.peak), 2) if self.peak > 0 else None,
+            "clipped_samples": self.samples,
+            "clip_events": self.events,
+        }
+
+
+def _threshold_key(threshold):
+    return f"{float(threshold):g}"
+
+
+def analyze(input_path, thresholds=THRESHOLDS, peaks_per_second=PEAKS_PER_SECOND):
+    """Decode input_path once and return the analysis dict (see module docstring)."""
+    np = _numpy()
+    channels = min(_channels(input_path), 2)
+    silence = _Silence(sorted({float(t) for t in thresholds}))
+    loudness = _Loudness(np)
+    peaks = _Peaks(np, peaks_per_second)
+    clipping = _Clipping()
+    total = 0
+    for block in _pcm_blocks(input_path, channels):
+        if not len(block):
+            continue
+        for analyzer in (silence, loudness, peaks, clipping):
+            analyzer.feed(np, block, total)
+        total += len(block)
+    return {
+        "version": VERSION,
+        "source": _source_sig(input_path),
+        "duration": total / SAMPLE_RATE,
+        "channels": channels,
+        "silence": silence.result(total),
+        "loudness": loudness.result(np),
+        "peaks": peaks.result(np),
+        "clipping": clipping.result(),
+    }
+
+
+def write_analysis(input_path, analysis, output=None):
+    """Write the analysis as compact JSON (atomic replace); returns the path."""
+    path = output or analysis_path(input_path)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(analysis, f, separators=(",", ":"))
+    os.replace(tmp, path)
+    return path
+
+
+def load_analysis(input_path):
+    """The analysis of input_path if one was written for its current content, else None."""
+    try:
+        with open(analysis_path(input_path), encoding="utf-8") as f:
+            data = json.load(f)
+        current = _source_sig(input_path)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != VERSION or data.get("source") != current:
+        return None
+    return data
+
+
+def analysis_silences(input_path, silence_duration, silence_threshold):
+    """
+    (silence_starts, silence_ends) like _silence.detect_silence from the analysis
+    file, or None when it does not cover this file, threshold or duration.
+    """
+    data = load_analysis(input_path)
+    if data is None:
+        return None
+    silence = data.get("silence") or {}
+    flat = (silence.get("thresholds") or {}).get(_threshold_key(silence_threshold))
+    if flat is None or silence_duration < silence.get("min_duration", math.inf):
+        return None
+    duration = data["duration"]
+    starts, ends = [], []
+    for start, end in SegmentList.from_json(flat).min_length(silence_duration):
+        starts.append(start)
+        if end < duration:
+            ends.append(end)  # a silence reaching the end of the file has no end event
+    return starts, ends
@@ -0,0 +1,187 @@
+"""
+ZIP archives as batch input (batch_convert <archive.zip>).
+
+Members are never all extracted up front:
+- A member the action's tool can read from a pipe, with the same result as
+  from a file, is streamed from the archive into the tool's stdin ("-" with
+  --input-format, see _stdio); only the output is written to disk.
+- Containers that need seeking (_stdio.SEEK_FORMATS), and tools that would
+  spool stdin anyway, get the member extracted on demand through a
+  _staging.Stager: bounded scratch space, the next member extracted while the
+  current one runs, deleted when its job ends.
+
+Outputs go next to the archive, under the member's folders inside it
+(talks.zip: day1/a.mp4 -> day1/a.mp3 beside talks.zip), or into an output
+archive (FolderSink / ZipSink). The action's skip rule is checked against that
+destination, so a rerun only processes members whose output is missing.
+"""
+import json
+import shutil
+import threading
+import time
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path, PurePosixPath
+
+from _stdio import SEEK_FORMATS
+
+COPY_BLOCK = 1 << 20
+# Output extensions written to an output archive with compression (media is stored as is)
+DEFLATE_EXTS = {".json", ".cue", ".txt"}
+# Written last into a folder output (see _checkpoint)
+_CHECKPOINT = ".checkpoint.json"
+
+
+def is_archive(path):
+    return Path(path).suffix.lower() == ".zip" and zipfile.is_zipfile(path)
+
+
+class ZipMember:
+    """One file inside an archive; hashable, opened on demand."""
+
+    __slots__ = ("archive", "arcname", "size", "mtime")
+
+    def __init__(self, archive, info):
+        self.archive = Path(archive)
+        self.arcname = info.filename
+        self.size = info.file_size
+        self.mtime = time.mktime(info.date_time + (0, 0, -1))
+
+    @property
+    def path(self):
+        """Path of the member inside the archive."""
+        return PurePosixPath(self.arcname)
+
+    @property
+    def name(self):
+        return self.path.name
+
+    @property
+    def format(self):
+        """Container name for --input-format (mp3, mp4, ...)."""
+        return self.path.suffix.lower().lstrip(".")
+
+    def needs_file(self):
+        return self.format in SEEK_FORMATS
+
+    @contextmanager
+    def open(self):
+        # own ZipFile per reader: members are read from several job threads at once
+        with zipfile.ZipFile(self.archive) as zf, zf.open(self.arcname) as f:
+            yield f
+
+    def feed(self, pipe):
+        """Write the member into a tool's stdin (_governor.JobControl.run feed)."""
+        with self.open() as f:
+            shutil.copyfileobj(f, pipe, COPY_BLOCK)
+
+    def __eq__(self, other):
+        return isinstance(other, ZipMember) and (self.archive, self.arcname) == (other.archive, other.arcname)
+
+    def __hash__(self):
+        return hash((self.archive, self.arcname))
+
+    def __repr__(self):
+        return f"ZipMember({str(self.archive)!r}, {self.arcname!r})"
+
+
+def _safe(arcname):
+    """False for names that would land outside the output folder (absolute, ..)."""
+    path = PurePosixPath(arcname.replace("\\", "/"))
+    return not path.is_absolute() and ".." not in path.parts and ":" not in arcname
+
+
+def list_members(archive, exts, skip_stems=()):
+    """Files in the archive with one of `exts`, in archive order; tool outputs (skip_stems suffixes) excluded."""
+    members = []
+    with zipfile.ZipFile(archive) as zf:
+        for info in zf.infolist():
+            path = PurePosixPath(info.filename)
+            if info.is_dir() or path.suffix.lower() not in exts or path.stem.endswith(tuple(skip_stems)):
+                continue
+            if not _safe(info.filename):
+                print(f"Skipping unsafe archive path: {info.filename}")
+                continue
+            members.append(ZipMember(archive, info))
+    return members
+
+
+def _output_files(outputs):
+    """(local file, name relative to the member's folder) for files and folder outputs, checkpoints last."""
+    files = []
+    for out in map(Path, outputs):
+        if out.is_file():
+            files.append((out, PurePosixPath(out.name)))
+        elif out.is_dir():
+            inner = sorted((p for p in out.iterdir() if p.is_file()), key=lambda p: p.name == _CHECKPOINT)
+            files += [(p, PurePosixPath(out.name, p.name)) for p in inner]
+    return files
+
+
+class FolderSink:
+    """Outputs beside the archive, under the member's folders."""
+
+    def __init__(self, archive, stager):
+        self.root = Path(archive).resolve().parent
+        self._stager = stager
+
+    def __str__(self):
+        return str(self.root)
+
+    def destination(self, member):
+        """Where the member would sit if extracted; the actions' skip rules and OUTPUTS apply to it."""
+        return self.root.joinpath(*member.path.parts)
+
+    def is_done(self, skip_rule, outputs, member):
+        return skip_rule(self.destination(member))
+
+    def put(self, outputs, member):
+        dest_dir = self.destination(member).parent
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        self._stager.write_back(outputs, dest_dir)
+
+
+class ZipSink:
+    """
+    Outputs added to an output archive as each job finishes. The archive is
+    opened in append mode per job, so what is in it stays readable if the batch
+    is interrupted.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path).resolve()
+        self._lock = threading.Lock()
+        self._names = set()
+        if self.path.exists():
+            with zipfile.ZipFile(self.path) as zf:
+                self._names = set(zf.namelist())
+
+    def __str__(self):
+        return str(self.path)
+
+    def destination(self, member):
+        return Path(*member.path.parts)
+
+    def _complete(self, folder):
+        name = f"{folder}/{_CHECKPOINT}"
+        if name not in self._names:
+            return False
+        with self._lock, zipfile.ZipFile(self.path) as zf:
+            return bool(json.loads(zf.read(name)).get("complete"))
+
+    def is_done(self, skip_rule, outputs, member):
+        """Every output in the archive (a folder output: its checkpoint says complete)."""
+        for out in outputs(self.destination(member)):
+            name = out.as_posix()
+            if name not in self._names and not self._complete(name):
+                return False
+        return True
+
+    def put(self, outputs, member):
+        folder = member.path.parent
+        with self._lock, zipfile.ZipFile(self.path, "a") as zf:
+            for local, rel in _output_files(outputs):
+                name = (folder / rel).as_posix()
+                compress = zipfile.ZIP_DEFLATED if local.suffix.lower() in DEFLATE_EXTS else zipfile.ZIP_STORED
+                zf.write(local, name, compress_type=compress)
+                self._names.add(name)
@@ -0,0 +1,117 @@
+"""
+Small JSON caches shared by the tools, stored under <project root>/cache/.
+
+Each cache is one JSON object per name (cache/<name>.json) mapping a key to a
+JSON value. file_key() identifies a file by path, size and mtime, which is
+enough for results that only need to be invalidated when the file changes.
+content_key() identifies the content itself (same key for a renamed copy).
+"""
+import hashlib
+import json
+import os
+import threading
+
+from _ffmpeg_config import _project_root
+
+
+def cache_dir():
+    """<project root>/cache, created on first use."""
+    d = _project_root() / "cache"
+    d.mkdir(exist_ok=True)
+    return d
+
+
+def file_key(path):
+    """Key for a file that changes when the file is replaced or modified."""
+    st = os.stat(path)
+    raw = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+# content_key reads this much from the start, middle and end of the file
+SAMPLE_BYTES = 1 << 20
+
+
+def content_key(path):
+    """
+    Fast content fingerprint: file size plus three sampled chunks (start, middle,
+    end). Stable across renames/copies without reading multi-GB files in full.
+    """
+    size = os.path.getsize(path)
+    h = hashlib.sha1(str(size).encode("ascii"))
+    with open(path, "rb") as f:
+        for offset in sorted({0, max(size // 2 - SAMPLE_BYTES // 2, 0), max(size - SAMPLE_BYTES, 0)}):
+            f.seek(offset)
+            h.update(f.read(SAMPLE_BYTES))
+    return h.hexdigest()
+
+
+def _path(name):
+    return cache_dir() / f"{name}.json"
+
+
+def load(name):
+    """Whole cache as a dict ({} when missing or unreadable)."""
+    try:
+        with open(_path(name), encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def get(name, key, default=None):
+    return load(name).get(key, default)
+
+
+def _write(name, data):
+    """Atomic replace; a cache that cannot be written (read-only install) is skipped."""
+    tmp = None
+    try:
+        path = _path(name)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp, path)
+    except OSError:
+        if tmp is not None:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+
+# Serializes load -> modify -> write between threads of one process (batch workers);
+# other processes are covered by re-reading the file right before each write.
+_lock = threading.Lock()
+
+
+def put(name, key, value, max_entries=None):
+    """
+    Store one entry; re-reads the file first so concurrent tools rarely lose entries.
+    With max_entries the cache keeps only the most recently stored entries.
+    """
+    with _lock:
+        data = load(name)
+        data.pop(key, None)  # re-stored entries move to the end (newest)
+        data[key] = value
+        if max_entries is not None:
+            for old in list(data)[:max(len(data) - max_entries, 0)]:
+                del data[old]
+        _write(name, data)
+
+
+def update(name, key, change):
+    """Store change(current value or None) as the entry, read and written under one lock."""
+    with _lock:
+        data = load(name)
+        data[key] = change(data.get(key))
+        _write(name, data)
+
+
+def drop(name, key):
+    """Remove one entry (no-op when missing)."""
+    with _lock:
+        data = load(name)
+        if data.pop(key, None) is not None:
+            _write(name, data)
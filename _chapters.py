@@ -0,0 +1,128 @@
+"""
+Chapter markers from a segment list, for the virtual split mode of
+split_on_silence: instead of copying every part into its own file, the parts
+are described once as
+
+  cue         <base>.cue next to the media (CUE sheet, INDEX in 1/75 s frames)
+  ffmetadata  <base>_chapters.txt (;FFMETADATA1 with [CHAPTER] blocks)
+  embed       <base>_chapters<ext>, a stream-copy remux of the input carrying
+              the chapters (ID3v2 CHAP frames in MP3, chapter atoms in MP4/M4A)
+
+Chapter k runs from the start of segment k to the start of segment k + 1 (the
+last one to the end of the file), so the silence between two parts stays at the
+end of the earlier chapter and the chapters cover the whole file; the first one
+starts at 0.
+"""
+import os
+import subprocess
+
+from _ffmpeg_config import get_ffmpeg, thread_args
+
+KINDS = ("cue", "ffmetadata", "embed")
+CUE_FRAMES = 75
+# CUE FILE types players understand; anything else is declared WAVE
+_CUE_FILE_TYPES = {".mp3": "MP3", ".aif": "AIFF", ".aiff": "AIFF"}
+
+
+def chapters_from_segments(segments, total_duration, title="Part {i}"):
+    """[(start, end, title)] covering 0..total_duration, one chapter per segment."""
+    starts = [start for start, _ in segments]
+    if not starts:
+        return []
+    starts[0] = 0.0
+    ends = starts[1:] + [max(total_duration, starts[-1])]
+    return [(s, e, title.format(i=i)) for i, (s, e) in enumerate(zip(starts, ends), 1)]
+
+
+def output_path(input_path, kind):
+    base, ext = os.path.splitext(input_path)
+    return {
+        "cue": f"{base}.cue",
+        "ffmetadata": f"{base}_chapters.txt",
+        "embed": f"{base}_chapters{ext}",
+    }[kind]
+
+
+def _cue_time(seconds):
+    frames = int(round(seconds * CUE_FRAMES))
+    minutes, frames = divmod(frames, 60 * CUE_FRAMES)
+    secs, frames = divmod(frames, CUE_FRAMES)
+    return f"{minutes:02d}:{secs:02d}:{frames:02d}"
+
+
+def _cue_text(value):
+    return str(value).replace('"', "'")
+
+
+def write_cue(path, media_path, chapters):
+    """CUE sheet for media_path (referenced by name, so keep both in one folder)."""
+    name = os.path.basename(media_path)
+    file_type = _CUE_FILE_TYPES.get(os.path.splitext(name)[1].lower(), "WAVE")
+    lines = [
+        f'TITLE "{_cue_text(os.path.splitext(name)[0])}"',
+        f'FILE "{_cue_text(name)}" {file_type}',
+    ]
+    for i, (start, _, title) in enumerate(chapters, 1):
+        lines += [
+            f"  TRACK {i:02d} AUDIO",
+            f'    TITLE "{_cue_text(title)}"',
+            f"    INDEX 01 {_cue_time(start)}",
+        ]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def _ffmetadata_text(value):
+    # ffmetadata escapes = ; # \ and newlines with a backslash
+    out = str(value)
+    for ch in ("\\", "=", ";", "#", "\n"):
+        out = out.replace(ch, "\\" + ch)
+    return out
+
+
+def write_ffmetadata(path, chapters):
+    """ffmpeg metadata file with one [CHAPTER] per chapter (millisecond time base)."""
+    lines = [";FFMETADATA1"]
+    for start, end, title in chapters:
+        lines += [
+            "[CHAPTER]",
+            "TIMEBASE=1/1000",
+            f"START={int(round(start * 1000))}",
+            f"END={int(round(end * 1000))}",
+            f"title={_ffmetadata_text(title)}",
+        ]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def embed_chapters(input_path, output_path, chapters):
+    """Remux input_path (stream copy) into output_path with the chapters embedded."""
+    meta = output_path + ".ffmetadata.txt"
+    write_ffmetadata(meta, chapters)
+    try:
+        cmd = [
+            get_ffmpeg(), *thread_args(), "-y", "-hide_banner", "-loglevel", "error",
+            "-i", input_path,
+            "-f", "ffmetadata", "-i", meta,
+            "-map", "0", "-map_metadata", "0", "-map_chapters", "1",
+            "-c", "copy",
+        ]
+        if output_path.lower().endswith(".mp3"):
+            cmd += ["-id3v2_version", "3"]  # CHAP frames; v2.3 is what most players read
+        subprocess.run(cmd + [output_path], check=True)
+    finally:
+        os.remove(meta)
+
+
+def write_chapters(kind, input_path, chapters, output=None):
+    """Write chapters in the given kind; returns the path written."""
+    path = output or output_path(input_path, kind)
+    if kind == "cue":
+        write_cue(path, input_path, chapters)
+    elif kind == "ffmetadata":
+        write_ffmetadata(path, chapters)
+    elif kind == "embed":
+        embed_chapters(input_path, path, chapters)
+    else:
+        raise ValueError(f"Unknown chapter format: {kind}")
+    return path
@@ -0,0 +1,168 @@
+"""
+Checkpoint for tools that write many parts into one output folder
+(split_on_silence): <output_dir>/.checkpoint.json records the segment plan and
+the parts already written with their sizes, so a rerun after a crash only
+produces the missing or truncated parts.
+
+The checkpoint is tied to the source file (size + mtime) and the tool's
+parameters; if either changed, the old checkpoint is discarded.
+"""
+import json
+import os
+import threading
+import time
+
+from _segments import SegmentList
+
+CHECKPOINT_NAME = ".checkpoint.json"
+VERSION = 1
+# Segment boundaries from two detection runs are equal within this (seconds)
+TOLERANCE = 1e-3
+# Progress (new segments, finished parts) is written at most this often (seconds)
+SAVE_INTERVAL = 1.0
+
+
+def _source_sig(input_path):
+    st = os.stat(input_path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def checkpoint_path(output_dir):
+    return os.path.join(output_dir, CHECKPOINT_NAME)
+
+
+def read_checkpoint(output_dir):
+    """Raw checkpoint dict, or None when missing/unreadable."""
+    try:
+        with open(checkpoint_path(output_dir), encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else None
+    except (OSError, ValueError):
+        return None
+
+
+def is_complete(output_dir):
+    """True when the folder's checkpoint says every planned part was written."""
+    data = read_checkpoint(output_dir)
+    return bool(data and data.get("complete"))
+
+
+class Checkpoint:
+    """
+    Segment plan + finished parts of one output folder. Thread-safe: parts are
+    marked done from extraction worker threads. The file is rewritten whole
+    (atomic replace), so progress is saved at most every SAVE_INTERVAL seconds
+    rather than per part; a finished or invalidated plan and completion are
+    saved at once. The file on disk is always a valid resume point, at worst
+    SAVE_INTERVAL behind (those parts are made again). flush() saves the rest.
+    """
+
+    def __init__(self, output_dir, input_path, params):
+        self.output_dir = output_dir
+        self._lock = threading.Lock()
+        key = {"source": _source_sig(input_path), "params": params}
+        data = read_checkpoint(output_dir)
+        if data and data.get("version") == VERSION and data.get("key") == key:
+            self.resumed = bool(data.get("parts"))
+        else:
+            data = {"version": VERSION, "key": key, "segments": [], "plan_complete": False,
+                    "total_duration": None, "parts": {}, "complete": False}
+            self.resumed = False
+        self.data = data
+        self._saved_at = 0.0
+        self._dirty = False
+        # kept as a SegmentList; data["segments"] is its flat JSON form (older files: [start, end] pairs)
+        self.plan = SegmentList.from_json(data["segments"])
+
+    @property
+    def plan_complete(self):
+        return self.data["plan_complete"]
+
+    @property
+    def segments(self):
+        return self.plan
+
+    @property
+    def total_duration(self):
+        return self.data["total_duration"]
+
+    def add_segment(self, i, start, end):
+        """
+        Record segment i (1-based) of a running detection. A segment that differs
+        from the stored plan invalidates the plan and the parts from there on.
+        """
+        with self._lock:
+            plan = self.plan
+            if i <= len(plan):
+                old_start, old_end = plan[i - 1]
+                if abs(old_start - start) <= TOLERANCE and abs(old_end - end) <= TOLERANCE:
+                    return
+                del plan.starts[i - 1:], plan.ends[i - 1:]
+                self.data["parts"] = {k: v for k, v in self.data["parts"].items() if int(k) < i}
+                self.data["plan_complete"] = False
+                plan.append(start, end)
+                self.data["complete"] = False
+                self._save(force=True)
+                return
+            plan.append(start, end)
+            self.data["complete"] = False
+            self._save()
+
+    def finish_plan(self, count, total_duration):
+        """Detection finished with `count` segments."""
+        with self._lock:
+            del self.plan.starts[count:], self.plan.ends[count:]
+            self.data["parts"] = {k: v for k, v in self.data["parts"].items() if int(k) <= count}
+            self.data["plan_complete"] = True
+            self.data["total_duration"] = total_duration
+            self._save(force=True)
+
+    def part_ok(self, i, path):
+        """Part i exists with the size recorded when it was finished."""
+        size = self.data["parts"].get(str(i))
+        try:
+            return bool(size) and os.path.getsize(path) == size
+        except OSError:
+            return False
+
+    def mark_done(self, i, path):
+        with self._lock:
+            self.data["parts"][str(i)] = os.path.getsize(path)
+            self._save()
+
+    def mark_complete(self):
+        with self._lock:
+            self.data["complete"] = True
+            self._save(force=True)
+
+    def flush(self):
+        """Save progress still held back by SAVE_INTERVAL."""
+        with self._lock:
+            if self._dirty:
+                self._save(force=True)
+
+    def remove(self):
+        try:
+            os.remove(checkpoint_path(self.output_dir))
+        except OSError:
+            pass
+
+    def _save(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._saved_at < SAVE_INTERVAL:
+            self._dirty = True
+            return
+        self._saved_at = now
+        self._dirty = False
+        self.data["segments"] = self.plan.to_json()
+        path = checkpoint_path(self.output_dir)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.data, f)
+            os.replace(tmp, path)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
@@ -0,0 +1,168 @@
+"""
+Chunk-parallel MP3 encoding for long single files (convert_* --jobs N).
+
+LAME is single-threaded, so a 10-hour input keeps one core busy for a long
+time. Here the timeline is cut into N ranges that are encoded by N ffmpeg
+processes at once and joined frame by frame into one file:
+
+- Ranges start and end on the MP3 frame grid (1152 samples), so frame i of a chunk that starts at frame A is global frame A + i: the encoder
+  delay (priming) is the same in every chunk and no sample is lost or doubled.
+- Every chunk after the first starts PREROLL_FRAMES early. The encoder's
+  psychoacoustic model and bit reservoir settle on audio that is thrown away.
+- Chunks are encoded without the bit reservoir (-reservoir 0), so every frame
+  has main_data_begin 0 and holds its own audio data: the first frame of a
+  chunk never borrows bytes from a frame of another encoder run. A chunk is
+  still taken from the first such frame at or after its nominal seam (a guard
+  against an encoder that ignores the option); the previous chunk is encoded
+  SEAM_SEARCH_FRAMES past the seam to cover this. Without the reservoir a CBR
+  frame cannot lend unused bytes to a following transient, so --jobs output is
+  a little worse than a single run at the same bitrate on sharp attacks.
+- Chunks are written without a Xing/LAME header (-write_xing 0) and only the
+  first keeps its ID3v2 tag. The output is a plain CBR stream (duration and
+  seeking need no header), but it carries no gapless info: players keep the
+  encoder's priming (~25 ms of silence) at the start and the padding of the
+  last frame at the end, as with any MP3 without a LAME tag. The converters'
+  --help says so.
+
+At a seam the decoder's overlap-add mixes the last frame of one run with the
+first of the next. Both encode the same audio, so the difference is at the
+level of quantization noise, not a click.
+"""
+import mmap
+import os
+import shutil
+import subprocess
+import tempfile
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from _ffmpeg_config import encoder_thread_args, get_ffmpeg, thread_args
+from _media_probe import _id3v2_size, duration_seconds, mp4_info, parse_frame_header
+
+MPEG1_RATES = (32000, 44100, 48000)   # 1152-sample frames; other inputs are resampled to 44.1 kHz
+FRAME_SAMPLES = 1152
+MIN_CHUNK_SECONDS = 300.0      # shorter chunks are not worth an extra encoder
+PREROLL_FRAMES = 16            # ~0.4 s of warm-up before each seam
+SEAM_SEARCH_FRAMES = 4         # frames after a nominal seam searched for main_data_begin == 0
+_COPY_BLOCK = 1 << 20
+
+
+def _sample_rate(input_path):
+    """Output rate: the input's own when MP3 codes it in 1152-sample frames, else 44.1 kHz."""
+    for track in (mp4_info(input_path) or {}).get("tracks", []):
+        if track.get("type") == "soun" and track.get("sample_rate") in MPEG1_RATES:
+            return track["sample_rate"]
+    return 44100
+
+
+def chunk_count(duration, jobs):
+    """Chunks used for a file of `duration` seconds with `jobs` parallel encoders."""
+    return max(1, min(jobs, int(duration // MIN_CHUNK_SECONDS)))
+
+
+def _frame_offsets(buf, start):
+    """Offsets of the consecutive Layer III frames in buf from `start`, plus the end offset."""
+    offsets = array("q")
+    pos = start
+    while pos + 4 <= len(buf):
+        f = parse_frame_header(buf, pos)
+        if f is None or f.layer != 3 or pos + f.length > len(buf):
+            break
+        offsets.append(pos)
+        pos += f.length
+    offsets.append(pos)
+    return offsets
+
+
+def _main_data_begin(buf, pos):
+    """Bytes the frame at pos borrows from the bit reservoir of earlier frames."""
+    f = parse_frame_header(buf, pos)
+    side = pos + 4 + (2 if f.crc else 0)
+    if f.mpeg1:
+        return int.from_bytes(buf[side:side + 2], "big") >> 7  # 9 bits
+    return buf[side]  # 8 bits
+
+
+def _copy(src, dst, length):
+    while length > 0:
+        block = src.read(min(_COPY_BLOCK, length))
+        if not block:
+            break
+        dst.write(block)
+        length -= len(block)
+
+
+def _encode(input_path, output_path, rate, start_frame, end_frame, audio_args, first):
+    frame = FRAME_SAMPLES / rate
+    cmd = [get_ffmpeg(), *thread_args(), "-y", "-hide_banner", "-loglevel", "error"]
+    if start_frame:
+        cmd += ["-ss", f"{start_frame * frame:.6f}"]
+    if end_frame is not None:
+        cmd += ["-t", f"{(end_frame - start_frame) * frame:.6f}"]
+    cmd += ["-i", input_path, "-vn", *audio_args, "-ar", str(rate),
+            "-c:a", "libmp3lame", "-reservoir", "0", "-write_xing", "0", *encoder_thread_args()]
+    if not first:
+        cmd += ["-id3v2_version", "0", "-map_metadata", "-1"]
+    subprocess.run(cmd + ["-f", "mp3", output_path], check=True)
+
+
+def encode_mp3_chunked(input_path, output_path, jobs, audio_args=()):
+    """
+    Encode input_path to output_path with up to `jobs` encoders in parallel.
+    Returns False (nothing written) when the file is too short to split or a seam
+    cannot be placed; the caller then encodes it in one run.
+    """
+    duration = duration_seconds(input_path)
+    n = chunk_count(duration, jobs)
+    if n < 2:
+        return False
+    rate = _sample_rate(input_path)
+    total_frames = int(duration * rate // FRAME_SAMPLES) + 1
+    seams = [round(k * total_frames / n) for k in range(n)]
+    starts = [max(s - PREROLL_FRAMES, 0) for s in seams]
+    ends = [seams[k + 1] + SEAM_SEARCH_FRAMES + 1 for k in range(n - 1)] + [None]
+
+    tmp_dir = tempfile.mkdtemp(prefix="chunked_")
+    try:
+        parts = [os.path.join(tmp_dir, f"chunk_{k:03d}.mp3") for k in range(n)]
+        print(f"Encoding in {n} chunks in parallel...")
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            list(pool.map(
+                lambda k: _encode(input_path, parts[k], rate, starts[k], ends[k], list(audio_args), k == 0),
+                range(n),
+            ))
+
+        offsets = []
+        for part in parts:
+            with open(part, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                offsets.append(_frame_offsets(buf, _id3v2_size(buf[:10])))
+        counts = [len(o) - 1 for o in offsets]
+
+        # first global frame of each chunk: a self-contained frame at or after the seam
+        cut = [0]
+        for k in range(1, n):
+            local = None
+            with open(parts[k], "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                for i in range(seams[k] - starts[k], min(seams[k] - starts[k] + SEAM_SEARCH_FRAMES, counts[k])):
+                    if _main_data_begin(buf, offsets[k][i]) == 0:
+                        local = i
+                        break
+            if local is None or starts[k] + local > starts[k - 1] + counts[k - 1]:
+                print("No clean seam found; encoding in one run.")
+                return False
+            cut.append(starts[k] + local)
+
+        tmp_out = output_path + ".part"
+        with open(tmp_out, "wb") as out:
+            for k in range(n):
+                first = cut[k] - starts[k]
+                last = cut[k + 1] - starts[k] if k + 1 < n else counts[k]
+                # the first chunk also contributes its ID3v2 tag
+                begin = 0 if k == 0 else offsets[k][first]
+                with open(parts[k], "rb") as f:
+                    f.seek(begin)
+                    _copy(f, out, offsets[k][last] - begin)
+        os.replace(tmp_out, output_path)
+        return True
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,272 @@
+"""
+Coarse-to-fine silence detection for MP3 (--mode coarse).
+
+A full pass decodes every sample, although a silence of 2 s or 5 s spans
+dozens of frames. Here:
+
+1. Coarse, without decoding: the side information of every Layer III granule
+   holds global_gain (the quantizer step, 1.5 dB per unit), big_values and
+   the Huffman tables of its regions, whose largest codable value bounds each
+   quantized coefficient. Summed over the up to 576 coefficients (every one of
+   them feeds every output sample through the IMDCT and the polyphase
+   synthesis), that bounds the energy of the granule; the granules a stretch
+   of output is made from (SPAN_GRANULES) bound its sample peak, in dB.
+   Frames are read straight from the file and the bound is kept per bin of
+   ENVELOPE_FRAMES frames (~0.1 s), the loudest granule of the bin.
+   Runs of bins below threshold + CANDIDATE_MARGIN_DB lasting at least
+   silence_duration - SLACK are candidates; nothing else is ever decoded.
+
+2. Fine: ffmpeg silencedetect (same filter and threshold as the full pass)
+   decodes every candidate, REFINE_WINDOW seconds wider on each side. All
+   windows of a file go through one ffmpeg process (concat demuxer with
+   inpoint/outpoint).
+
+Tolerance: a boundary found in a window is the one the full pass finds, up to
+the seek accuracy of MP3 (one frame, ~26 ms at 44.1 kHz). The bound is an upper
+bound, but a loose one: quiet passages code far below their tables' largest
+values, so a real silence can sit 30 dB and more under it. A silence whose bins
+bound more than CANDIDATE_MARGIN_DB above the threshold is not seen; the margin
+is set so the sample MP3s of the repo lose none (mediatools --check-coarse
+compares both passes on any files). The gain pays off on loud material: a
+lecture or music well above the threshold is skipped without decoding.
+
+Other formats (and MP3 files that cannot be parsed) use the full pass.
+"""
+import math
+import mmap
+import os
+import re
+import subprocess
+import tempfile
+from array import array
+
+from _ffmpeg_config import get_ffmpeg, thread_args
+from _media_probe import _id3v2_size, _same_stream, _vbr_frames, find_frame, parse_frame_header
+
+ENVELOPE_FRAMES = 4         # frames per envelope bin (~0.1 s)
+CANDIDATE_MARGIN_DB = 40.0  # the bound is loose: look at anything this close to the threshold
+SLACK = 0.5                 # s; candidates may be this much shorter than silence_duration
+REFINE_WINDOW = 1.0         # s decoded on each side of a candidate
+_EPS = 0.05
+
+# Largest |value| each Huffman table can code (tables 16-31 add linbits), by table_select
+_TABLE_MAX = (
+    [0, 1, 2, 2, 0, 3, 3, 5, 5, 5, 7, 7, 7, 15, 0, 15]
+    + [15 + (1 << b) - 1 for b in (1, 2, 3, 4, 6, 8, 10, 13)]
+    + [15 + (1 << b) - 1 for b in (4, 5, 6, 7, 8, 9, 11, 13)]
+)
+# max^(8/3): energy of one coefficient (dequantization raises values to the power 4/3)
+_TABLE_ENERGY = [m ** (8 / 3) for m in _TABLE_MAX]
+GRANULE_LINES = 576
+# Granules whose coefficients reach one granule of output: the IMDCT overlaps
+# the previous granule and the polyphase synthesis reads 15 slots further back.
+SPAN_GRANULES = 3
+# dB from 10*log10(summed coefficient energy) to the decoder's full-scale sample peak;
+# measured on the sample MP3s (every decoded bin peak at least 3 dB under the bound)
+SYNTH_GAIN_DB = -6.0
+SILENT_DB = -200.0
+
+_START_RE = re.compile(r"silence_start: (-?[\d.]+)")
+_END_RE = re.compile(r"silence_end: (-?[\d.]+)")
+
+
+def _granules(buf, pos, f):
+    """Upper bound on the coefficient energy of each granule of a Layer III frame, channels summed."""
+    start = pos + 4 + (2 if f.crc else 0)
+    size = f.side_info_size
+    bits = int.from_bytes(buf[start:start + size], "big")
+    left = size * 8
+    nch = 1 if f.mono else 2
+
+    def take(n):
+        nonlocal left
+        left -= n
+        return (bits >> left) & ((1 << n) - 1)
+
+    if f.mpeg1:
+        take(9 + (5 if f.mono else 3) + 4 * nch)  # main_data_begin, private bits, scfsi
+        granules = 2
+    else:
+        take(8 + (1 if f.mono else 2))
+        granules = 1
+    result = []
+    for _ in range(granules):
+        energy = 0.0
+        # channels summed: with M/S stereo either output channel can carry both
+        for _ in range(nch):
+            part2_3_length = take(12)
+            big_values = take(9)
+            global_gain = take(8)
+            take(4 if f.mpeg1 else 9)  # scalefac_compress
+            if take(1):  # window switching: block type, mixed flag, 2 tables, 3 subblock gains
+                take(3)
+                tables = (take(5), take(5))
+                take(9)
+            else:
+                tables = (take(5), take(5), take(5))
+                take(7)  # region0_count, region1_count
+            take(3 if f.mpeg1 else 2)  # preflag (MPEG-1), scalefac_scale, count1table_select
+            if not part2_3_length:
+                continue
+            # big_values pairs at their tables' largest value, the rest (count1) at 0/±1;
+            # scalefactors and subblock gains only attenuate, so they are left out
+            lines = min(2 * big_values, GRANULE_LINES)
+            coded = lines * max(_TABLE_ENERGY[t] for t in tables) + GRANULE_LINES - lines
+            energy += 2.0 ** ((global_gain - 210) / 2) * coded
+        result.append(energy)
+    return result
+
+
+def mp3_envelope(path):
+    """
+    (bin_seconds, levels) for a Layer III MP3: per bin of ENVELOPE_FRAMES frames,
+    the bound on its sample peak in dB, from the summed coefficient energy of
+    the SPAN_GRANULES granules behind each of its granules (Cauchy-Schwarz: no
+    sample of a granule's output exceeds the root of the energy it is made
+    from, times the synthesis gain). None when the file is not a parsable
+    Layer III stream.
+    """
+    try:
+        with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            pos = _id3v2_size(buf[:10])
+            at, first = find_frame(buf[pos:pos + 65536])
+            if first is None or first.layer != 3:
+                return None
+            pos += at
+            if _vbr_frames(buf, pos, first):
+                pos += first.length  # Xing/Info/VBRI frame carries no audio
+            levels = array("f")
+            recent = [0.0] * SPAN_GRANULES
+            peak, n = 0.0, 0
+            end = len(buf)
+            while pos + 4 <= end:
+                f = parse_frame_header(buf, pos)
+                if f is None or not _same_stream(first, f) or pos + f.length > end:
+                    at, f = find_frame(buf[pos + 1:pos + 1 + 65536])
+                    if f is None:
+                        break
+                    pos += 1 + at  # resync after garbage
+                    continue
+                for energy in _granules(buf, pos, f):
+                    recent = recent[1:] + [energy]
+                    peak = max(peak, sum(recent))
+                n += 1
+                if n == ENVELOPE_FRAMES:
+                    levels.append(_db(peak))
+                    peak, n = 0.0, 0
+                pos += f.length
+            if n:
+                levels.append(_db(peak))
+    except (OSError, ValueError):
+        return None
+    return ENVELOPE_FRAMES * first.samples / first.sample_rate, levels
+
+
+def _db(energy):
+    return 10 * math.log10(energy) + SYNTH_GAIN_DB if energy > 0 else SILENT_DB
+
+
+def candidates(envelope, silence_duration, silence_threshold):
+    """[(start, end)] runs of quiet bins that may hold a silence of silence_duration."""
+    step, levels = envelope
+    limit = silence_threshold + CANDIDATE_MARGIN_DB
+    result = []
+    run = None
+    for i in range(len(levels) + 1):
+        if i < len(levels) and levels[i] < limit:
+            if run is None:
+                run = i
+            continue
+        if run is not None and (i - run) * step >= silence_duration - SLACK:
+            result.append((run * step, i * step))
+        run = None
+    return result
+
+
+def _decode_windows(input_path, windows, silence_duration, silence_threshold):
+    """
+    silencedetect over several (start, end) windows of one file in one ffmpeg run.
+    Returns, per window, its silent (start, end) pieces in file time.
+    """
+    fd, listing = tempfile.mkstemp(suffix=".txt")
+    name = os.path.abspath(input_path).replace("\\", "/").replace("'", r"'\''")
+    offsets = []
+    t = 0.0
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        for start, end in windows:
+            f.write(f"file '{name}'\ninpoint {start:.6f}\noutpoint {end:.6f}\n")
+            offsets.append(t)
+            t += end - start
+    total = t
+    try:
+        cmd = [
+            get_ffmpeg(), *thread_args(), "-hide_banner", "-nostats",
+            "-f", "concat", "-safe", "0", "-i", listing,
+            "-vn", "-af", f"silencedetect=noise={silence_threshold}dB:d={silence_duration}",
+            "-f", "null", "-",
+        ]
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                text=True, errors="replace", check=True)
+    finally:
+        os.remove(listing)
+    spans = []
+    open_start = None
+    for line in result.stderr.splitlines():
+        m = _START_RE.search(line)
+        if m:
+            open_start = max(float(m.group(1)), 0.0)
+        m = _END_RE.search(line)
+        if m and open_start is not None:
+            spans.append((open_start, float(m.group(1))))
+            open_start = None
+    if open_start is not None:
+        spans.append((open_start, total))
+    # back to file time, cut at the window joins (a silence may run across one)
+    pieces = []
+    for (start, end), offset in zip(windows, offsets):
+        length = end - start
+        pieces.append([
+            (start + max(a - offset, 0.0), start + min(b - offset, length))
+            for a, b in spans if a < offset + length and b > offset
+        ])
+    return pieces
+
+
+def detect_coarse(input_path, silence_duration=2.0, silence_threshold=-30, total_duration=None):
+    """
+    (silence_starts, silence_ends) like _silence.detect_silence, coarse-to-fine;
+    None when the input is not a parsable MP3 (use the full pass).
+    """
+    envelope = mp3_envelope(input_path)
+    if envelope is None:
+        return None
+    step, levels = envelope
+    if total_duration is None:
+        total_duration = len(levels) * step
+    # widened candidates overlap: decode each stretch once, and only the last window
+    # can run past the real end of the audio (which would shift the ones after it)
+    windows = []
+    for start, end in candidates(envelope, silence_duration, silence_threshold):
+        start, end = max(start - REFINE_WINDOW, 0.0), min(end + REFINE_WINDOW, total_duration)
+        if windows and start <= windows[-1][1]:
+            windows[-1] = (windows[-1][0], end)
+        else:
+            windows.append((start, end))
+    pieces = []
+    if windows:
+        for window_pieces in _decode_windows(input_path, windows, silence_duration, silence_threshold):
+            pieces += window_pieces
+
+    # a silence across a window join is reported in two pieces: join what overlaps
+    # (not what only touches: silencedetect prints 6 digits, so two silences around
+    # a one-sample click can share a time), then apply the minimum length
+    merged = []
+    for start, end in sorted(pieces):
+        if merged and start < merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    merged = [(start, end) for start, end in merged if end - start >= silence_duration]
+    silence_starts = [start for start, _ in merged]
+    silence_ends = [end for _, end in merged if end < total_duration - _EPS]
+    return silence_starts, silence_ends
@@ -7,6 +7,7 @@
 Support both normal Python scripts and PyInstaller-compiled EXEs.
 """
 import json
+import os
 import sys
 from datetime import datetime
 from pathlib import Path
@@ -120,3 +121,35 @@ def get_ffprobe():
         return bundled
     c = _load_config()
     return c.get("ffprobe") or "ffprobe"
+
+
+# Thread cap for ffmpeg set by the governor (batch --threads) for child processes
+THREADS_ENV = "MEDIATOOLS_THREADS"
+
+
+def _thread_cap():
+    """Thread cap from the env or config.json governor.threads; 0 when unset."""
+    value = os.environ.get(THREADS_ENV)
+    if not value:
+        governor = _load_config().get("governor")
+        value = governor.get("threads") if isinstance(governor, dict) else None
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def thread_args():
+    """
+    ['-threads', N, '-filter_threads', N] when a cap is set, else []. Goes before
+    -i: caps the decoder and the filter graph only; commands that encode add
+    encoder_thread_args() among the output options as well.
+    """
+    n = _thread_cap()
+    return ["-threads", str(n), "-filter_threads", str(n)] if n else []
+
+
+def encoder_thread_args():
+    """['-threads', N] as an output option (caps the encoder) when a cap is set, else []."""
+    n = _thread_cap()
+    return ["-threads", str(n)] if n else []
@@ -0,0 +1,299 @@
+"""
+Resource governor: keep long conversions out of the way of interactive work.
+
+Settings come from "governor" in config.json, overridden by command-line flags:
+
+    "governor": {"priority": "low", "io": "low", "cpus": "0-3", "threads": 2}
+
+priority  normal | low | idle    nice 0/10/19, or NORMAL/BELOW_NORMAL/IDLE class on Windows
+io        normal | low | idle    Linux I/O priority (best-effort 4/7, idle class)
+cpus      "0-3,6"                CPU set for this process
+threads   N                      -threads/-filter_threads for every ffmpeg call
+
+Priority, I/O priority and affinity are applied to the current process, and
+every tool and ffmpeg process started afterwards inherits them. The thread cap
+is passed on through the MEDIATOOLS_THREADS environment variable and read by
+_ffmpeg_config.thread_args() (decoders, filters) and encoder_thread_args() (encoders).
+
+Pause/resume: while cache/batch.pause exists, running batches start no new job
+and their running tool processes (with their ffmpeg children) are suspended:
+SIGSTOP/SIGCONT on POSIX, NtSuspendProcess/NtResumeProcess on Windows.
+"""
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import _cache
+from _ffmpeg_config import THREADS_ENV, _load_config
+
+PRIORITIES = ("normal", "low", "idle")
+_NICE = {"normal": 0, "low": 10, "idle": 19}
+# Windows priority classes
+_PRIORITY_CLASS = {"normal": 0x20, "low": 0x4000, "idle": 0x40}
+# Linux ioprio: (class, data); class 2 = best-effort (0 highest .. 7 lowest), 3 = idle
+_IOPRIO = {"normal": (2, 4), "low": (2, 7), "idle": (3, 0)}
+_IOPRIO_SYSCALL = {"x86_64": 251, "aarch64": 30, "i686": 289, "armv7l": 314}
+
+PAUSE_FILE = "batch.pause"
+PAUSE_POLL_SECONDS = 1.0
+
+
+def parse_cpus(spec):
+    """'0-3,6' -> {0, 1, 2, 3, 6}; a list of ints is accepted too."""
+    if isinstance(spec, (list, tuple)):
+        return {int(c) for c in spec}
+    cpus = set()
+    for part in str(spec).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        lo, _, hi = part.partition("-")
+        cpus.update(range(int(lo), int(hi or lo) + 1))
+    return cpus
+
+
+def settings(priority=None, io=None, cpus=None, threads=None, defaults=None):
+    """Effective settings: CLI values over config.json over `defaults`."""
+    result = dict(defaults or {})
+    conf = _load_config().get("governor")
+    if isinstance(conf, dict):
+        result.update({k: v for k, v in conf.items() if v is not None})
+    for key, value in (("priority", priority), ("io", io), ("cpus", cpus), ("threads", threads)):
+        if value is not None:
+            result[key] = value
+    return result
+
+
+def _set_priority(level):
+    if sys.platform == "win32":
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), _PRIORITY_CLASS[level])
+        return
+    # Absolute value: applying twice (batch, then the tool it starts) must not stack
+    current = os.getpriority(os.PRIO_PROCESS, 0)
+    if _NICE[level] > current:
+        os.setpriority(os.PRIO_PROCESS, 0, _NICE[level])
+
+
+def _set_io_priority(level):
+    if not sys.platform.startswith("linux"):
+        return  # Windows: the IDLE/BELOW_NORMAL class already lowers I/O and memory priority
+    import ctypes
+    import platform
+    number = _IOPRIO_SYSCALL.get(platform.machine())
+    if number is None:
+        return
+    cls, data = _IOPRIO[level]
+    libc = ctypes.CDLL(None, use_errno=True)
+    libc.syscall(number, 1, 0, (cls << 13) | data)  # IOPRIO_WHO_PROCESS, self
+
+
+def _set_affinity(cpus):
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    elif sys.platform == "win32":
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        mask = sum(1 << c for c in cpus)
+        kernel32.SetProcessAffinityMask(kernel32.GetCurrentProcess(), ctypes.c_size_t(mask))
+
+
+def apply(priority=None, io=None, cpus=None, threads=None, defaults=None):
+    """Apply the effective settings to this process (inherited by child processes)."""
+    s = settings(priority, io, cpus, threads, defaults)
+    try:
+        if s.get("priority") in PRIORITIES:
+            _set_priority(s["priority"])
+        if s.get("io") in PRIORITIES:
+            _set_io_priority(s["io"])
+        if s.get("cpus") not in (None, ""):
+            _set_affinity(parse_cpus(s["cpus"]))
+    except (OSError, ValueError, AttributeError) as e:
+        print(f"Governor: could not apply {s}: {e}")
+    if s.get("threads"):
+        try:
+            threads = int(s["threads"])
+        except (TypeError, ValueError):
+            threads = 0
+        if threads > 0:
+            os.environ[THREADS_ENV] = str(threads)
+        else:
+            print(f"Governor: ignoring threads={s['threads']!r} (expected a positive whole number)")
+    return s
+
+
+# --- pause / resume ------------------------------------------------------
+
+def pause_path():
+    return _cache.cache_dir() / PAUSE_FILE
+
+
+def request_pause():
+    pause_path().touch()
+
+
+def request_resume():
+    try:
+        pause_path().unlink()
+    except FileNotFoundError:
+        pass
+
+
+def is_paused():
+    try:
+        return pause_path().exists()
+    except OSError:  # cache folder cannot be created: nobody can have paused
+        return False
+
+
+def _child_pids(pid):
+    """All descendants of pid (children first level first)."""
+    parents = {}
+    if sys.platform == "win32":
+        parents = _windows_parents()
+    elif os.path.isdir("/proc"):
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat", "rb") as f:
+                    stat = f.read()
+            except OSError:
+                continue
+            # pid (comm) state ppid ...; comm may contain spaces and parentheses
+            ppid = int(stat[stat.rfind(b")") + 2:].split()[1])
+            parents[int(entry)] = ppid
+    result = []
+    frontier = [pid]
+    while frontier:
+        kids = [p for p, pp in parents.items() if pp in frontier and p not in result]
+        result.extend(kids)
+        frontier = kids
+    return result
+
+
+def _windows_parents():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESSENTRY32W(ctypes.Structure):
+        _fields_ = [
+            ("dwSize", wintypes.DWORD), ("cntUsage", wintypes.DWORD),
+            ("th32ProcessID", wintypes.DWORD), ("th32DefaultHeapID", ctypes.c_size_t),
+            ("th32ModuleID", wintypes.DWORD), ("cntThreads", wintypes.DWORD),
+            ("th32ParentProcessID", wintypes.DWORD), ("pcPriClassBase", wintypes.LONG),
+            ("dwFlags", wintypes.DWORD), ("szExeFile", wintypes.WCHAR * 260),
+        ]
+
+    kernel32 = ctypes.windll.kernel32
+    kernel32.CreateToolhelp32Snapshot.restype = wintypes.HANDLE
+    snapshot = kernel32.CreateToolhelp32Snapshot(0x2, 0)  # TH32CS_SNAPPROCESS
+    parents = {}
+    entry = PROCESSENTRY32W()
+    entry.dwSize = ctypes.sizeof(entry)
+    try:
+        ok = kernel32.Process32FirstW(snapshot, ctypes.byref(entry))
+        while ok:
+            parents[entry.th32ProcessID] = entry.th32ParentProcessID
+            ok = kernel32.Process32NextW(snapshot, ctypes.byref(entry))
+    finally:
+        kernel32.CloseHandle(snapshot)
+    return parents
+
+
+def _signal_tree(pid, suspend):
+    """Suspend (parent first, so it spawns nothing new) or resume (children first) a process tree."""
+    pids = [pid] + _child_pids(pid)
+    if not suspend:
+        pids.reverse()
+    for p in pids:
+        try:
+            if sys.platform == "win32":
+                import ctypes
+                kernel32 = ctypes.windll.kernel32
+                handle = kernel32.OpenProcess(0x0800, False, p)  # PROCESS_SUSPEND_RESUME
+                if handle:
+                    fn = ctypes.windll.ntdll.NtSuspendProcess if suspend else ctypes.windll.ntdll.NtResumeProcess
+                    fn(handle)
+                    kernel32.CloseHandle(handle)
+            else:
+                import signal
+                os.kill(p, signal.SIGSTOP if suspend else signal.SIGCONT)
+        except OSError:
+            pass
+
+
+def _feed(feed, pipe):
+    try:
+        feed(pipe)
+    except BrokenPipeError:
+        pass  # the tool stopped reading; its exit code tells what happened
+    except Exception as e:
+        print(f"Reading input failed: {e}")
+    finally:
+        try:
+            pipe.close()
+        except OSError:
+            pass
+
+
+class JobControl:
+    """
+    Runs tool commands for a batch and honours the pause file: no new job starts
+    while paused, and the running ones are suspended until the file is removed.
+    """
+
+    def __init__(self):
+        self._procs = set()
+        self._lock = threading.Lock()
+        self._paused = False
+        self._stop = threading.Event()
+        self._monitor = threading.Thread(target=self._watch, daemon=True)
+        self._monitor.start()
+
+    def _watch(self):
+        while not self._stop.wait(PAUSE_POLL_SECONDS):
+            paused = is_paused()
+            if paused == self._paused:
+                continue
+            with self._lock:
+                self._paused = paused
+                for proc in self._procs:
+                    _signal_tree(proc.pid, suspend=paused)
+            print("Batch paused (run with --resume to continue)." if paused else "Batch resumed.")
+
+    def run(self, cmd, feed=None):
+        """
+        subprocess.run(cmd, check=True) that waits while paused and can be suspended.
+        feed(pipe), when given, writes the process's stdin from a helper thread.
+        """
+        while is_paused():
+            time.sleep(PAUSE_POLL_SECONDS)
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE if feed else None)
+        with self._lock:
+            self._procs.add(proc)
+            if self._paused:
+                _signal_tree(proc.pid, suspend=True)
+        feeder = None
+        if feed:
+            feeder = threading.Thread(target=_feed, args=(feed, proc.stdin), daemon=True)
+            feeder.start()
+        try:
+            returncode = proc.wait()
+            if feeder is not None:
+                feeder.join()
+        finally:
+            with self._lock:
+                self._procs.discard(proc)
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, cmd)
+
+    def close(self):
+        self._stop.set()
+        if self._paused:
+            with self._lock:
+                for proc in self._procs:
+                    _signal_tree(proc.pid, suspend=False)
@@ -0,0 +1,84 @@
+"""
+Two-pass EBU R128 loudness normalization (ffmpeg loudnorm) with cached measurements.
+
+The first pass (a full decode) measures integrated loudness, true peak and LRA.
+Measurements are cached by input content (see _cache.content_key), so
+reprocessing a file or writing it to another format only runs the second,
+normalizing pass as part of the encode the tool does anyway.
+"""
+import json
+import re
+import subprocess
+
+import _cache
+from _ffmpeg_config import get_ffmpeg, thread_args
+
+# Publishing target: integrated loudness (LUFS), true peak (dBTP), loudness range (LU)
+TARGET_I = -16.0
+TARGET_TP = -1.5
+TARGET_LRA = 11.0
+
+CACHE_NAME = "loudnorm"
+CACHE_ENTRIES = 1000
+# loudnorm_filter(sample_rate=SOURCE): back to the input's own rate
+SOURCE = "source"
+# used when ffmpeg's stream line does not show the input rate
+DEFAULT_RATE = 44100
+
+_RATE_RE = re.compile(r"Stream #.*?: Audio: .*?(\d+) Hz")
+
+
+def _target():
+    return f"I={TARGET_I}:TP={TARGET_TP}:LRA={TARGET_LRA}"
+
+
+def measure(input_path):
+    """First-pass loudnorm measurements for input_path (cached by content)."""
+    key = f"{_cache.content_key(input_path)}|{_target()}"
+    cached = _cache.get(CACHE_NAME, key)
+    if cached and "sample_rate" in cached:
+        print(f"Loudness (cached): {cached['input_i']} LUFS, peak {cached['input_tp']} dBTP, LRA {cached['input_lra']} LU")
+        return cached
+    print("Measuring loudness (first pass)...")
+    cmd = [
+        get_ffmpeg(),
+        *thread_args(),
+        "-hide_banner", "-nostats",
+        "-i", input_path,
+        "-vn",
+        "-af", f"loudnorm={_target()}:print_format=json",
+        "-f", "null",
+        "-",
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, errors="replace")
+    if result.returncode:
+        raise subprocess.CalledProcessError(result.returncode, cmd, stderr=result.stderr)
+    # The JSON block is the last {...} ffmpeg prints
+    text = result.stderr
+    data = json.loads(text[text.rindex("{"):text.rindex("}") + 1])
+    measured = {k: data[k] for k in ("input_i", "input_tp", "input_lra", "input_thresh", "target_offset")}
+    rate = _RATE_RE.search(text)
+    measured["sample_rate"] = int(rate.group(1)) if rate else DEFAULT_RATE
+    _cache.put(CACHE_NAME, key, measured, max_entries=CACHE_ENTRIES)
+    print(f"Loudness: {measured['input_i']} LUFS, peak {measured['input_tp']} dBTP, LRA {measured['input_lra']} LU")
+    return measured
+
+
+def loudnorm_filter(input_path, sample_rate=SOURCE):
+    """
+    Second-pass filter string for input_path. loudnorm runs at 192 kHz internally,
+    so the result is resampled to sample_rate: SOURCE (default) the input's own
+    rate, None keeps 192 kHz (for commands that set -ar themselves).
+    """
+    m = measure(input_path)
+    f = (
+        f"loudnorm={_target()}"
+        f":measured_I={m['input_i']}:measured_TP={m['input_tp']}"
+        f":measured_LRA={m['input_lra']}:measured_thresh={m['input_thresh']}"
+        f":offset={m['target_offset']}:linear=true:print_format=none"
+    )
+    if sample_rate == SOURCE:
+        sample_rate = m["sample_rate"]
+    if sample_rate:
+        f += f",aresample={sample_rate}"
+    return f
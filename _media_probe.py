@@ -0,0 +1,355 @@
+"""
+Media duration without spawning ffprobe where the header already says it.
+
+For MP3 the first few KB are enough: a Xing/Info or VBRI header carries the
+frame count (VBR and LAME CBR files), otherwise a constant bitrate and the
+audio byte count give the duration. mp3_duration_us() returns None when the
+file is ambiguous (VBR without a header, damaged sync).
+
+For MP4/M4A/MOV (ISO-BMFF) mp4_info() walks the moov box through mmap and
+returns the duration and the audio track parameters, cached per file (the last
+MP4_CACHE_ENTRIES files). mp4_keyframes() reads the video keyframe times (stss +
+stts) on demand at the timescale's full precision; they are not cached, since a
+long video has tens of thousands of them and only the splitter needs them.
+
+duration_seconds() falls back to ffprobe for everything else.
+"""
+import mmap
+import os
+import struct
+import subprocess
+
+import _cache
+from _ffmpeg_config import get_ffprobe
+
+# kbit/s by bitrate index, per (MPEG-1?, layer)
+_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Hz by sample rate index, per version bits (3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5)
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+HEADER_READ = 64 * 1024
+# CBR files are spot-checked at these fractions of the audio data
+_CBR_PROBES = (0.25, 0.5, 0.75)
+# consecutive frames compared at the start and at each probe point
+_CBR_RUN = 8
+
+
+class FrameHeader:
+    __slots__ = ("version", "layer", "bitrate", "sample_rate", "padding", "mono", "crc", "length", "samples")
+
+    @property
+    def mpeg1(self):
+        return self.version == 3
+
+    @property
+    def side_info_size(self):
+        if self.mpeg1:
+            return 17 if self.mono else 32
+        return 9 if self.mono else 17
+
+
+def parse_frame_header(b, pos=0):
+    """FrameHeader for the 4 bytes at b[pos], or None if they are not a valid MPEG audio header."""
+    if pos + 4 > len(b):
+        return None
+    h = struct.unpack_from(">I", b, pos)[0]
+    if h >> 21 != 0x7FF:
+        return None
+    version = (h >> 19) & 3
+    layer = 4 - ((h >> 17) & 3)
+    bitrate_index = (h >> 12) & 15
+    rate_index = (h >> 10) & 3
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    f = FrameHeader()
+    f.version = version
+    f.layer = layer
+    f.bitrate = _BITRATES[(version == 3, layer)][bitrate_index] * 1000
+    f.sample_rate = _SAMPLE_RATES[version][rate_index]
+    f.padding = (h >> 9) & 1
+    f.mono = ((h >> 6) & 3) == 3
+    f.crc = not (h >> 16) & 1  # protection bit 0: a 16-bit CRC follows the header
+    if layer == 1:
+        f.samples = 384
+        f.length = (12 * f.bitrate // f.sample_rate + f.padding) * 4
+    elif layer == 2 or f.mpeg1:
+        f.samples = 1152
+        f.length = 144 * f.bitrate // f.sample_rate + f.padding
+    else:
+        f.samples = 576
+        f.length = 72 * f.bitrate // f.sample_rate + f.padding
+    return f
+
+
+def _same_stream(a, b):
+    return a.version == b.version and a.layer == b.layer and a.sample_rate == b.sample_rate
+
+
+def find_frame(b, start=0, confirm=True):
+    """(offset, FrameHeader) of the first header in b at or after start whose next frame also parses."""
+    pos = b.find(b"\xff", start)
+    while 0 <= pos < len(b) - 4:
+        f = parse_frame_header(b, pos)
+        if f is not None:
+            nxt = parse_frame_header(b, pos + f.length)
+            if not confirm or (nxt is not None and _same_stream(f, nxt)):
+                return pos, f
+        pos = b.find(b"\xff", pos + 1)
+    return None, None
+
+
+def _id3v2_size(head):
+    """Bytes taken by an ID3v2 tag at the start of the file (0 when absent)."""
+    if len(head) < 10 or head[:3] != b"ID3":
+        return 0
+    size = 0
+    for byte in head[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if head[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _trailing_tags_size(f, file_size):
+    """Bytes of ID3v1 and APEv2 tags at the end of the file."""
+    size = 0
+    if file_size >= 128:
+        f.seek(file_size - 128)
+        if f.read(3) == b"TAG":
+            size = 128
+    if file_size - size >= 32:
+        f.seek(file_size - size - 32)
+        footer = f.read(32)
+        if footer[:8] == b"APETAGEX":
+            tag_size, = struct.unpack_from("<I", footer, 12)
+            flags, = struct.unpack_from("<I", footer, 20)
+            size += tag_size + (32 if flags & 0x80000000 else 0)
+    return size
+
+
+def _vbr_frames(b, pos, f):
+    """Frame count from a Xing/Info or VBRI header inside the first frame, else None."""
+    xing = pos + 4 + f.side_info_size
+    if b[xing:xing + 4] in (b"Xing", b"Info"):
+        flags, = struct.unpack_from(">I", b, xing + 4)
+        if flags & 1:
+            frames, = struct.unpack_from(">I", b, xing + 8)
+            return frames
+        return None
+    vbri = pos + 36
+    if b[vbri:vbri + 4] == b"VBRI":
+        frames, = struct.unpack_from(">I", b, vbri + 14)
+        return frames
+    return None
+
+
+def _constant_bitrate(b, pos, f, frames=_CBR_RUN):
+    """The frames starting at b[pos] (as many as fit, up to `frames`) all match f's bitrate."""
+    for _ in range(frames):
+        g = parse_frame_header(b, pos)
+        if g is None:
+            # End of the buffer is fine; garbage in the middle of it is not
+            return pos + 4 > len(b)
+        if g.bitrate != f.bitrate or not _same_stream(f, g):
+            return False
+        pos += g.length
+    return True
+
+
+def mp3_duration_us(path):
+    """
+    Duration of an MP3 in microseconds from its headers alone, or None when the
+    headers do not determine it (caller should ask ffprobe).
+    """
+    try:
+        file_size = os.path.getsize(path)
+        with open(path, "rb") as fh:
+            head = fh.read(HEADER_READ)
+            offset = _id3v2_size(head)
+            if offset:
+                fh.seek(offset)
+                head = fh.read(HEADER_READ)
+            pos, f = find_frame(head)
+            if f is None:
+                return None
+            frames = _vbr_frames(head, pos, f)
+            if frames:
+                return frames * f.samples * 1_000_000 // f.sample_rate
+            # No frame count: only trust the bitrate if the stream is constant
+            if not _constant_bitrate(head, pos, f):
+                return None
+            audio_start = offset + pos
+            audio_end = file_size - _trailing_tags_size(fh, file_size)
+            for fraction in _CBR_PROBES:
+                fh.seek(audio_start + int((audio_end - audio_start) * fraction))
+                chunk = fh.read(16 * 1024)
+                at, g = find_frame(chunk)
+                if g is None or not _constant_bitrate(chunk, at, f):
+                    return None
+    except (OSError, struct.error):
+        return None
+    return (audio_end - audio_start) * 8 * 1_000_000 // f.bitrate
+
+
+def ffprobe_duration(path):
+    """Container duration in seconds from ffprobe."""
+    cmd = [
+        get_ffprobe(),
+        "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        "--",
+        path,
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip())
+
+
+MP4_EXTS = (".mp4", ".m4a", ".m4v", ".mov")
+MP4_CACHE = "mp4_index"
+MP4_CACHE_ENTRIES = 1000
+# Boxes whose children are walked on the way to the sample tables
+_CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+
+
+def _boxes(buf, start, end):
+    """Yield (type, payload_start, box_end) for the boxes in buf[start:end]."""
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", buf, pos)
+        header = 8
+        if size == 1:
+            size, = struct.unpack_from(">Q", buf, pos + 8)
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            return
+        yield kind, pos + header, pos + size
+        pos += size
+
+
+def _full_box_times(buf, pos):
+    """(timescale, duration) from an mvhd/mdhd payload (version 0 or 1)."""
+    if buf[pos] == 1:
+        return struct.unpack_from(">IQ", buf, pos + 20)
+    return struct.unpack_from(">II", buf, pos + 12)
+
+
+def _sync_times(buf, stts, stss, timescale):
+    """Decode times (s) of the sync samples listed in stss, walking the stts runs."""
+    count, = struct.unpack_from(">I", buf, stss + 4)
+    sync = struct.unpack_from(f">{count}I", buf, stss + 8)
+    runs, = struct.unpack_from(">I", buf, stts + 4)
+    times = []
+    sample = 1  # first sample number of the current run
+    t = 0
+    i = 0
+    for r in range(runs):
+        n, delta = struct.unpack_from(">II", buf, stts + 8 + 8 * r)
+        while i < count and sync[i] < sample + n:
+            times.append((t + (sync[i] - sample) * delta) / timescale)
+            i += 1
+        sample += n
+        t += n * delta
+    return times
+
+
+def _parse_track(buf, start, end, keyframes=False):
+    track = {}
+    timescale = 1
+    stts = stss = None
+    stack = [(start, end)]
+    while stack:
+        s, e = stack.pop()
+        for kind, p, box_end in _boxes(buf, s, e):
+            if kind in _CONTAINERS:
+                stack.append((p, box_end))
+            elif kind == b"mdhd":
+                timescale, duration = _full_box_times(buf, p)
+                track["duration"] = duration / timescale if timescale else 0.0
+            elif kind == b"hdlr":
+                track["type"] = buf[p + 8:p + 12].decode("latin-1")
+            elif kind == b"stsd":
+                # first sample entry: size, format, 6 reserved, data reference index
+                track["codec"] = buf[p + 12:p + 16].decode("latin-1")
+                entry = p + 16 + 8
+                track["_entry"] = entry
+            elif kind == b"stts":
+                stts = p
+            elif kind == b"stss":
+                stss = p
+    entry = track.pop("_entry", None)
+    if track.get("type") == "soun" and entry is not None:
+        channels, sample_size = struct.unpack_from(">HH", buf, entry + 8)
+        rate, = struct.unpack_from(">I", buf, entry + 16)
+        track.update(channels=channels, sample_size=sample_size, sample_rate=rate >> 16)
+    if keyframes and track.get("type") == "vide" and stts is not None and stss is not None:
+        track["keyframes"] = _sync_times(buf, stts, stss, timescale)
+    return track
+
+
+def _read_mp4(path, keyframes=False):
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        info = {"duration": None, "tracks": []}
+        for kind, p, end in _boxes(buf, 0, len(buf)):
+            if kind != b"moov":
+                continue
+            for child, cp, cend in _boxes(buf, p, end):
+                if child == b"mvhd":
+                    timescale, duration = _full_box_times(buf, cp)
+                    info["duration"] = duration / timescale if timescale and duration else None
+                elif child == b"trak":
+                    info["tracks"].append(_parse_track(buf, cp, cend, keyframes))
+            break
+        return info
+
+
+def mp4_info(path):
+    """
+    {"duration": s or None, "tracks": [{"type": "soun"|"vide"|..., "codec", "duration",
+    audio: "channels", "sample_size", "sample_rate"}]}
+    from the moov box, or None if the file is not a readable ISO-BMFF file.
+    Cached per file (path, size, mtime).
+    """
+    key = _cache.file_key(path)
+    info = _cache.get(MP4_CACHE, key)
+    if info is None:
+        try:
+            info = _read_mp4(path)
+        except (OSError, ValueError, struct.error):
+            return None
+        _cache.put(MP4_CACHE, key, info, max_entries=MP4_CACHE_ENTRIES)
+    return info
+
+
+def mp4_keyframes(path):
+    """Exact keyframe times (s) of the first video track with a sync-sample table, else None."""
+    try:
+        info = _read_mp4(path, keyframes=True)
+    except (OSError, ValueError, struct.error):
+        return None
+    for track in info["tracks"]:
+        if track.get("keyframes"):
+            return track["keyframes"]
+    return None
+
+
+def duration_seconds(path):
+    """Media duration in seconds: MP3/MP4 headers when they are conclusive, else ffprobe."""
+    name = os.fspath(path).lower()
+    if name.endswith(".mp3"):
+        us = mp3_duration_us(path)
+        if us:
+            return us / 1_000_000
+    elif name.endswith(MP4_EXTS):
+        info = mp4_info(path)
+        if info and info["duration"]:
+            return info["duration"]
+    return ffprobe_duration(path)
@@ -0,0 +1,165 @@
+"""
+Content-addressed store of tool outputs, so the same media dropped into another
+folder or under another name is not encoded again.
+
+An entry is keyed by (content fingerprint of the input, action, parameters).
+The fingerprint is _cache.content_key (size + sampled chunks); since two files
+can share it, a hit is confirmed with a full SHA-256 of the input before the
+stored output is handed out. save() hashes the source and keeps the hash in the
+entry, so an entry stays usable after its source is moved or deleted.
+
+Outputs are stored and served as real copies, never hardlinks: the tools
+rewrite their outputs in place (ffmpeg -y truncates the file), which would
+otherwise change the stored entry and every copy served from it.
+
+Store: <project root>/cache/results/<key>/<n><ext>, index in cache/results.json.
+Size is bounded by "result_cache_mb" in config.json (default 2048, 0 disables);
+least recently used entries are evicted first.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import _cache
+from _ffmpeg_config import _load_config
+
+INDEX = "results"
+HASH_CACHE = "full_hash"
+HASH_CACHE_ENTRIES = 1000
+DEFAULT_LIMIT_MB = 2048
+
+
+def _limit_bytes():
+    try:
+        return int(float(_load_config().get("result_cache_mb", DEFAULT_LIMIT_MB)) * 1024 * 1024)
+    except (TypeError, ValueError):
+        return DEFAULT_LIMIT_MB * 1024 * 1024
+
+
+def enabled():
+    return _limit_bytes() > 0
+
+
+def _store_dir():
+    d = _cache.cache_dir() / "results"
+    d.mkdir(exist_ok=True)
+    return d
+
+
+def _entry_key(input_path, action, params):
+    # 2 and 2.0 are the same parameter; keep keys stable across callers
+    norm = {k: float(v) if isinstance(v, int) and not isinstance(v, bool) else v
+            for k, v in sorted(params.items())}
+    raw = f"{_cache.content_key(input_path)}|{action}|{json.dumps(norm, sort_keys=True)}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def full_hash(path):
+    """SHA-256 of the whole file, remembered per (path, size, mtime)."""
+    key = _cache.file_key(path)
+    digest = _cache.get(HASH_CACHE, key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        _cache.put(HASH_CACHE, key, digest, max_entries=HASH_CACHE_ENTRIES)
+    return digest
+
+
+def _copy(src, dst):
+    # a fresh inode: never share data with a file a tool may rewrite in place
+    if os.path.lexists(dst):
+        os.remove(dst)
+    shutil.copy2(src, dst)
+    return dst
+
+
+def _place(src, dst):
+    """Copy a file or a whole folder from src to dst."""
+    if os.path.isdir(src):
+        shutil.copytree(src, dst, copy_function=_copy, dirs_exist_ok=True)
+    else:
+        _copy(src, dst)
+
+
+def _size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(d, n)) for d, _, names in os.walk(path) for n in names)
+    return os.path.getsize(path)
+
+
+def _stored_name(i, output):
+    return f"{i}{os.path.splitext(os.fspath(output))[1]}"
+
+
+def serve(input_path, action, params, outputs):
+    """
+    If this input was already processed with the same action and parameters,
+    recreate `outputs` (files or folders) from the store and return True.
+    """
+    if not enabled() or not os.path.isfile(input_path):
+        return False
+    try:
+        key = _entry_key(input_path, action, params)
+        entry = _cache.get(INDEX, key)
+        if not entry or len(entry["outputs"]) != len(outputs):
+            return False
+        obj = _store_dir() / key
+        stored = [obj / name for name in entry["outputs"]]
+        if not all(p.exists() for p in stored) or _size(obj) != entry["size"]:
+            return False
+        expected = entry.get("sha256")
+        if not expected or full_hash(input_path) != expected:
+            return False
+        for src, dst in zip(stored, outputs):
+            _place(src, os.fspath(dst))
+        entry["used"] = time.time()
+        _cache.put(INDEX, key, entry)
+        return True
+    except OSError:
+        return False
+
+
+def save(input_path, action, params, outputs):
+    """Add freshly produced outputs to the store (best effort), then evict to the size limit."""
+    if not enabled():
+        return
+    try:
+        key = _entry_key(input_path, action, params)
+        digest = full_hash(input_path)
+        obj = _store_dir() / key
+        shutil.rmtree(obj, ignore_errors=True)
+        obj.mkdir()
+        names = []
+        for i, output in enumerate(outputs, 1):
+            name = _stored_name(i, output)
+            _place(os.fspath(output), os.fspath(obj / name))
+            names.append(name)
+        _cache.put(INDEX, key, {
+            "sha256": digest,
+            "action": action,
+            "outputs": names,
+            "size": _size(obj),
+            "used": time.time(),
+        })
+    except OSError:
+        shutil.rmtree(_store_dir() / key, ignore_errors=True)
+        return
+    evict()
+
+
+def evict(limit=None):
+    """Drop least recently used entries until the store fits in `limit` bytes."""
+    limit = _limit_bytes() if limit is None else limit
+    index = _cache.load(INDEX)
+    total = sum(e.get("size", 0) for e in index.values())
+    for key, entry in sorted(index.items(), key=lambda kv: kv[1].get("used", 0)):
+        if total <= limit:
+            break
+        shutil.rmtree(_store_dir() / key, ignore_errors=True)
+        _cache.drop(INDEX, key)
+        total -= entry.get("size", 0)
@@ -0,0 +1,223 @@
+"""
+Compact list of (start, end) time ranges in seconds, shared by the silence
+tools and the split checkpoint.
+
+Starts and ends live in two array('d') (16 bytes per segment instead of a
+tuple object each). Every operation works on the whole list and returns a new,
+sorted SegmentList:
+
+  complement(total)    the gaps, i.e. silences <-> non-silent parts
+  merge_gaps(gap)      join neighbours separated by at most `gap` seconds
+  pad(before, after)   widen every segment (overlaps are merged)
+  clamp(lo, hi)        cut to [lo, hi], dropping what falls outside
+  min_length(seconds)  drop segments shorter than `seconds`
+
+Lists of at least BULK_MIN segments are processed with NumPy bulk operations
+on zero-copy views of the arrays (sort, running maximum, masks) when NumPy is
+installed; shorter lists, and installs without NumPy, use the plain loops. The
+threshold keeps NumPy's import (~0.1 s) out of the tools' usual runs, where a
+file has tens or hundreds of segments and the loops take microseconds.
+
+shape() chains them in the order the tools need: parts closer than merge_gap
+are joined first, so a short word next to another survives; what is still
+shorter than min_length is noise between two silences and is dropped (it would
+otherwise become its own part, one ffmpeg process each); the rest is padded,
+since a cut right at the silence boundary can clip the first consonant.
+"""
+from array import array
+
+# Segment count from which NumPy is used (when installed)
+BULK_MIN = 2048
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _bulk(segments):
+    """numpy, when the list is long enough to be worth it and NumPy is installed."""
+    return _numpy() if len(segments) >= BULK_MIN else None
+
+
+class SegmentList:
+    """Sorted, non-overlapping (start, end) ranges backed by two arrays of doubles."""
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, starts=(), ends=()):
+        self.starts = array("d", starts)
+        self.ends = array("d", ends)
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        segments = cls()
+        for start, end in pairs:
+            segments.append(start, end)
+        return segments
+
+    @classmethod
+    def from_silences(cls, silence_starts, silence_ends, total_duration):
+        """Non-silent ranges between silences; an unclosed last silence runs to total_duration."""
+        silences = cls(silence_starts, list(silence_ends[:len(silence_starts)]))
+        silences.ends.extend([total_duration] * (len(silence_starts) - len(silences.ends)))
+        return silences._normalized().complement(total_duration)
+
+    def append(self, start, end):
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return zip(self.starts, self.ends)
+
+    def __getitem__(self, i):
+        return self.starts[i], self.ends[i]
+
+    def __eq__(self, other):
+        return isinstance(other, SegmentList) and self.starts == other.starts and self.ends == other.ends
+
+    def __repr__(self):
+        return f"SegmentList({list(self)!r})"
+
+    def _views(self, np):
+        """(starts, ends) as float64 arrays sharing memory with this list."""
+        return np.frombuffer(self.starts, dtype="d"), np.frombuffer(self.ends, dtype="d")
+
+    @classmethod
+    def _from_arrays(cls, starts, ends):
+        segments = cls()
+        segments.starts.frombytes(starts.astype("d").tobytes())
+        segments.ends.frombytes(ends.astype("d").tobytes())
+        return segments
+
+    def duration(self):
+        """Total seconds covered."""
+        return sum(self.ends) - sum(self.starts)
+
+    def _normalized(self):
+        """Sorted by start with overlapping or touching ranges merged."""
+        return self.merge_gaps(0.0)
+
+    def complement(self, total_duration):
+        """The ranges of [0, total_duration] not covered by this list."""
+        np = _bulk(self)
+        if np is not None:
+            starts, ends = self._views(np)
+            # pos[i]: how far the ranges before i reach (the loop's running `pos`)
+            pos = np.maximum.accumulate(np.concatenate(([0.0], ends)))
+            keep = (starts > pos[:-1]) & (pos[:-1] < total_duration)
+            gap_starts = pos[:-1][keep]
+            gap_ends = np.minimum(starts[keep], total_duration)
+            if pos[-1] < total_duration:
+                gap_starts = np.append(gap_starts, pos[-1])
+                gap_ends = np.append(gap_ends, total_duration)
+            return SegmentList._from_arrays(gap_starts, gap_ends)
+        result = SegmentList()
+        pos = 0.0
+        for start, end in self:
+            if start > pos:
+                result.append(pos, min(start, total_duration))
+            pos = max(pos, end)
+            if pos >= total_duration:
+                break
+        if pos < total_duration:
+            result.append(pos, total_duration)
+        return result
+
+    def merge_gaps(self, max_gap):
+        """Join segments whose gap is at most max_gap seconds."""
+        np = _bulk(self)
+        if np is not None and len(self):
+            starts, ends = self._views(np)
+            order = np.argsort(starts, kind="stable")
+            starts, ends = starts[order], ends[order]
+            reach = np.maximum.accumulate(ends)
+            # a new segment begins where the gap to everything before exceeds max_gap
+            first = np.concatenate(([True], starts[1:] - reach[:-1] > max_gap))
+            last = np.concatenate((np.flatnonzero(first)[1:] - 1, [len(starts) - 1]))
+            return SegmentList._from_arrays(starts[first], reach[last])
+        result = SegmentList()
+        order = sorted(range(len(self)), key=self.starts.__getitem__)
+        for i in order:
+            start, end = self.starts[i], self.ends[i]
+            if result.ends and start - result.ends[-1] <= max_gap:
+                if end > result.ends[-1]:
+                    result.ends[-1] = end
+            else:
+                result.append(start, end)
+        return result
+
+    def pad(self, before, after=None):
+        """Widen each segment by `before` seconds at the start and `after` (default: before) at the end."""
+        if after is None:
+            after = before
+        np = _bulk(self)
+        if np is not None:
+            starts, ends = self._views(np)
+            return SegmentList._from_arrays(starts - before, ends + after)._normalized()
+        return SegmentList(
+            (s - before for s in self.starts),
+            (e + after for e in self.ends),
+        )._normalized()
+
+    def clamp(self, lo, hi):
+        """Restrict to [lo, hi]; segments outside it disappear."""
+        np = _bulk(self)
+        if np is not None:
+            starts, ends = self._views(np)
+            starts, ends = np.maximum(starts, lo), np.minimum(ends, hi)
+            keep = ends > starts
+            return SegmentList._from_arrays(starts[keep], ends[keep])
+        result = SegmentList()
+        for start, end in self:
+            start, end = max(start, lo), min(end, hi)
+            if end > start:
+                result.append(start, end)
+        return result
+
+    def min_length(self, seconds):
+        """Only the segments at least `seconds` long."""
+        np = _bulk(self)
+        if np is not None:
+            starts, ends = self._views(np)
+            keep = ends - starts >= seconds
+            return SegmentList._from_arrays(starts[keep], ends[keep])
+        result = SegmentList()
+        for start, end in self:
+            if end - start >= seconds:
+                result.append(start, end)
+        return result
+
+    def shape(self, total_duration, pad=0.0, merge_gap=0.0, min_length=0.0):
+        """
+        The tools' clean-up: join parts closer than merge_gap, drop parts still
+        shorter than min_length, then pad the edges; clamped to the file.
+        """
+        result = self
+        if merge_gap:
+            result = result.merge_gaps(merge_gap)
+        if min_length:
+            result = result.min_length(min_length)
+        if pad:
+            result = result.pad(pad)
+        return result.clamp(0.0, total_duration)
+
+    def to_json(self):
+        """Flat [start0, end0, start1, end1, ...] for JSON files (checkpoint, caches)."""
+        flat = []
+        for start, end in self:
+            flat += (start, end)
+        return flat
+
+    @classmethod
+    def from_json(cls, data):
+        """Inverse of to_json(); also accepts a list of [start, end] pairs."""
+        if data and isinstance(data[0], (list, tuple)):
+            return cls.from_pairs(data)
+        return cls(data[0::2], data[1::2])
@@ -0,0 +1,513 @@
+"""
+Shared silence helpers for the silence tools and the pipeline:
+ffmpeg silencedetect parsing, media duration and non-silent segment building.
+"""
+import os
+import queue
+import re
+import subprocess
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+import _cache
+from _ffmpeg_config import encoder_thread_args, get_ffmpeg, thread_args
+from _media_probe import duration_seconds
+from _segments import SegmentList
+from _stdio import file_output, input_args, is_stream, needs_file, output_args, spooled_input, stdout_is_data
+
+_START_RE = re.compile(r"silence_start: (-?[\d.]+)")
+_END_RE = re.compile(r"silence_end: (-?[\d.]+)")
+
+
+_PTS_RE = re.compile(r"pts_time:(-?[\d.]+)")
+_PEAK_RE = re.compile(r"lavfi\.astats\.Overall\.Peak_level=(\S+)")
+
+# Auto threshold: level histogram range (1 dB bins) and limits of the chosen value
+HIST_MIN_DB = -100
+AUTO_THRESHOLD_RANGE = (-60.0, -15.0)
+AUTO_CACHE = "silence_threshold"
+
+# Chunks shorter than this are not worth an extra ffmpeg process
+MIN_CHUNK_SECONDS = 60.0
+
+
+def _silencedetect_cmd(input_path, silence_duration, silence_threshold, seek=None):
+    cmd = [get_ffmpeg(), *thread_args(), "-hide_banner", "-nostats"]
+    if seek is not None:
+        start, length = seek
+        cmd += ["-ss", f"{start:.6f}", "-t", f"{length:.6f}"]
+    return cmd + [
+        "-i", input_path,
+        "-vn",
+        "-af", f"silencedetect=noise={silence_threshold}dB:d={silence_duration}",
+        "-f", "null",
+        "-",
+    ]
+
+
+def iter_silence_events(input_path, silence_duration=2.0, silence_threshold=-30):
+    """
+    Yield ("start", t) / ("end", t) as ffmpeg prints them, while it is still decoding.
+    stderr is drained by a reader thread, so ffmpeg never stalls on a full pipe
+    while the caller is busy (e.g. extracting the segment that just closed).
+    """
+    proc = subprocess.Popen(
+        _silencedetect_cmd(input_path, silence_duration, silence_threshold),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors="replace",
+    )
+    events = queue.Queue()
+
+    def reader():
+        for line in proc.stderr:
+            m = _START_RE.search(line)
+            if m:
+                events.put(("start", max(float(m.group(1)), 0.0)))
+            m = _END_RE.search(line)
+            if m:
+                events.put(("end", float(m.group(1))))
+        events.put(None)
+
+    t = threading.Thread(target=reader, daemon=True)
+    t.start()
+    try:
+        while True:
+            event = events.get()
+            if event is None:
+                break
+            yield event
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+        t.join()
+
+
+# Detection modes: "level" = ffmpeg silencedetect on a dB threshold, "vad" = _vad (NumPy),
+# "coarse" = level, decoding only the stretches an MP3 envelope (no decoding) shows may be silent (_coarse)
+MODES = ("level", "vad", "coarse")
+
+
+def detect_silence(input_path, silence_duration=2.0, silence_threshold=-30, jobs=1, mode="level"):
+    """
+    Run ffmpeg silencedetect and return (silence_starts, silence_ends) in seconds.
+    silence_duration: minimum silence length (s); silence_threshold: level in dB.
+    A trailing silence that lasts until the end of the file may have no end.
+    jobs > 1 splits long files into chunks analysed in parallel (see detect_silence_chunked).
+    silence_threshold="auto" picks the threshold from the file's level histogram
+    (see detect_silence_auto) and reuses the cached value on later runs.
+    mode="vad" ignores the threshold and finds non-speech with the voice activity detector.
+    mode="coarse" finds the silences of "level" decoding only where they may be (MP3; others
+    fall back to "level"; see _coarse for its tolerance).
+    A current <base>.analysis.json (analyze-audio) that covers the threshold is used
+    instead of decoding.
+    """
+    if mode == "vad":
+        from _vad import detect_vad
+        return detect_vad(input_path, silence_duration)
+    if mode == "coarse":
+        found = _coarse_silences(input_path, silence_duration, silence_threshold)
+        if found is not None:
+            return found
+    if silence_threshold == "auto":
+        cached = resolve_threshold(input_path, silence_threshold)
+        if cached is None:
+            starts, ends = [], []
+            for kind, t in _auto_events(input_path, silence_duration):
+                (starts if kind == "start" else ends).append(t)
+            return starts, ends
+        print(f"Auto threshold (cached): {cached:.1f} dB")
+        silence_threshold = cached
+    found = _analysed_silences(input_path, silence_duration, silence_threshold)
+    if found is not None:
+        return found
+    if jobs > 1:
+        return detect_silence_chunked(input_path, silence_duration, silence_threshold, jobs)
+    silence_starts = []
+    silence_ends = []
+    for kind, t in iter_silence_events(input_path, silence_duration, silence_threshold):
+        (silence_starts if kind == "start" else silence_ends).append(t)
+    return silence_starts, silence_ends
+
+
+def _coarse_silences(input_path, silence_duration, silence_threshold):
+    """detect_coarse with a numeric threshold, or None when the full pass has to run."""
+    from _coarse import detect_coarse
+    threshold = resolve_threshold(input_path, silence_threshold)
+    if threshold is None:
+        return None  # auto threshold not known yet: needs the full histogram pass
+    found = detect_coarse(input_path, silence_duration, threshold, get_audio_duration(input_path))
+    if found is None:
+        print("Coarse detection needs an MP3 (Layer III); using the full pass.")
+    return found
+
+
+def _analysed_silences(input_path, silence_duration, silence_threshold):
+    """Silences from a current <base>.analysis.json (analyze-audio), or None."""
+    from _analysis import analysis_silences
+    found = analysis_silences(input_path, silence_duration, silence_threshold)
+    if found is not None:
+        print("Silences from the analysis file (no decode)")
+    return found
+
+
+def parse_threshold(value):
+    """'auto' or a number of dB (command-line values)."""
+    if str(value).strip().lower() == "auto":
+        return "auto"
+    return float(value)
+
+
+def _percentile(hist, fraction):
+    """Level (dB) below which `fraction` of the windows fall."""
+    total = sum(hist)
+    target = fraction * total
+    seen = 0
+    for i, n in enumerate(hist):
+        seen += n
+        if seen >= target:
+            return HIST_MIN_DB + i
+    return 0
+
+
+def estimate_threshold(hist):
+    """
+    Pick a silence threshold from a histogram of window peak levels (1 dB bins
+    from HIST_MIN_DB). The 10th percentile is taken as the noise floor, the 95th
+    as the speech/music level; the threshold sits 30% of the way up from the
+    floor (at least 6 dB above it). Returns (threshold, floor, speech).
+    """
+    floor = _percentile(hist, 0.10)
+    speech = _percentile(hist, 0.95)
+    threshold = floor + max(6.0, 0.3 * (speech - floor))
+    low, high = AUTO_THRESHOLD_RANGE
+    return min(max(threshold, low), high), floor, speech
+
+
+def detect_silence_auto(input_path, silence_duration=2.0):
+    """
+    One decode that yields both the threshold and the silences: ffmpeg reports the
+    peak level of every ~46 ms window (astats), which feeds a level histogram and
+    a compact per-window level array. The threshold is estimated from the
+    histogram, then silences are the runs of windows below it lasting at least
+    silence_duration (window resolution, like silencedetect on peak level).
+    Returns (silence_starts, silence_ends, threshold, floor, speech).
+    """
+    cmd = [
+        get_ffmpeg(),
+        *thread_args(),
+        "-hide_banner", "-nostats", "-loglevel", "error",
+        "-i", input_path,
+        "-vn",
+        "-af", "asetnsamples=n=2048:p=0,astats=metadata=1:reset=1,"
+               "ametadata=mode=print:key=lavfi.astats.Overall.Peak_level:file=-",
+        "-f", "null",
+        "-",
+    ]
+    hist = [0] * (-HIST_MIN_DB + 1)
+    times = array("d")
+    levels = array("f")
+    t = None
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True, errors="replace") as proc:
+        for line in proc.stdout:
+            m = _PTS_RE.search(line)
+            if m:
+                t = float(m.group(1))
+                continue
+            m = _PEAK_RE.search(line)
+            if m and t is not None:
+                try:
+                    level = float(m.group(1))
+                except ValueError:
+                    level = float(HIST_MIN_DB)
+                level = min(max(level, float(HIST_MIN_DB)), 0.0)
+                hist[int(round(level)) - HIST_MIN_DB] += 1
+                times.append(t)
+                levels.append(level)
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+    threshold, floor, speech = estimate_threshold(hist)
+
+    window = times[1] - times[0] if len(times) > 1 else 0.0
+    end_of_file = times[-1] + window if times else 0.0
+    silence_starts = []
+    silence_ends = []
+    run_start = None
+    for t, level in zip(times, levels):
+        if level < threshold:
+            if run_start is None:
+                run_start = t
+        elif run_start is not None:
+            if t - run_start >= silence_duration:
+                silence_starts.append(run_start)
+                silence_ends.append(t)
+            run_start = None
+    if run_start is not None and end_of_file - run_start >= silence_duration:
+        silence_starts.append(run_start)
+    return silence_starts, silence_ends, threshold, floor, speech
+
+
+def resolve_threshold(input_path, silence_threshold):
+    """A number for silence_threshold: as given, or the cached auto value (None if not cached yet)."""
+    if silence_threshold != "auto":
+        return silence_threshold
+    return _cache.get(AUTO_CACHE, _cache.file_key(input_path))
+
+
+def _auto_events(input_path, silence_duration):
+    """Events for threshold 'auto' when no cached value exists; caches the chosen value."""
+    starts, ends, threshold, floor, speech = detect_silence_auto(input_path, silence_duration)
+    _cache.put(AUTO_CACHE, _cache.file_key(input_path), threshold)
+    print(f"Auto threshold: {threshold:.1f} dB (noise floor {floor} dB, signal {speech} dB)")
+    for i, start in enumerate(starts):
+        yield ("start", start)
+        if i < len(ends):
+            yield ("end", ends[i])
+
+
+def _detect_chunk(input_path, silence_duration, silence_threshold, start, length):
+    """Silences inside [start, start + length) in absolute seconds; an open one ends at the chunk end."""
+    result = subprocess.run(
+        _silencedetect_cmd(input_path, silence_duration, silence_threshold, seek=(start, length)),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors="replace",
+    )
+    intervals = []
+    open_start = None
+    for line in result.stderr.splitlines():
+        m = _START_RE.search(line)
+        if m:
+            open_start = start + max(float(m.group(1)), 0.0)
+        m = _END_RE.search(line)
+        if m and open_start is not None:
+            intervals.append((open_start, start + float(m.group(1))))
+            open_start = None
+    if open_start is not None:
+        intervals.append((open_start, start + length))
+    return intervals
+
+
+def merge_intervals(intervals, tolerance=0.01):
+    """Union of overlapping (start, end) intervals, sorted."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + tolerance:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def detect_silence_chunked(input_path, silence_duration=2.0, silence_threshold=-30, jobs=4, total_duration=None):
+    """
+    Parallel silencedetect for long recordings: the timeline is cut into `jobs`
+    chunks, each analysed by its own ffmpeg process (-ss/-t), and the results merged.
+
+    Each chunk is decoded with an overlap of silence_duration + 1s on both sides.
+    A silence crossing a border is then seen by both neighbours as a piece that is
+    either the whole silence or at least `overlap` long, so both pieces are
+    reported and their union is the same interval a single pass finds (up to
+    the seek accuracy of the format, a few ms for MP3).
+    """
+    if total_duration is None:
+        total_duration = get_audio_duration(input_path)
+    jobs = max(1, min(jobs, int(total_duration // MIN_CHUNK_SECONDS)))
+    if jobs == 1:
+        return detect_silence(input_path, silence_duration, silence_threshold)
+
+    overlap = silence_duration + 1.0
+    chunk = total_duration / jobs
+    ranges = []
+    for k in range(jobs):
+        start = max(k * chunk - overlap, 0.0)
+        end = min((k + 1) * chunk + overlap, total_duration)
+        ranges.append((start, end - start))
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        results = pool.map(
+            lambda r: _detect_chunk(input_path, silence_duration, silence_threshold, r[0], r[1]),
+            ranges,
+        )
+        intervals = [iv for chunk_intervals in results for iv in chunk_intervals]
+
+    silence_starts = []
+    silence_ends = []
+    for start, end in merge_intervals(intervals):
+        if end - start >= silence_duration:
+            silence_starts.append(start)
+            silence_ends.append(min(end, total_duration))
+    return silence_starts, silence_ends
+
+
+class SilenceScan:
+    """
+    Streaming silence scan: segments() yields each non-silent (start, end) range as
+    soon as the silence that closes it is detected, so callers can cut it while
+    ffmpeg keeps scanning the rest of the file. Only counters are kept, so memory
+    does not grow with the length of the recording.
+    With jobs > 1 detection runs chunk-parallel instead (faster on long files, but
+    segments are only yielded once every chunk is done). silence_threshold may be
+    "auto" (see detect_silence). mode="vad" streams the voice activity detector's
+    non-speech stretches instead of level-based silences.
+    segment_list() collects the whole plan as a SegmentList instead, for the
+    clean-up options (pad, merge_gap, min_length) that need to see neighbours.
+    """
+
+    def __init__(self, input_path, silence_duration=2.0, silence_threshold=-30, jobs=1, mode="level"):
+        self.input_path = input_path
+        self.silence_duration = silence_duration
+        self.silence_threshold = silence_threshold
+        self.jobs = jobs
+        self.mode = mode
+        self.silence_count = 0
+        self.silence_seconds = 0.0
+        self.total_duration = None
+
+    def _events(self):
+        if self.mode == "vad":
+            from _vad import iter_vad_events
+            yield from iter_vad_events(self.input_path, self.silence_duration)
+            return
+        if self.mode == "coarse":
+            found = _coarse_silences(self.input_path, self.silence_duration, self.silence_threshold)
+            if found is not None:
+                starts, ends = found
+                for i, start in enumerate(starts):
+                    yield ("start", start)
+                    if i < len(ends):
+                        yield ("end", ends[i])
+                return
+        if self.silence_threshold == "auto":
+            cached = resolve_threshold(self.input_path, "auto")
+            if cached is None:
+                yield from _auto_events(self.input_path, self.silence_duration)
+                return
+            print(f"Auto threshold (cached): {cached:.1f} dB")
+            self.silence_threshold = cached
+        found = _analysed_silences(self.input_path, self.silence_duration, self.silence_threshold)
+        if found is not None:
+            starts, ends = found
+            for i, start in enumerate(starts):
+                yield ("start", start)
+                if i < len(ends):
+                    yield ("end", ends[i])
+            return
+        if self.jobs <= 1:
+            yield from iter_silence_events(self.input_path, self.silence_duration, self.silence_threshold)
+            return
+        starts, ends = detect_silence_chunked(
+            self.input_path, self.silence_duration, self.silence_threshold, self.jobs
+        )
+        for i, start in enumerate(starts):
+            yield ("start", start)
+            if i < len(ends):
+                yield ("end", ends[i])
+
+    def segments(self):
+        current_pos = 0.0
+        open_start = None
+        for kind, t in self._events():
+            if kind == "start":
+                open_start = t
+                self.silence_count += 1
+                if t > current_pos:
+                    yield (current_pos, t)
+            elif open_start is not None:
+                self.silence_seconds += t - open_start
+                current_pos = max(current_pos, t)
+                open_start = None
+        self.total_duration = get_audio_duration(self.input_path)
+        if open_start is not None:
+            # Silence runs to the end of the file
+            self.silence_seconds += max(self.total_duration - open_start, 0.0)
+        elif current_pos < self.total_duration:
+            yield (current_pos, self.total_duration)
+
+    def segment_list(self, pad=0.0, merge_gap=0.0, min_length=0.0):
+        """All segments after detection finished, shaped (see SegmentList.shape)."""
+        segments = SegmentList.from_pairs(self.segments())
+        return segments.shape(self.total_duration, pad, merge_gap, min_length)
+
+    def planned(self, pad=0.0, merge_gap=0.0, min_length=0.0):
+        """segments() (streaming) when nothing is shaped, else segment_list()."""
+        if pad or merge_gap or min_length:
+            return self.segment_list(pad, merge_gap, min_length)
+        return self.segments()
+
+
+def shape_params(params, pad=0.0, merge_gap=0.0, min_segment=0.0):
+    """Add the segment clean-up options that are in use to a tool's result-cache params."""
+    for name, value in (("pad", pad), ("merge_gap", merge_gap), ("min_segment", min_segment)):
+        if value:
+            params[name] = value
+    return params
+
+
+def get_audio_duration(input_path):
+    """Media duration in seconds (MP3 headers when conclusive, else ffprobe)."""
+    return duration_seconds(input_path)
+
+
+def silence_intervals(silence_starts, silence_ends, total_duration):
+    """Pair starts/ends into (start, end) tuples; an open silence runs to total_duration."""
+    intervals = []
+    for i, start in enumerate(silence_starts):
+        end = silence_ends[i] if i < len(silence_ends) else total_duration
+        intervals.append((start, min(end, total_duration)))
+    return intervals
+
+
+def nonsilent_segments(silence_starts, silence_ends, total_duration):
+    """The ranges between silences, in order, as a SegmentList."""
+    return SegmentList.from_silences(silence_starts, silence_ends, total_duration)
+
+
+def remove_silence_stream(input_path, output_path, silence_duration=2.0, silence_threshold=-30, input_format=None):
+    """
+    Remove silences in a single ffmpeg pass (silenceremove), reading and writing
+    "-" directly. Like the detect-then-copy path, only silences of at least
+    silence_duration are removed, wherever they are (start_periods=0: nothing is
+    trimmed before the first sound; stop_periods=-1: every long silence, the
+    leading one included, is cut whole). Nothing is cut at known times, so the
+    audio is re-encoded (VBR -q:a 2) instead of stream-copied; used only when
+    both ends are pipes.
+    """
+    level = f"{silence_threshold}dB"
+    cmd = [
+        get_ffmpeg(), *thread_args(), "-y", "-hide_banner", "-loglevel", "error",
+        *input_args(input_path, input_format),
+        "-vn",
+        "-af", f"silenceremove=start_periods=0:stop_periods=-1:stop_duration={silence_duration}"
+               f":stop_threshold={level}:stop_silence=0:detection=peak",
+        "-c:a", "libmp3lame", "-q:a", "2", *encoder_thread_args(),
+    ]
+    subprocess.run(cmd + output_args(output_path, ".mp3"), check=True)
+
+
+def remove_with_streams(tool, input_path, output_path, silence_duration, silence_threshold,
+                        normalize=False, mode="level", input_format=None, shaped=False):
+    """
+    "-" endpoints for the silence removal tools. With both ends on pipes, level
+    mode with a fixed threshold runs straight through (remove_silence_stream).
+    Everything else (a file on either side, segment clean-up with shaped=True,
+    auto threshold, normalize) goes through real files: stdin is spooled to a
+    temporary file and tool(src, dst) runs the usual detect-then-copy path, dst
+    being copied to stdout when it is "-". A file output is then the same as
+    from a file input.
+    """
+    if is_stream(output_path):
+        stdout_is_data()
+    if (is_stream(input_path) and is_stream(output_path)
+            and mode == "level" and silence_threshold != "auto" and not normalize and not shaped
+            and not needs_file(input_path, input_format)):
+        remove_silence_stream(input_path, output_path, silence_duration, silence_threshold, input_format)
+        return
+    with spooled_input(input_path, input_format or "mp3") as src:
+        with file_output(output_path, os.path.splitext(src)[1]) as dst:
+            tool(src, dst)
@@ -0,0 +1,212 @@
+"""
+Local staging for inputs on slow or network storage (batch_convert --staging).
+
+ffmpeg reads its input in many small, seeking requests: one -ss per segment in
+the silence tools, two passes in split_middle_overlap, the moov box at the end
+of an MP4. Over a network share each of those is a round trip. With staging,
+every input is first copied to local scratch in large sequential reads
+(COPY_CHUNK) and the tool runs on the copy; its outputs land next to the copy
+and are written back to the input's folder in one sequential copy each when
+the job is done, then the scratch files are deleted.
+
+- Copies run ahead: while jobs run, the next queued inputs are copied by
+  COPY_THREADS background threads (prefetch), as far as the budget allows.
+- The scratch space is bounded by limit_bytes (staged inputs; outputs only
+  live there until their job ends). A job that needs room first drops
+  prefetched copies nobody is using yet, then waits for running jobs to
+  release theirs. An input larger than the whole budget runs in place.
+- Copies keep the original name and mtime, so output names stay the same and
+  the split checkpoint (tied to size + mtime) still matches. The tools' result
+  cache keys on content, not the path, so it matches the copy too. A current
+  <base>.analysis.json is staged along with its input.
+- Written-back files appear under a temporary name and are renamed into place,
+  a parts folder's .checkpoint.json last, so the batch's skip rules never see
+  a half-copied output.
+
+Besides paths, a Stager takes _archive.ZipMember objects: their members are
+extracted on demand into the same bounded space (a ZIP given to batch_convert).
+A member cannot run in place, so one larger than the budget is an error.
+"""
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+DEFAULT_LIMIT_MB = 4096
+COPY_CHUNK = 8 << 20
+COPY_THREADS = 2
+# Written last into a folder output (see _checkpoint)
+_LAST_NAMES = (".checkpoint.json",)
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def _is_path(src):
+    return isinstance(src, (str, os.PathLike))
+
+
+def _key(src):
+    return Path(src) if _is_path(src) else src
+
+
+def _size(src):
+    return os.stat(src).st_size if _is_path(src) else src.size
+
+
+def _copy(src, dst, cancelled=None):
+    """Sequential copy in COPY_CHUNK reads, keeping the source's timestamps."""
+    with (open(src, "rb", buffering=0) if _is_path(src) else src.open()) as fin, open(dst, "wb") as fout:
+        while True:
+            if cancelled is not None and cancelled.is_set():
+                raise _Cancelled()
+            block = fin.read(COPY_CHUNK)
+            if not block:
+                break
+            fout.write(block)
+    if _is_path(src):
+        shutil.copystat(src, dst)
+    else:
+        os.utime(dst, (src.mtime, src.mtime))
+
+
+def _publish(src, dst):
+    """Copy src to dst under a temporary name, then rename it into place."""
+    tmp = dst.with_name(f"{dst.name}.{os.getpid()}.staging")
+    try:
+        _copy(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+class _Entry:
+    __slots__ = ("dir", "local", "size", "future", "cancelled", "in_use")
+
+    def __init__(self, directory, local, size):
+        self.dir = directory
+        self.local = local
+        self.size = size
+        self.future = None
+        self.cancelled = threading.Event()
+        self.in_use = False
+
+
+class Stager:
+    """Bounded local copies of batch inputs; thread-safe."""
+
+    def __init__(self, limit_bytes=DEFAULT_LIMIT_MB << 20, scratch_dir=None):
+        self.limit = limit_bytes
+        self.root = Path(tempfile.mkdtemp(prefix="staging_", dir=scratch_dir))
+        self._cond = threading.Condition()
+        self._used = 0
+        self._entries = {}
+        self._count = 0
+        self._pool = ThreadPoolExecutor(max_workers=COPY_THREADS)
+
+    def _start(self, path, size):
+        """Reserve room and begin copying path (lock held)."""
+        self._count += 1
+        directory = self.root / str(self._count)
+        entry = _Entry(directory, directory / path.name, size)
+        self._used += size
+        self._entries[path] = entry
+        entry.future = self._pool.submit(self._fill, path, entry)
+        return entry
+
+    def _fill(self, path, entry):
+        entry.dir.mkdir()
+        _copy(path, entry.local, entry.cancelled)
+        if not _is_path(path):
+            return
+        from _analysis import analysis_path
+        sidecar = Path(analysis_path(str(path)))
+        if sidecar.is_file():
+            _copy(sidecar, Path(analysis_path(str(entry.local))))
+
+    def _drop(self, path):
+        """Forget an entry and free its room (lock held)."""
+        entry = self._entries.pop(path)
+        entry.cancelled.set()
+        self._used -= entry.size
+
+        def remove(_):
+            shutil.rmtree(entry.dir, ignore_errors=True)
+        entry.future.add_done_callback(remove)
+        self._cond.notify_all()
+
+    def prefetch(self, path):
+        """Start copying path in the background if it fits now (never blocks)."""
+        path = _key(path)
+        try:
+            size = _size(path)
+        except OSError:
+            return
+        with self._cond:
+            if path not in self._entries and self._used + size <= self.limit:
+                self._start(path, size)
+
+    def acquire(self, path):
+        """
+        Local copy of path for a job, copying it now if it was not prefetched;
+        the path itself when it cannot be staged. Pair with release(path).
+        """
+        path = _key(path)
+        size = _size(path)
+        if size > self.limit:
+            if not _is_path(path):
+                raise OSError(f"{path.name} is larger than the staging space")
+            print(f"Staging: {path.name} is larger than the staging space; running in place.")
+            return path
+        with self._cond:
+            entry = self._entries.get(path)
+            while entry is None:
+                if self._used + size <= self.limit:
+                    entry = self._start(path, size)
+                    break
+                idle = [p for p, e in self._entries.items() if not e.in_use]
+                if idle:
+                    self._drop(idle[-1])  # the prefetch furthest ahead
+                    continue
+                self._cond.wait()
+            entry.in_use = True
+        try:
+            entry.future.result()
+        except (OSError, _Cancelled) as e:
+            self.release(path)
+            if not _is_path(path):
+                raise OSError(f"extracting {path.name} failed ({e})")
+            print(f"Staging failed for {path.name} ({e}); running in place.")
+            return path
+        return entry.local
+
+    def write_back(self, outputs, dest_dir):
+        """Copy a job's local outputs (files or folders) into dest_dir."""
+        dest_dir = Path(dest_dir)
+        for out in map(Path, outputs):
+            if out.is_file():
+                _publish(out, dest_dir / out.name)
+            elif out.is_dir():
+                target = dest_dir / out.name
+                target.mkdir(exist_ok=True)
+                files = sorted((p for p in out.iterdir() if p.is_file()), key=lambda p: p.name in _LAST_NAMES)
+                for p in files:
+                    _publish(p, target / p.name)
+
+    def release(self, path):
+        """The job on path is done: delete its local copy and outputs."""
+        path = _key(path)
+        with self._cond:
+            if path in self._entries:
+                self._drop(path)
+
+    def close(self):
+        with self._cond:
+            for path in list(self._entries):
+                self._drop(path)
+        self._pool.shutdown(wait=True)
+        shutil.rmtree(self.root, ignore_errors=True)
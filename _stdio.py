@@ -0,0 +1,104 @@
+"""
+"-" as input or output path: lets the tools sit in shell pipelines.
+
+    curl -s https://.../talk.mp4 | convert_mp4_to_mp3.py - -o - | remove_silence.py - -o - > talk.mp3
+
+ffmpeg reads the inherited stdin (pipe:0) / writes the inherited stdout (pipe:1)
+directly, so media never passes through Python. With a pipe the format cannot
+be guessed from a file name: --input-format names the input container (mp4,
+mp3, ...); the output format is the tool's own (mp3, ogg).
+
+Steps that must seek or know the duration up front (MP4 with the index at the
+end, silence detection passes, two-pass loudnorm, splitting) get a temporary
+file instead: spooled_input() copies stdin to disk first, and an output that
+can only be produced as a file is copied to stdout when done.
+"""
+import os
+import shutil
+import sys
+from contextlib import contextmanager
+
+STREAM = "-"
+# Containers ffmpeg cannot demux from a pipe in general (the moov index may sit at the end)
+SEEK_FORMATS = {"mp4", "m4a", "mov", "3gp", "m4v"}
+# ffmpeg muxer per output extension
+MUXERS = {".mp3": "mp3", ".ogg": "ogg", ".m4a": "ipod", ".mp4": "mp4", ".wav": "wav"}
+_COPY_BLOCK = 1 << 20
+
+
+def is_stream(path):
+    return path == STREAM
+
+
+def pop_option(args, *names):
+    """Remove `--name value` from an argv list and return value (None when absent)."""
+    for i, a in enumerate(args):
+        if a in names and i + 1 < len(args):
+            value = args[i + 1]
+            del args[i:i + 2]
+            return value
+    return None
+
+
+def stdout_is_data():
+    """stdout carries media from now on: send prints (and the context-menu log tee) to stderr."""
+    sys.stdout = sys.stderr
+
+
+def input_args(path, fmt=None):
+    """ffmpeg arguments for reading `path` ("-" = stdin, with an explicit format when given)."""
+    if is_stream(path):
+        return (["-f", fmt] if fmt else []) + ["-i", "pipe:0"]
+    return ["-i", path]
+
+
+def output_args(path, ext):
+    """ffmpeg output target: the file, or stdout with the muxer for `ext` ('.mp3', '.ogg', ...)."""
+    if is_stream(path):
+        return ["-f", MUXERS.get(ext, ext.lstrip(".")), "pipe:1"]
+    return [path]
+
+
+def needs_file(path, fmt):
+    """True when a stdin input has to be spooled because its container needs seeking."""
+    return is_stream(path) and (fmt or "").lower() in SEEK_FORMATS
+
+
+@contextmanager
+def spooled_input(path, fmt=None):
+    """Yield a real file path for `path`; stdin is copied to a temporary file first."""
+    if not is_stream(path):
+        yield path
+        return
+    import tempfile  # only on the spooling path; keeps the converters' cold start light
+    fd, tmp = tempfile.mkstemp(suffix="." + (fmt or "bin"))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            shutil.copyfileobj(sys.stdin.buffer, f, _COPY_BLOCK)
+        yield tmp
+    finally:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+@contextmanager
+def file_output(path, ext):
+    """
+    Yield a real output path for `path`. For "-" this is a temporary file whose
+    content is written to stdout when the block completes without error.
+    """
+    if not is_stream(path):
+        yield path
+        return
+    import tempfile
+    tmp_dir = tempfile.mkdtemp()
+    tmp = os.path.join(tmp_dir, "output" + ext)
+    try:
+        yield tmp
+        with open(tmp, "rb") as f:
+            shutil.copyfileobj(f, sys.__stdout__.buffer, _COPY_BLOCK)
+        sys.__stdout__.buffer.flush()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
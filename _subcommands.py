@@ -0,0 +1,32 @@
+"""
+The tools behind "mediatools <subcommand>": one table for mediatools itself,
+the context-menu entries setup.py writes and the per-file commands of
+batch_convert in EXE builds. No imports: mediatools reads it on the cold-start
+path of every click.
+"""
+
+# subcommand -> (tool folder, module name, short help)
+SUBCOMMANDS = {
+    "to-mp3": ("convert-mp4-to-mp3", "convert_mp4_to_mp3", "Convert .mp4/.m4a to MP3"),
+    "to-ogg": ("convert-to-ogg", "convert_to_ogg", "Convert media to OGG 48 kHz"),
+    "split-mid": ("split-mp4-middle", "split_middle_overlap", "Split at midpoint with 1s overlap"),
+    "remove-silence": ("remove-silence-mp3", "remove_silence", "Remove silences of 2s+"),
+    "remove-long-silence": ("remove-long-silence-mp3", "remove_long_silence", "Remove silences of 5s+"),
+    "split-silence": ("split-on-silence-mp3", "split_on_silence", "Split into parts on silence"),
+    "pipeline": ("media-pipeline", "media_pipeline", "Convert + remove silence + split in one pass"),
+    "analyze": ("analyze-audio", "analyze_audio", "Silences, loudness, peaks and clipping in one decode"),
+    "batch": ("batch-convert", "batch_convert", "Process every file in a folder"),
+}
+
+# Tool scripts without a subcommand of their own, run through another one
+_ALIASES = {
+    "convert_m4a_to_mp3": "to-mp3",
+}
+
+
+def subcommand_for(script_stem):
+    """mediatools subcommand that runs a tool script (by file stem), or None."""
+    for name, (_, module, _) in SUBCOMMANDS.items():
+        if module == script_stem:
+            return name
+    return _ALIASES.get(script_stem)
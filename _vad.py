@@ -0,0 +1,188 @@
+"""
+Voice activity detection for the silence tools (--mode vad).
+
+A plain level threshold counts room hum, music beds and breathing as sound.
+Here ffmpeg decodes to 16 kHz mono PCM on a pipe and every 20 ms frame gets
+three features, computed for whole blocks of frames at once with NumPy:
+
+  energy      frame level in dBFS, compared with a running noise floor
+  flatness    spectral flatness of 300-4000 Hz (noise ~1, voiced speech low);
+              hum below 300 Hz does not count
+  zcr         zero-crossing rate (hum ~0, hiss and breath high)
+
+A frame is speech when it is clearly above the floor, not noise-like and its
+zero-crossing rate is in the speech range. Speech bursts shorter than
+MIN_SPEECH are ignored and every speech stretch keeps PAD seconds on each side.
+The output is the same silence start/end events as ffmpeg silencedetect, so
+SilenceScan and the tools use it unchanged.
+
+NumPy is optional: only this mode needs it.
+"""
+import subprocess
+
+from _ffmpeg_config import get_ffmpeg, thread_args
+
+SAMPLE_RATE = 16000
+FRAME = 512                 # 32 ms analysis window
+HOP = 320                   # 20 ms between frames
+BLOCK_SECONDS = 30          # PCM read and classified per batch
+SPEECH_BAND = (300, 4000)   # Hz, for spectral flatness
+
+ENERGY_MARGIN_DB = 4.0      # above the running noise floor
+ABSOLUTE_FLOOR_DB = -55.0   # never speech below this
+FLATNESS_MAX = 0.45
+ZCR_RANGE = (0.005, 0.45)
+NOISE_PERCENTILE = 10       # per block, smoothed across blocks
+MIN_SPEECH = 0.12           # s
+PAD = 0.15                  # s kept around speech
+
+
+def available():
+    """True when NumPy can be imported."""
+    try:
+        _numpy()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("VAD mode needs NumPy: pip install numpy") from None
+    return numpy
+
+
+def _pcm_blocks(input_path):
+    """Yield int16 sample blocks of the decoded mono 16 kHz audio."""
+    np = _numpy()
+    cmd = [
+        get_ffmpeg(), *thread_args(), "-hide_banner", "-loglevel", "error",
+        "-i", input_path, "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE),
+        "-f", "s16le", "-",
+    ]
+    block_bytes = SAMPLE_RATE * BLOCK_SECONDS * 2
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE) as proc:
+        try:
+            while True:
+                data = proc.stdout.read(block_bytes)
+                if not data:
+                    break
+                yield np.frombuffer(data[:len(data) // 2 * 2], dtype="<i2")
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+
+class _Classifier:
+    """Frame features and speech/non-speech labels, one block of frames at a time."""
+
+    def __init__(self):
+        np = _numpy()
+        self.np = np
+        self.window = np.hanning(FRAME).astype(np.float32)
+        freqs = np.fft.rfftfreq(FRAME, 1.0 / SAMPLE_RATE)
+        self.band = (freqs >= SPEECH_BAND[0]) & (freqs <= SPEECH_BAND[1])
+        self.floor_db = None
+
+    def labels(self, samples):
+        """Boolean speech label per frame of `samples` (float32, len >= FRAME)."""
+        np = self.np
+        frames = np.lib.stride_tricks.sliding_window_view(samples, FRAME)[::HOP]
+        energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+
+        power = np.abs(np.fft.rfft(frames * self.window, axis=1)) ** 2
+        band = power[:, self.band] + 1e-12
+        flatness = np.exp(np.mean(np.log(band), axis=1)) / np.mean(band, axis=1)
+
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (FRAME - 1)
+
+        block_floor = float(np.percentile(energy_db, NOISE_PERCENTILE))
+        if self.floor_db is None:
+            self.floor_db = block_floor
+        else:
+            # follow a quieter floor at once, a louder one slowly (a long speech block is not noise)
+            self.floor_db = min(block_floor, 0.8 * self.floor_db + 0.2 * block_floor)
+        return (
+            (energy_db > max(self.floor_db + ENERGY_MARGIN_DB, ABSOLUTE_FLOOR_DB))
+            & (flatness < FLATNESS_MAX)
+            & (zcr > ZCR_RANGE[0]) & (zcr < ZCR_RANGE[1])
+        )
+
+
+def _runs(np, labels, first_frame):
+    """(is_speech, start_s, end_s) for each run of equal labels."""
+    edges = np.flatnonzero(labels[1:] != labels[:-1]) + 1
+    bounds = np.concatenate(([0], edges, [len(labels)]))
+    step = HOP / SAMPLE_RATE
+    for a, b in zip(bounds.tolist()[:-1], bounds.tolist()[1:]):
+        yield bool(labels[a]), (first_frame + a) * step, (first_frame + b) * step
+
+
+def iter_vad_events(input_path, silence_duration=2.0):
+    """Yield ("start", t) / ("end", t) for non-speech stretches of at least silence_duration."""
+    np = _numpy()
+    classifier = _Classifier()
+    in_silence = False
+    quiet_since = None      # start of the current non-speech stretch (while in speech)
+    pending = None          # last run of a block; may continue in the next block
+    carry = np.zeros(0, dtype=np.float32)
+    frame_index = 0
+
+    def feed(is_speech, start, end):
+        nonlocal in_silence, quiet_since
+        if not in_silence:
+            if not is_speech:
+                if quiet_since is None:
+                    quiet_since = start
+                if end - quiet_since >= silence_duration + 2 * PAD:
+                    in_silence = True
+                    return ("start", quiet_since + PAD)
+            elif end - start >= MIN_SPEECH:
+                quiet_since = None
+        elif is_speech and end - start >= MIN_SPEECH:
+            in_silence = False
+            quiet_since = None
+            return ("end", max(start - PAD, 0.0))
+        return None
+
+    for block in _pcm_blocks(input_path):
+        samples = np.concatenate((carry, block.astype(np.float32) / 32768.0))
+        if len(samples) < FRAME:
+            carry = samples
+            continue
+        labels = classifier.labels(samples)
+        n = len(labels)
+        # keep the samples the next block's frames still need
+        carry = samples[n * HOP:]
+        for run in _runs(np, labels, frame_index):
+            if pending is not None:
+                if pending[0] == run[0]:
+                    run = (run[0], pending[1], run[2])
+                else:
+                    event = feed(*pending)
+                    if event:
+                        yield event
+            pending = run
+        frame_index += n
+
+    if pending is not None:
+        event = feed(*pending)
+        if event:
+            yield event
+    # A quiet tail reaching the end of the file needs no trailing pad
+    end = frame_index * HOP / SAMPLE_RATE
+    if not in_silence and quiet_since is not None and end - quiet_since >= silence_duration + PAD:
+        yield ("start", quiet_since + PAD)
+
+
+def detect_vad(input_path, silence_duration=2.0):
+    """(silence_starts, silence_ends) like _silence.detect_silence, from the VAD."""
+    starts, ends = [], []
+    for kind, t in iter_vad_events(input_path, silence_duration):
+        (starts if kind == "start" else ends).append(t)
+    return starts, ends
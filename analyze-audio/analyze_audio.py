@@ -0,0 +1,75 @@
+"""
+Analyse a media file in one decode: silences, integrated loudness, waveform
+peaks and clipping, written to <base>.analysis.json (see _analysis).
+
+    python analyze_audio.py talk.mp3 --threshold -30 --threshold -40 --peaks-per-second 50
+
+The silence tools reuse the stored silences in level mode (same threshold,
+silence length >= 0.5 s) instead of decoding the file again; the "peaks" entry
+is audiowaveform JSON for the web player.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+from _analysis import PEAKS_PER_SECOND, THRESHOLDS, analyze, available, write_analysis
+from _ffmpeg_config import setup_context_menu_log
+from _governor import apply as apply_governor
+from _stdio import is_stream, spooled_input, stdout_is_data
+
+
+def analyze_audio(input_path, thresholds=THRESHOLDS, peaks_per_second=PEAKS_PER_SECOND, output=None, input_format=None):
+    if is_stream(input_path):
+        if output is None:
+            print("Reading from stdin (-) needs an output: -o file.analysis.json or -o -")
+            sys.exit(1)
+        with spooled_input(input_path, input_format) as src:
+            return analyze_audio(src, thresholds, peaks_per_second, output)
+    if is_stream(output):
+        stdout_is_data()
+    print(f"Analysing: {input_path}")
+    result = analyze(input_path, thresholds, peaks_per_second)
+    if is_stream(output):
+        sys.__stdout__.write(json.dumps(result, separators=(",", ":")) + "\n")
+    else:
+        output = write_analysis(input_path, result, output)
+    loudness = result["loudness"]["integrated"]
+    clipping = result["clipping"]
+    peak = clipping["peak_db"]
+    print(f"Duration: {result['duration']:.2f}s")
+    print("Integrated loudness: " + ("-" if loudness is None else f"{loudness:.1f} LUFS"))
+    print("Sample peak: " + ("-" if peak is None else f"{peak:.2f} dBFS")
+          + f", clipped samples: {clipping['clipped_samples']} in {clipping['clip_events']} stretch(es)")
+    for threshold, flat in result["silence"]["thresholds"].items():
+        print(f"Silences below {threshold} dB: {len(flat) // 2}")
+    if not is_stream(output):
+        print(f"Created: {output}")
+
+
+def main():
+    setup_context_menu_log()
+    apply_governor()
+    ap = argparse.ArgumentParser(description="Silences, loudness, waveform peaks and clipping in one decode.")
+    ap.add_argument("input", help="Input media file, or - for stdin")
+    ap.add_argument("-o", "--output", help="Results file (default <base>.analysis.json; - for stdout)")
+    ap.add_argument("--input-format", help="Input container when reading stdin (mp4, mp3, ...)")
+    ap.add_argument("--threshold", type=float, action="append",
+                    help="Silence threshold in dB; repeat for several (default -30)")
+    ap.add_argument("--peaks-per-second", type=int, default=PEAKS_PER_SECOND,
+                    help=f"Waveform resolution (default {PEAKS_PER_SECOND})")
+    args = ap.parse_args()
+    if not available():
+        print("Analysis needs numpy: pip install numpy")
+        sys.exit(1)
+    if args.peaks_per_second <= 0:
+        print("--peaks-per-second must be positive")
+        sys.exit(1)
+    analyze_audio(args.input, args.threshold or THRESHOLDS, args.peaks_per_second, args.output, args.input_format)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,27 @@ Batch convert all supported files in a folder. No interaction; skips files that
 Right-click folder -> one of the batch menu options.
 """
 import argparse
+import os
+import shutil
+import struct
+import subprocess
 import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 
 _root = Path(__file__).resolve().parent.parent
 if str(_root) not in sys.path:
     sys.path.insert(0, str(_root))
+import _cache
+import _governor
+import _result_cache
+from _checkpoint import is_complete
 from _ffmpeg_config import setup_context_menu_log
+from _subcommands import subcommand_for
 
 # (extensions, script_path, output_exists_func)
 # output_exists_func(f: Path) -> bool
@@ -42,9 +56,15 @@ ACTIONS = {
     ),
     "split_on_silence": (
         [".mp3"],
-        lambda p: (p.parent / (p.stem + "_parts")).is_dir(),
+        # done only when the parts folder's checkpoint says every part was written
+        lambda p: is_complete(p.parent / (p.stem + "_parts")),
         _root / "split-on-silence-mp3" / "split_on_silence.py",
     ),
+    "analyze": (
+        [".mp3", ".mp4", ".m4a"],
+        lambda p: (p.parent / (p.stem + ".analysis.json")).exists(),
+        _root / "analyze-audio" / "analyze_audio.py",
+    ),
 }
 
 MP3_SCRIPT_BY_EXT = {
@@ -52,46 +72,812 @@ MP3_SCRIPT_BY_EXT = {
     ".m4a": _root / "convert-m4a-to-mp3" / "convert_m4a_to_mp3.py",
 }
 
+def _tool_command(script: Path, f: Path) -> list:
+    """Command line for one file: python + script, or mediatools.exe + subcommand when frozen."""
+    if getattr(sys, "frozen", False):
+        mediatools = Path(sys.executable).resolve().parent / "mediatools.exe"
+        return [str(mediatools), subcommand_for(script.stem), str(f)]
+    return [sys.executable, str(script), str(f)]
+
+
+# Per-action outputs for one input (used for cost history and the planner)
+OUTPUTS = {
+    "mp3": lambda p: [p.parent / (p.stem + ".mp3")],
+    "ogg": lambda p: [p.parent / (p.stem + ".ogg")],
+    "split_midpoint": lambda p: [p.parent / (p.stem + "_part1" + p.suffix), p.parent / (p.stem + "_part2" + p.suffix)],
+    "remove_silence": lambda p: [p.parent / (p.stem + "_no_silence.mp3")],
+    "remove_long_silence": lambda p: [p.parent / (p.stem + "_no_long_silence.mp3")],
+    "split_on_silence": lambda p: [p.parent / (p.stem + "_parts")],
+    "analyze": lambda p: [p.parent / (p.stem + ".analysis.json")],
+}
+
+# Parameters the tools run with when called by the batch (their defaults); must
+# match what each tool passes to _result_cache so earlier results are found.
+TOOL_PARAMS = {
+    "mp3": {},
+    "ogg": {},
+    "split_midpoint": {},
+    "remove_silence": {"silence_duration": 2.0, "threshold": -30.0, "normalize": False},
+    "remove_long_silence": {"silence_duration": 5.0, "threshold": -30.0, "normalize": False},
+    "split_on_silence": {"silence_duration": 2.0, "threshold": -30.0, "normalize": False},
+    "analyze": {},
+}
+
+# Cost model used until this machine has history for an action:
+# speed = media seconds processed per wall second by one job;
+# output size = bytes per media second ("rate", encoders) or fraction of input bytes ("ratio", stream copy).
+DEFAULT_COST = {
+    "mp3": {"speed": 30.0, "rate": 16000.0},
+    "ogg": {"speed": 25.0, "rate": 16000.0},
+    "split_midpoint": {"speed": 300.0, "ratio": 1.0},
+    "remove_silence": {"speed": 40.0, "ratio": 0.9},
+    "remove_long_silence": {"speed": 40.0, "ratio": 0.9},
+    "split_on_silence": {"speed": 40.0, "ratio": 0.9},
+    "analyze": {"speed": 60.0, "rate": 200.0},
+}
+THROUGHPUT_CACHE = "throughput"
+
+
+def _script_for(action: str, f: Path):
+    if action == "mp3":
+        return MP3_SCRIPT_BY_EXT.get(f.suffix.lower())
+    return ACTIONS[action][2]
+
+
+def select_files(folder_path: Path, action: str):
+    """(to_process, skipped) for a folder, using the action's extensions and skip rule."""
+    exts, output_exists, _ = ACTIONS[action]
+    files = sorted(f for f in folder_path.iterdir() if f.is_file() and f.suffix.lower() in exts)
+    to_process = [f for f in files if not output_exists(f)]
+    skipped = [f for f in files if output_exists(f)]
+    return to_process, skipped
+
+
+def _output_bytes(action: str, f: Path) -> int:
+    total = 0
+    for out in OUTPUTS[action](f):
+        if out.is_dir():
+            total += sum(p.stat().st_size for p in out.iterdir() if p.is_file())
+        elif out.exists():
+            total += out.stat().st_size
+    return total
+
+
+def _probe_duration(f: Path):
+    from _silence import get_audio_duration
+    try:
+        return get_audio_duration(str(f))
+    except Exception:
+        return None
+
+
+def action_cost(action: str) -> dict:
+    """Speed and output-size factors: measured history on this machine, else DEFAULT_COST."""
+    cost = dict(DEFAULT_COST[action])
+    h = _cache.get(THROUGHPUT_CACHE, action)
+    if h and h.get("wall_seconds", 0) > 0 and h.get("media_seconds", 0) > 0:
+        cost["speed"] = h["media_seconds"] / h["wall_seconds"]
+        if "rate" in cost:
+            cost["rate"] = h["output_bytes"] / h["media_seconds"]
+        elif h.get("input_bytes"):
+            cost["ratio"] = h["output_bytes"] / h["input_bytes"]
+        cost["runs"] = h.get("runs", 0)
+    return cost
+
+
+def record_throughput(action: str, media_seconds: float, wall_seconds: float, input_bytes: int, output_bytes: int) -> None:
+    """Add one finished job to the action's throughput history."""
+    def add(h):
+        h = h or {"media_seconds": 0.0, "wall_seconds": 0.0, "input_bytes": 0, "output_bytes": 0, "runs": 0}
+        h["media_seconds"] += media_seconds
+        h["wall_seconds"] += wall_seconds
+        h["input_bytes"] += input_bytes
+        h["output_bytes"] += output_bytes
+        h["runs"] += 1
+        return h
+    # jobs finish on several worker threads at once
+    _cache.update(THROUGHPUT_CACHE, action, add)
+
+
+def predict_wall_seconds(job_seconds, workers: int) -> float:
+    """Makespan of longest-job-first scheduling on `workers` parallel slots."""
+    slots = [0.0] * max(1, workers)
+    for t in sorted(job_seconds, reverse=True):
+        i = slots.index(min(slots))
+        slots[i] += t
+    return max(slots) if job_seconds else 0.0
+
+
+def _hms(seconds: float) -> str:
+    seconds = int(round(seconds))
+    return f"{seconds // 3600:d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
 
-def run_batch(folder_path: Path, action: str) -> None:
+def plan_batch(folder_path: Path, action: str, workers: int = 1) -> None:
+    """Dry run: list files, probe durations and predict wall time and output size. Runs nothing."""
+    to_process, skipped = select_files(folder_path, action)
+    cost = action_cost(action)
+    source = f"history of {cost['runs']} run(s)" if cost.get("runs") else "defaults (no history yet)"
+    print(f"Plan for --action {action} in {folder_path}")
+    print(f"Cost model: {cost['speed']:.1f}x realtime per job, from {source}")
+    for f in skipped:
+        print(f"  skip     {f.name} (output already exists)")
+    job_seconds = []
+    total_media = 0.0
+    total_out = 0.0
+    unknown = 0
+    for f in to_process:
+        if not _script_for(action, f):
+            print(f"  skip     {f.name} (no tool for {f.suffix})")
+            continue
+        duration = _probe_duration(f)
+        size = f.stat().st_size
+        if duration is None:
+            unknown += 1
+            print(f"  process  {f.name} (duration unknown)")
+            continue
+        total_media += duration
+        job_seconds.append(duration / cost["speed"])
+        total_out += cost["rate"] * duration if "rate" in cost else cost["ratio"] * size
+        print(f"  process  {f.name} ({_hms(duration)})")
+    wall = predict_wall_seconds(job_seconds, workers)
+    print(f"Files: {len(job_seconds) + unknown} to process, {len(skipped)} skipped")
+    print(f"Media duration: {_hms(total_media)}")
+    print(f"Predicted wall time with {workers} worker(s): {_hms(wall)}"
+          + (f" (+{unknown} file(s) of unknown duration)" if unknown else ""))
+    print(f"Estimated output: {total_out / 1e6:.1f} MB")
+    free = shutil.disk_usage(folder_path).free
+    if total_out > free:
+        print(f"WARNING: only {free / 1e6:.1f} MB free on the target disk.")
+
+
+def _run_one(action: str, script: Path, f: Path, control=None, stager=None):
+    """
+    Run the tool on one file and record its throughput. Returns None or an error message.
+    With a _governor.JobControl the run waits while the batch is paused and can be suspended.
+    With a _staging.Stager the tool runs on a local copy and its outputs are copied back.
+    """
+    # Same content processed before (another folder or name): no tool process at all
+    if _result_cache.serve(f, action, TOOL_PARAMS[action], OUTPUTS[action](f)):
+        print(f"Reused earlier result: {f.name}")
+        return None
+    t0 = time.perf_counter()
+    try:
+        src = stager.acquire(f) if stager is not None else f
+        cmd = _tool_command(script, src)
+        if control is not None:
+            control.run(cmd)
+        else:
+            subprocess.run(cmd, check=True)
+        if src != f:
+            stager.write_back(OUTPUTS[action](src), f.parent)
+    except subprocess.CalledProcessError as e:
+        return f"Failed: {f.name} - {e}"
+    except Exception as e:
+        return f"Error: {f.name} - {e}"
+    finally:
+        if stager is not None:
+            stager.release(f)
+    wall = time.perf_counter() - t0
+    # Some tools report errors but exit 0; only learn from runs that produced output
+    out_bytes = _output_bytes(action, f)
+    duration = _probe_duration(f) if out_bytes else None
+    if duration:
+        record_throughput(action, duration, wall, f.stat().st_size, out_bytes)
+    return None
+
+
+# Jobs running at once against one storage device (spinning disks and USB drives
+# thrash when read in parallel). Override with "device_concurrency" in config.json:
+# a number, or {"default": 2, "E:\\": 1} with per-drive/mount-point caps.
+DEFAULT_DEVICE_CONCURRENCY = 2
+# Read-ahead for the next input on a device while the current one is encoding
+PREFETCH_BYTES = 256 << 20
+_PREFETCH_CHUNK = 4 << 20
+
+
+def _device_caps(per_device=None):
+    """(default cap, {st_dev: cap}) from --per-device and config.json."""
+    from _ffmpeg_config import _load_config
+    conf = _load_config().get("device_concurrency", DEFAULT_DEVICE_CONCURRENCY)
+    caps = {}
+    if isinstance(conf, dict):
+        default = conf.get("default", DEFAULT_DEVICE_CONCURRENCY)
+        for mount, cap in conf.items():
+            if mount == "default":
+                continue
+            try:
+                # a cap of 0 would leave that device's files queued forever
+                caps[os.stat(mount).st_dev] = max(1, int(cap))
+            except (OSError, TypeError, ValueError):
+                print(f"Ignoring device_concurrency entry: {mount}")
+    else:
+        default = conf
+    if per_device is not None:
+        default = per_device
+    try:
+        default = max(1, int(default))
+    except (TypeError, ValueError):
+        default = DEFAULT_DEVICE_CONCURRENCY
+    return default, caps
+
+
+def _prefetch(path: Path) -> None:
+    """Pull the start of a file into the OS page cache (best effort, runs in the background)."""
+    def read_ahead():
+        try:
+            with open(path, "rb", buffering=0) as f:
+                if hasattr(os, "posix_fadvise"):
+                    os.posix_fadvise(f.fileno(), 0, PREFETCH_BYTES, os.POSIX_FADV_WILLNEED)
+                    return
+                # Windows: a plain sequential read fills the standby cache
+                remaining = PREFETCH_BYTES
+                while remaining > 0 and f.read(min(_PREFETCH_CHUNK, remaining)):
+                    remaining -= _PREFETCH_CHUNK
+        except OSError:
+            pass
+    threading.Thread(target=read_ahead, daemon=True).start()
+
+
+def run_jobs(action: str, jobs, workers: int = 1, per_device=None, stager=None) -> int:
+    """
+    Run (file, script) jobs with at most `workers` at once and at most the device cap
+    per storage device (st_dev). When a job starts, the next queued file on the same
+    device is prefetched (copied to local scratch with a stager). Returns the number
+    of failed jobs.
+    """
+    prefetch = stager.prefetch if stager is not None else _prefetch
+    default_cap, caps = _device_caps(per_device)
+    queues = {}
+    for f, script in jobs:
+        queues.setdefault(f.stat().st_dev, deque()).append((f, script))
+    running = {dev: 0 for dev in queues}
+    failed = 0
+    done_count = 0
+    control = _governor.JobControl()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {}
+        while queues or futures:
+            # Fill free slots round-robin over devices that are under their cap
+            started = True
+            while started and len(futures) < workers:
+                started = False
+                for dev in list(queues):
+                    if len(futures) >= workers:
+                        break
+                    if running[dev] >= caps.get(dev, default_cap):
+                        continue
+                    f, script = queues[dev].popleft()
+                    if queues[dev]:
+                        prefetch(queues[dev][0][0])
+                    else:
+                        del queues[dev]
+                    running[dev] += 1
+                    futures[pool.submit(_run_one, action, script, f, control, stager)] = (f, dev)
+                    started = True
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                f, dev = futures.pop(future)
+                running[dev] -= 1
+                done_count += 1
+                error = future.result()
+                failed += bool(error)
+                print(f"[{done_count}/{len(jobs)}] {error or 'Done: ' + f.name}")
+    control.close()
+    return failed
+
+
+def make_stager(staging_mb=None):
+    """_staging.Stager sized by staging_mb, else config.json "staging_mb"; scratch in "staging_dir" or TEMP."""
+    import _staging
+    from _ffmpeg_config import _load_config
+    conf = _load_config()
+    if staging_mb is None:
+        staging_mb = conf.get("staging_mb", _staging.DEFAULT_LIMIT_MB)
+    return _staging.Stager(int(staging_mb) << 20, conf.get("staging_dir") or None)
+
+
+def run_batch(folder_path: Path, action: str, workers: int = 1, plan: bool = False, per_device=None,
+              staging: bool = False, staging_mb=None) -> None:
     if action not in ACTIONS:
         print(f"Unknown action: {action}")
         sys.exit(1)
-    exts, output_exists, script = ACTIONS[action]
     folder_path = folder_path.resolve()
     if not folder_path.is_dir():
         print(f"Not a directory: {folder_path}")
         sys.exit(1)
+    if plan:
+        plan_batch(folder_path, action, workers)
+        return
 
-    files = [f for f in folder_path.iterdir() if f.is_file() and f.suffix.lower() in exts]
-    to_process = [f for f in files if not output_exists(f)]
-    skipped = len(files) - len(to_process)
+    to_process, skipped = select_files(folder_path, action)
     if skipped:
-        print(f"Skipped {skipped} (output already exists).")
-    print(f"Processing {len(to_process)} file(s)...")
-    import subprocess
-    for i, f in enumerate(to_process, 1):
-        if action == "mp3":
-            script = MP3_SCRIPT_BY_EXT.get(f.suffix.lower())
-            if not script:
+        print(f"Skipped {len(skipped)} (output already exists).")
+    jobs = [(f, _script_for(action, f)) for f in to_process]
+    jobs = [(f, script) for f, script in jobs if script]
+    print(f"Processing {len(jobs)} file(s)...")
+    stager = make_stager(staging_mb) if staging else None
+    try:
+        run_jobs(action, jobs, workers, per_device, stager)
+    finally:
+        if stager is not None:
+            stager.close()
+    print("Batch finished.")
+
+
+# ZIP archive as input (see _archive): members of these actions are streamed into
+# the tool's stdin, since the tool reads a pipe without spooling it and writes
+# the same output as from a file. All other members (the silence tools cut a
+# file by stream copy) are extracted on demand into the bounded staging space.
+PIPE_ACTIONS = {"ogg"}
+
+
+def _piped(action: str, member) -> bool:
+    return action in PIPE_ACTIONS and not member.needs_file()
+
+
+def _run_member(action: str, script: Path, member, sink, stager, control):
+    """_run_one for an archive member; its outputs go to the sink. Returns None or an error message."""
+    piped = _piped(action, member)
+    job_dir = Path(tempfile.mkdtemp(prefix="member_", dir=stager.root)) if piped else None
+    try:
+        if piped:
+            src = job_dir / member.name
+            cmd = _tool_command(script, Path("-")) + ["-o", str(OUTPUTS[action](src)[0]), "--input-format", member.format]
+            control.run(cmd, feed=member.feed)
+        else:
+            src = stager.acquire(member)
+            control.run(_tool_command(script, src))
+        sink.put(OUTPUTS[action](src), member)
+    except subprocess.CalledProcessError as e:
+        return f"Failed: {member.arcname} - {e}"
+    except Exception as e:
+        return f"Error: {member.arcname} - {e}"
+    finally:
+        if piped:
+            shutil.rmtree(job_dir, ignore_errors=True)
+        else:
+            stager.release(member)
+    return None
+
+
+def run_member_jobs(action: str, jobs, sink, stager, workers: int = 1) -> int:
+    """
+    Run (member, script) jobs with at most `workers` at once. When a job starts, the
+    next member is extracted ahead if it needs a file. Returns the number of failed jobs.
+    """
+    pending = deque(jobs)
+    failed = 0
+    done_count = 0
+    control = _governor.JobControl()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {}
+        while pending or futures:
+            while pending and len(futures) < workers:
+                member, script = pending.popleft()
+                if pending and not _piped(action, pending[0][0]):
+                    stager.prefetch(pending[0][0])
+                futures[pool.submit(_run_member, action, script, member, sink, stager, control)] = member
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                member = futures.pop(future)
+                done_count += 1
+                error = future.result()
+                failed += bool(error)
+                print(f"[{done_count}/{len(jobs)}] {error or 'Done: ' + member.arcname}")
+    control.close()
+    return failed
+
+
+def run_archive_batch(archive: Path, action: str, workers: int = 1, output_zip=None, staging_mb=None) -> None:
+    import _archive
+    archive = archive.resolve()
+    if output_zip is not None and Path(output_zip).resolve() == archive:
+        print("--output-zip must be a different archive than the input.")
+        sys.exit(1)
+    members = _archive.list_members(archive, ACTIONS[action][0], GENERATED_SUFFIXES)
+    stager = make_stager(staging_mb)
+    try:
+        sink = _archive.ZipSink(output_zip) if output_zip else _archive.FolderSink(archive, stager)
+        todo = [m for m in members if not sink.is_done(ACTIONS[action][1], OUTPUTS[action], m)]
+        if len(todo) < len(members):
+            print(f"Skipped {len(members) - len(todo)} (output already exists).")
+        jobs = [(m, _script_for(action, Path(m.name))) for m in todo]
+        jobs = [(m, script) for m, script in jobs if script]
+        print(f"Processing {len(jobs)} archive member(s) from {archive.name} -> {sink}")
+        failed = run_member_jobs(action, jobs, sink, stager, workers)
+    finally:
+        stager.close()
+    print(f"Batch finished{f' ({failed} failed)' if failed else ''}.")
+
+
+# --pipeline: several dependent actions over one folder, e.g. mp3,remove_long_silence,split_on_silence.
+# Each stage runs on the previous stage's outputs (files, or the files inside an output folder).
+
+def parse_pipeline(spec: str) -> list:
+    """'mp3,remove_long_silence' -> ['mp3', 'remove_long_silence']; checks that each stage can feed the next."""
+    stages = [s.strip() for s in spec.split(",") if s.strip()]
+    if not stages:
+        raise ValueError("Empty --pipeline")
+    for action in stages:
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown action in --pipeline: {action}")
+    for action, next_action in zip(stages, stages[1:]):
+        next_exts = ACTIONS[next_action][0]
+        outputs = [out for ext in ACTIONS[action][0] for out in OUTPUTS[action](Path("x" + ext))]
+        # a suffix-less output is a folder of parts; its files are checked at run time
+        if not any(out.suffix.lower() in next_exts or not out.suffix for out in outputs):
+            raise ValueError(f"{action} produces nothing {next_action} can read")
+    return stages
+
+
+def parse_stage_workers(spec, stages, workers: int) -> dict:
+    """'mp3=2,split_on_silence=1' -> per-stage limits; unlisted stages get `workers`."""
+    limits = {action: workers for action in stages}
+    for item in filter(None, (s.strip() for s in (spec or "").split(","))):
+        name, _, value = item.partition("=")
+        if name not in limits:
+            raise ValueError(f"--stage-workers: {name} is not a pipeline stage")
+        limits[name] = max(1, int(value))
+    return limits
+
+
+def _stage_inputs(action: str, f: Path, next_action: str) -> list:
+    """Inputs for next_action produced by running action on f."""
+    exts = ACTIONS[next_action][0]
+    inputs = []
+    for out in OUTPUTS[action](f):
+        if out.is_dir():
+            inputs += sorted(p for p in out.iterdir() if p.is_file() and p.suffix.lower() in exts)
+        elif out.is_file() and out.suffix.lower() in exts:
+            inputs.append(out)
+    return inputs
+
+
+def run_pipeline_jobs(stages, files, workers: int = 1, stage_limits=None, per_device=None, stager=None) -> int:
+    """
+    Run every file through all stages as a DAG: a task (stage, file) is queued as
+    soon as its input exists, so file B converts while file A is already in a later
+    stage. At most `workers` tasks run at once, at most stage_limits[action] per stage
+    and the device cap per storage device. Later stages are started first, so files
+    finish early and intermediate outputs do not pile up. A task whose output already
+    exists (the action's skip rule) is skipped and its outputs are fed on directly.
+    Returns the number of failed tasks.
+    """
+    prefetch = stager.prefetch if stager is not None else _prefetch
+    stage_limits = stage_limits or {action: workers for action in stages}
+    default_cap, caps = _device_caps(per_device)
+    ready = [deque() for _ in stages]
+    running = [0] * len(stages)
+    device_running = {}
+    failed = 0
+    done_count = 0
+    skipped = 0
+
+    def enqueue(k, f):
+        nonlocal skipped
+        if not ACTIONS[stages[k]][1](f):
+            ready[k].append(f)
+            return
+        # already done: go straight to what this stage produced
+        skipped += 1
+        if k + 1 < len(stages):
+            for g in _stage_inputs(stages[k], f, stages[k + 1]):
+                enqueue(k + 1, g)
+
+    for f in files:
+        enqueue(0, f)
+
+    control = _governor.JobControl()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {}
+        while futures or any(ready):
+            # deepest stage first, then in queue order; respect stage and device caps
+            for k in reversed(range(len(stages))):
+                queue = ready[k]
+                for _ in range(len(queue)):
+                    if len(futures) >= workers or running[k] >= stage_limits[stages[k]]:
+                        break
+                    f = queue.popleft()
+                    dev = f.stat().st_dev
+                    if device_running.get(dev, 0) >= caps.get(dev, default_cap):
+                        queue.append(f)
+                        continue
+                    script = _script_for(stages[k], f)
+                    if not script:
+                        print(f"[{stages[k]}] No tool for {f.name}; skipped.")
+                        continue
+                    if queue:
+                        prefetch(queue[0])
+                    running[k] += 1
+                    device_running[dev] = device_running.get(dev, 0) + 1
+                    futures[pool.submit(_run_one, stages[k], script, f, control, stager)] = (k, f, dev)
+            if not futures:
+                break
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                k, f, dev = futures.pop(future)
+                running[k] -= 1
+                device_running[dev] -= 1
+                done_count += 1
+                error = future.result()
+                if error:
+                    failed += 1
+                    print(f"[{done_count}] [{stages[k]}] {error}")
+                    continue
+                print(f"[{done_count}] [{stages[k]}] Done: {f.name}")
+                if k + 1 < len(stages):
+                    for g in _stage_inputs(stages[k], f, stages[k + 1]):
+                        enqueue(k + 1, g)
+    control.close()
+    if skipped:
+        print(f"Skipped {skipped} stage run(s) (output already exists).")
+    return failed
+
+
+def run_pipeline_batch(folder_path: Path, stages, workers: int = 1, stage_limits=None, per_device=None,
+                       staging: bool = False, staging_mb=None) -> None:
+    folder_path = folder_path.resolve()
+    if not folder_path.is_dir():
+        print(f"Not a directory: {folder_path}")
+        sys.exit(1)
+    exts = ACTIONS[stages[0]][0]
+    files = sorted(f for f in folder_path.iterdir()
+                   if f.is_file() and f.suffix.lower() in exts and not f.stem.endswith(GENERATED_SUFFIXES))
+    print(f"Pipeline {' -> '.join(stages)} on {len(files)} file(s)...")
+    stager = make_stager(staging_mb) if staging else None
+    try:
+        failed = run_pipeline_jobs(stages, files, workers, stage_limits, per_device, stager)
+    finally:
+        if stager is not None:
+            stager.close()
+    print(f"Batch finished{f' ({failed} failed)' if failed else ''}.")
+
+
+# --watch: a new file is processed once its size and mtime have not changed for
+# this long (capture software may write in bursts); polling interval without inotify.
+WATCH_SETTLE_SECONDS = 5.0
+WATCH_POLL_SECONDS = 2.0
+# Stem suffixes written by the tools; never treated as new input
+GENERATED_SUFFIXES = ("_no_silence", "_no_long_silence", "_part1", "_part2")
+
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_EVENT = struct.Struct("iIII")
+
+
+class FolderWatcher:
+    """
+    Reports names of files created or changed in one folder. Uses inotify on Linux
+    (via ctypes, no extra package) and falls back to polling os.scandir elsewhere.
+    """
+
+    def __init__(self, folder: Path):
+        self.folder = folder
+        self._fd = None
+        self._seen = {}
+        try:
+            import ctypes
+            import ctypes.util
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK)
+            if fd >= 0:
+                mask = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+                if libc.inotify_add_watch(fd, str(folder).encode(), mask) >= 0:
+                    self._fd = fd
+                else:
+                    os.close(fd)
+        except (OSError, AttributeError):
+            pass
+        if self._fd is None:
+            self._scan()  # baseline, so only later changes are reported
+
+    @property
+    def mode(self):
+        return "inotify" if self._fd is not None else "polling"
+
+    def _scan(self):
+        changed = set()
+        try:
+            entries = list(os.scandir(self.folder))
+        except OSError:
+            return changed
+        for e in entries:
+            try:
+                if not e.is_file():
+                    continue
+                st = e.stat()
+            except OSError:
                 continue
+            sig = (st.st_size, st.st_mtime_ns)
+            if self._seen.get(e.name) != sig:
+                self._seen[e.name] = sig
+                changed.add(e.name)
+        return changed
+
+    def wait(self, timeout: float):
+        """Block up to timeout seconds; return the set of file names that changed."""
+        if self._fd is None:
+            time.sleep(timeout)
+            return self._scan()
+        import select
+        names = set()
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return names
         try:
-            subprocess.run([sys.executable, str(script), str(f)], check=True)
-            print(f"[{i}/{len(to_process)}] Done: {f.name}")
-        except subprocess.CalledProcessError as e:
-            print(f"[{i}/{len(to_process)}] Failed: {f.name} - {e}")
-        except Exception as e:
-            print(f"[{i}/{len(to_process)}] Error: {f.name} - {e}")
-    print("Batch finished.")
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return names
+        pos = 0
+        while pos + _IN_EVENT.size <= len(data):
+            _, _, _, length = _IN_EVENT.unpack_from(data, pos)
+            pos += _IN_EVENT.size
+            name = data[pos:pos + length].rstrip(b"\0")
+            pos += length
+            if name:
+                names.add(os.fsdecode(name))
+        return names
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def watch_folder(folder_path: Path, action: str, workers: int = 1,
+                 settle: float = WATCH_SETTLE_SECONDS, per_device=None,
+                 staging: bool = False, staging_mb=None) -> None:
+    """
+    Keep running: files already waiting are processed first, then every new input
+    is queued once it has been stable for `settle` seconds. Stop with Ctrl+C.
+    The folder is one device, so its device cap limits the parallel jobs too.
+    """
+    if action not in ACTIONS:
+        print(f"Unknown action: {action}")
+        sys.exit(1)
+    folder_path = folder_path.resolve()
+    if not folder_path.is_dir():
+        print(f"Not a directory: {folder_path}")
+        sys.exit(1)
+    exts, output_exists, _ = ACTIONS[action]
+    watcher = FolderWatcher(folder_path)
+    print(f"Watching {folder_path} for --action {action} ({watcher.mode}, settle {settle:g}s). Ctrl+C to stop.")
+
+    default_cap, caps = _device_caps(per_device)
+    workers = min(workers, caps.get(folder_path.stat().st_dev, default_cap))
+    pending = {}  # path -> ((size, mtime_ns), time the signature was first seen)
+    active = set()
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    control = _governor.JobControl()
+    stager = make_stager(staging_mb) if staging else None
+
+    def finished(future, f):
+        active.discard(f)
+        error = future.result()
+        print(error or f"Done: {f.name}")
+
+    def consider(f: Path):
+        if (f.suffix.lower() in exts and not f.stem.endswith(GENERATED_SUFFIXES)
+                and f not in active):
+            pending.setdefault(f, (None, 0.0))
+
+    to_process, _ = select_files(folder_path, action)
+    for f in to_process:
+        consider(f)
+    try:
+        while True:
+            for name in watcher.wait(min(WATCH_POLL_SECONDS, settle)):
+                consider(folder_path / name)
+            now = time.monotonic()
+            for f, (sig, since) in list(pending.items()):
+                try:
+                    st = f.stat()
+                except OSError:
+                    del pending[f]  # deleted or renamed away
+                    continue
+                current = (st.st_size, st.st_mtime_ns)
+                if current != sig:
+                    pending[f] = (current, now)
+                    continue
+                if now - since < settle:
+                    continue
+                del pending[f]
+                script = _script_for(action, f)
+                if not script or output_exists(f):
+                    continue
+                print(f"New file: {f.name}")
+                active.add(f)
+                pool.submit(_run_one, action, script, f, control, stager).add_done_callback(
+                    lambda fut, f=f: finished(fut, f))
+    except KeyboardInterrupt:
+        print("Stopping; waiting for running jobs...")
+    finally:
+        watcher.close()
+        control.close()
+        pool.shutdown(wait=True, cancel_futures=True)
+        if stager is not None:
+            stager.close()
 
 
 def main():
     setup_context_menu_log()
     ap = argparse.ArgumentParser(description="Batch convert files in folder (no interaction; skips existing output).")
-    ap.add_argument("folder", type=Path, help="Folder path")
-    ap.add_argument("--action", required=True, choices=list(ACTIONS), help="Action to run")
+    ap.add_argument("folder", type=Path, nargs="?", help="Folder path, or a .zip archive of input files")
+    ap.add_argument("--action", choices=list(ACTIONS), help="Action to run")
+    ap.add_argument("--pipeline", metavar="ACTIONS",
+                    help="Dependent actions run on each file in turn, e.g. mp3,remove_long_silence,split_on_silence")
+    ap.add_argument("--stage-workers", metavar="LIMITS",
+                    help="--pipeline: max parallel jobs per stage, e.g. mp3=2,split_on_silence=1 (default --workers)")
+    ap.add_argument("--workers", "-j", type=int, default=1, help="Files processed in parallel (default 1)")
+    ap.add_argument("--plan", action="store_true",
+                    help="Dry run: list files, predict wall time and output size from measured history")
+    ap.add_argument("--per-device", type=int, default=None,
+                    help=f"Max parallel files per storage device (default: config.json or {DEFAULT_DEVICE_CONCURRENCY})")
+    ap.add_argument("--staging", action="store_true",
+                    help="Copy each input to local scratch first and run the tools there (for network shares)")
+    ap.add_argument("--staging-mb", type=int, default=None,
+                    help="--staging: scratch space limit in MB (default: config.json or 4096)")
+    ap.add_argument("--output-zip", type=Path, metavar="ZIP",
+                    help="ZIP input: add outputs to this archive instead of writing them next to the input archive")
+    ap.add_argument("--watch", type=Path, metavar="FOLDER",
+                    help="Keep running and process new files in FOLDER as they land")
+    ap.add_argument("--settle", type=float, default=WATCH_SETTLE_SECONDS,
+                    help=f"--watch: seconds a file must stay unchanged before processing (default {WATCH_SETTLE_SECONDS:g})")
+    ap.add_argument("--priority", choices=_governor.PRIORITIES,
+                    help="CPU priority of the batch and its ffmpeg processes (default: config.json or low)")
+    ap.add_argument("--io-priority", choices=_governor.PRIORITIES, help="Disk I/O priority (Linux; default low)")
+    ap.add_argument("--cpus", help="Pin the batch to these CPUs, e.g. 0-3 or 0,2")
+    ap.add_argument("--threads", type=int, help="Max threads per ffmpeg job")
+    ap.add_argument("--pause", action="store_true", help="Pause running batches (suspends their ffmpeg jobs) and exit")
+    ap.add_argument("--resume", action="store_true", help="Resume paused batches and exit")
     args = ap.parse_args()
-    run_batch(args.folder, args.action)
+    if args.workers < 1:
+        ap.error("--workers must be at least 1")
+    if args.pause or args.resume:
+        if args.pause:
+            _governor.request_pause()
+            print("Pause requested.")
+        else:
+            _governor.request_resume()
+            print("Resume requested.")
+        return
+    if args.pipeline:
+        if args.action or args.watch or args.plan:
+            ap.error("--pipeline cannot be combined with --action, --watch or --plan")
+        try:
+            stages = parse_pipeline(args.pipeline)
+            stage_limits = parse_stage_workers(args.stage_workers, stages, args.workers)
+        except ValueError as e:
+            ap.error(str(e))
+    elif args.action is None:
+        ap.error("--action (or --pipeline) is required")
+    # Background batches yield to interactive work unless configured otherwise
+    _governor.apply(args.priority, args.io_priority, args.cpus, args.threads,
+                    defaults={"priority": "low", "io": "low"})
+    if args.watch:
+        watch_folder(args.watch, args.action, args.workers, args.settle, args.per_device,
+                     args.staging or args.staging_mb is not None, args.staging_mb)
+        return
+    if args.folder is None:
+        ap.error("folder is required (or use --watch FOLDER)")
+    if args.folder.is_file():
+        import _archive
+        if not _archive.is_archive(args.folder):
+            ap.error(f"not a folder or ZIP archive: {args.folder}")
+        if args.pipeline or args.plan:
+            ap.error("a ZIP input works with --action only (no --pipeline or --plan)")
+        run_archive_batch(args.folder, args.action, args.workers, args.output_zip, args.staging_mb)
+        return
+    if args.output_zip:
+        ap.error("--output-zip needs a ZIP archive as input")
+    if args.pipeline:
+        run_pipeline_batch(args.folder, stages, args.workers, stage_limits, args.per_device,
+                           args.staging or args.staging_mb is not None, args.staging_mb)
+        return
+    run_batch(args.folder, args.action, args.workers, args.plan, args.per_device,
+              args.staging or args.staging_mb is not None, args.staging_mb)
 
 
 if __name__ == "__main__":
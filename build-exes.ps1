@@ -58,6 +58,20 @@ if (-not $pyInstalled) {
     Write-Success "PyInstaller already installed."
 }
 
+Write-Status "Checking NumPy..."
+$npCheck = & $pythonExe -c "import numpy; print('yes')" 2>$null
+if ($npCheck -ne 'yes') {
+    Write-Status "Installing NumPy via pip..."
+    & $pythonExe -m pip install -r (Join-Path $PSScriptRoot "requirements.txt") --quiet 2>&1
+    if ($LASTEXITCODE -ne 0) {
+        Write-Warning "NumPy could not be installed; --mode vad and analyze will not be available in the EXEs."
+    } else {
+        Write-Success "NumPy installed."
+    }
+} else {
+    Write-Success "NumPy already installed."
+}
+
 $Scripts = @(
     @{Name="convert_mp4_to_mp3"; Source="convert-mp4-to-mp3/convert_mp4_to_mp3.py"}
     @{Name="convert_m4a_to_mp3"; Source="convert-m4a-to-mp3/convert_m4a_to_mp3.py"}
@@ -68,6 +82,22 @@ $Scripts = @(
     @{Name="remove_long_silence"; Source="remove-long-silence-mp3/remove_long_silence.py"}
     @{Name="split_on_silence"; Source="split-on-silence-mp3/split_on_silence.py"}
     @{Name="setup"; Source="setup.py"}
+    @{Name="mediatools"; Source="mediatools/mediatools.py"}
+)
+
+# mediatools imports each tool lazily by module name, so PyInstaller cannot see
+# them: add every tool folder to the search path and list the modules explicitly
+# (the folders and modules of _subcommands.SUBCOMMANDS).
+$MediatoolsModules = @(
+    @{Dir="convert-mp4-to-mp3"; Module="convert_mp4_to_mp3"}
+    @{Dir="convert-to-ogg"; Module="convert_to_ogg"}
+    @{Dir="split-mp4-middle"; Module="split_middle_overlap"}
+    @{Dir="remove-silence-mp3"; Module="remove_silence"}
+    @{Dir="remove-long-silence-mp3"; Module="remove_long_silence"}
+    @{Dir="split-on-silence-mp3"; Module="split_on_silence"}
+    @{Dir="media-pipeline"; Module="media_pipeline"}
+    @{Dir="analyze-audio"; Module="analyze_audio"}
+    @{Dir="batch-convert"; Module="batch_convert"}
 )
 
 Write-Status "Compiling scripts with PyInstaller (onefile mode)..."
@@ -84,7 +114,13 @@ foreach ($s in $Scripts) {
         continue
     }
     Write-Status "Compiling '$name'..."
-    $pyArgs = @("--onefile", "--distpath", $DistDir, "--specpath", $SpecDir, "--workpath", $BuildDir, "--paths", $RepoRoot, "--name", $name, "--noconfirm", "--log-level", "WARN", $source)
+    $pyArgs = @("--onefile", "--distpath", $DistDir, "--specpath", $SpecDir, "--workpath", $BuildDir, "--paths", $RepoRoot, "--name", $name, "--noconfirm", "--log-level", "WARN")
+    if ($name -eq "mediatools") {
+        foreach ($m in $MediatoolsModules) {
+            $pyArgs += @("--paths", (Join-Path $RepoRoot $m.Dir), "--hidden-import", $m.Module)
+        }
+    }
+    $pyArgs += $source
     & $pythonExe -m PyInstaller @pyArgs
     if ($LASTEXITCODE -ne 0) {
         throw "PyInstaller failed for $name"
@@ -136,6 +172,15 @@ Copy-Item (Join-Path $RepoRoot "install.bat") $DistDir -Force
 Copy-Item (Join-Path $RepoRoot "uninstall.bat") $DistDir -Force
 Write-Success "Copied install.bat + uninstall.bat"
 
+$MediatoolsExe = Join-Path $DistDir "mediatools.exe"
+if (Test-Path $MediatoolsExe) {
+    Write-Status "Measuring mediatools cold start..."
+    & $MediatoolsExe --bench-startup 3
+    if ($LASTEXITCODE -ne 0) {
+        Write-Warning "mediatools cold start is over budget (see above)."
+    }
+}
+
 Remove-Item -Path $BuildDir -Recurse -Force -ErrorAction SilentlyContinue
 Get-ChildItem -Path $RepoRoot -Filter "*.spec" | Remove-Item -Force -ErrorAction SilentlyContinue
 
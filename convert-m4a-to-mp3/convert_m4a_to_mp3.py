@@ -5,14 +5,56 @@ from pathlib import Path
 _root = Path(__file__).resolve().parent.parent
 if str(_root) not in sys.path:
     sys.path.insert(0, str(_root))
-from _ffmpeg_config import get_ffmpeg, setup_context_menu_log
+import _result_cache
+from _ffmpeg_config import encoder_thread_args, get_ffmpeg, setup_context_menu_log, thread_args
+from _governor import apply as apply_governor
+from _stdio import input_args, is_stream, needs_file, output_args, pop_option, spooled_input, stdout_is_data
 
-def convert_mp4_to_mp3(m4a_path):
-    mp3_path = m4a_path.rsplit('.', 1)[0] + '.mp3'
-    command = [get_ffmpeg(), '-i', m4a_path, mp3_path]
-    subprocess.run(command)
+USAGE = '''Usage: convert_m4a_to_mp3.py <file|-> [-o out.mp3|-] [--input-format FMT] [-j N]
 
-if __name__ == '__main__':
+  -j, --jobs N  Encode a long file as N time ranges in parallel (chunks of 5 min or more).
+                The joined MP3 is CBR without a Xing/LAME header and without the bit
+                reservoir: players do not trim the encoder's ~25 ms of leading silence
+                (no gapless info), and sharp attacks get slightly fewer bits.'''
+
+def convert_mp4_to_mp3(m4a_path, output=None, input_format='m4a', jobs=1):
+    if is_stream(m4a_path) and output is None:
+        print('Reading from stdin (-) needs an output: -o file.mp3 or -o -')
+        sys.exit(1)
+    mp3_path = output or m4a_path.rsplit('.', 1)[0] + '.mp3'
+    if is_stream(mp3_path):
+        stdout_is_data()
+    if needs_file(m4a_path, input_format):
+        # M4A cannot be demuxed from a pipe in general (index at the end)
+        with spooled_input(m4a_path, input_format) as src:
+            return convert_mp4_to_mp3(src, mp3_path, jobs=jobs)
+    cacheable = not is_stream(m4a_path) and not is_stream(mp3_path)
+    if cacheable and _result_cache.serve(m4a_path, 'mp3', {}, [mp3_path]):
+        print(f'Created (same content converted before): {mp3_path}')
+        return
+    if jobs > 1 and cacheable:
+        # Long file: encode time ranges in parallel and join them frame by frame
+        from _chunked import encode_mp3_chunked
+        if encode_mp3_chunked(m4a_path, mp3_path, jobs):
+            _result_cache.save(m4a_path, 'mp3', {}, [mp3_path])
+            return
+    command = [get_ffmpeg(), *thread_args(), *input_args(m4a_path, input_format), *encoder_thread_args(),
+               *output_args(mp3_path, '.mp3')]
+    if subprocess.run(command).returncode == 0 and cacheable:
+        _result_cache.save(m4a_path, 'mp3', {}, [mp3_path])
+
+def main():
     setup_context_menu_log()
-    m4a_file = sys.argv[1]
-    convert_mp4_to_mp3(m4a_file)
+    apply_governor()
+    args = sys.argv[1:]
+    if not args or args[0] in ('-h', '--help'):
+        print(USAGE)
+        sys.exit(0 if args else 1)
+    output = pop_option(args, '-o', '--output')
+    input_format = pop_option(args, '--input-format') or 'm4a'
+    jobs = int(pop_option(args, '-j', '--jobs') or 1)
+    m4a_file = args[0]
+    convert_mp4_to_mp3(m4a_file, output=output, input_format=input_format, jobs=jobs)
+
+if __name__ == '__main__':
+    main()
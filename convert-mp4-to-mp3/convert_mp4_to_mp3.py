@@ -5,14 +5,63 @@ from pathlib import Path
 _root = Path(__file__).resolve().parent.parent
 if str(_root) not in sys.path:
     sys.path.insert(0, str(_root))
-from _ffmpeg_config import get_ffmpeg, setup_context_menu_log
+import _result_cache
+from _ffmpeg_config import encoder_thread_args, get_ffmpeg, setup_context_menu_log, thread_args
+from _governor import apply as apply_governor
+from _stdio import input_args, is_stream, needs_file, output_args, pop_option, spooled_input, stdout_is_data
 
-def convert_mp4_to_mp3(mp4_path):
-    mp3_path = mp4_path.rsplit('.', 1)[0] + '.mp3'
-    command = [get_ffmpeg(), '-i', mp4_path, mp3_path]
-    subprocess.run(command)
+USAGE = '''Usage: convert_mp4_to_mp3.py <file|-> [-o out.mp3|-] [--input-format FMT] [-j N] [--normalize]
 
-if __name__ == '__main__':
+  -j, --jobs N  Encode a long file as N time ranges in parallel (chunks of 5 min or more).
+                The joined MP3 is CBR without a Xing/LAME header and without the bit
+                reservoir: players do not trim the encoder's ~25 ms of leading silence
+                (no gapless info), and sharp attacks get slightly fewer bits.'''
+
+def convert_mp4_to_mp3(mp4_path, normalize=False, output=None, input_format='mp4', jobs=1):
+    if is_stream(mp4_path) and output is None:
+        print('Reading from stdin (-) needs an output: -o file.mp3 or -o -')
+        sys.exit(1)
+    mp3_path = output or mp4_path.rsplit('.', 1)[0] + '.mp3'
+    if is_stream(mp3_path):
+        stdout_is_data()
+    if is_stream(mp4_path) and (normalize or needs_file(mp4_path, input_format)):
+        # Two-pass loudnorm and MP4 demuxing need a seekable file
+        with spooled_input(mp4_path, input_format) as src:
+            return convert_mp4_to_mp3(src, normalize, mp3_path, jobs=jobs)
+    params = {'normalize': True} if normalize else {}
+    cacheable = not is_stream(mp4_path) and not is_stream(mp3_path)
+    if cacheable and _result_cache.serve(mp4_path, 'mp3', params, [mp3_path]):
+        print(f'Created (same content converted before): {mp3_path}')
+        return
+    audio_args = []
+    if normalize:
+        from _loudnorm import loudnorm_filter
+        audio_args = ['-af', loudnorm_filter(mp4_path)]
+    if jobs > 1 and cacheable:
+        # Long file: encode time ranges in parallel and join them frame by frame
+        from _chunked import encode_mp3_chunked
+        if encode_mp3_chunked(mp4_path, mp3_path, jobs, audio_args):
+            _result_cache.save(mp4_path, 'mp3', params, [mp3_path])
+            return
+    command = [get_ffmpeg(), *thread_args(), *input_args(mp4_path, input_format), *audio_args]
+    command += encoder_thread_args() + output_args(mp3_path, '.mp3')
+    if subprocess.run(command).returncode == 0 and cacheable:
+        _result_cache.save(mp4_path, 'mp3', params, [mp3_path])
+
+def main():
     setup_context_menu_log()
-    mp4_file = sys.argv[1]
-    convert_mp4_to_mp3(mp4_file)
+    apply_governor()
+    args = sys.argv[1:]
+    if not args or args[0] in ('-h', '--help'):
+        print(USAGE)
+        sys.exit(0 if args else 1)
+    output = pop_option(args, '-o', '--output')
+    input_format = pop_option(args, '--input-format') or 'mp4'
+    jobs = int(pop_option(args, '-j', '--jobs') or 1)
+    normalize = '--normalize' in args
+    args = [a for a in args if a != '--normalize']
+    mp4_file = args[0]
+    convert_mp4_to_mp3(mp4_file, normalize=normalize, output=output, input_format=input_format, jobs=jobs)
+
+if __name__ == '__main__':
+    main()
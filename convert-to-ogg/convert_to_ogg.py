@@ -6,27 +6,62 @@ from pathlib import Path
 _root = Path(__file__).resolve().parent.parent
 if str(_root) not in sys.path:
     sys.path.insert(0, str(_root))
-from _ffmpeg_config import get_ffmpeg, setup_context_menu_log
+import _result_cache
+from _ffmpeg_config import encoder_thread_args, get_ffmpeg, setup_context_menu_log, thread_args
+from _governor import apply as apply_governor
+from _stdio import input_args, is_stream, needs_file, output_args, pop_option, spooled_input, stdout_is_data
 
 
-def convert_to_ogg(input_path: str) -> None:
-    out = Path(input_path).with_suffix(".ogg")
+def convert_to_ogg(input_path: str, normalize: bool = False, output: str = None, input_format: str = None) -> None:
+    if is_stream(input_path) and output is None:
+        print("Reading from stdin (-) needs an output: -o file.ogg or -o -")
+        sys.exit(1)
+    out = output or Path(input_path).with_suffix(".ogg")
+    if is_stream(out):
+        stdout_is_data()
+    if is_stream(input_path) and (normalize or needs_file(input_path, input_format)):
+        # Two-pass loudnorm and MP4/M4A demuxing need a seekable file
+        with spooled_input(input_path, input_format) as src:
+            return convert_to_ogg(src, normalize, out)
+    params = {"normalize": True} if normalize else {}
+    cacheable = not is_stream(input_path) and not is_stream(out)
+    if cacheable and _result_cache.serve(input_path, "ogg", params, [out]):
+        print(f"Created (same content converted before): {out}")
+        return
+    filters = []
+    if normalize:
+        from _loudnorm import loudnorm_filter
+        filters = ["-af", loudnorm_filter(input_path, sample_rate=None)]
     cmd = [
         get_ffmpeg(),
+        *thread_args(),
         "-y",
-        "-i", input_path,
+        *input_args(input_path, input_format),
+        *filters,
         "-c:a", "libvorbis",
         "-ar", "48000",
         "-q:a", "4",
-        str(out),
+        *encoder_thread_args(),
+        *output_args(str(out), ".ogg"),
     ]
     subprocess.run(cmd, check=True)
+    if cacheable:
+        _result_cache.save(input_path, "ogg", params, [out])
     print(f"Created: {out}")
 
 
-if __name__ == "__main__":
+def main():
     setup_context_menu_log()
-    if len(sys.argv) < 2:
-        print("Usage: convert_to_ogg.py <file>")
+    apply_governor()
+    args = sys.argv[1:]
+    output = pop_option(args, "-o", "--output")
+    input_format = pop_option(args, "--input-format")
+    args = [a for a in args if a != "--normalize"]
+    if not args:
+        print("Usage: convert_to_ogg.py <file|-> [-o out.ogg|-] [--input-format FMT] [--normalize]")
         sys.exit(1)
-    convert_to_ogg(sys.argv[1])
+    convert_to_ogg(args[0], normalize="--normalize" in sys.argv[1:], output=output, input_format=input_format)
+
+
+if __name__ == "__main__":
+    main()
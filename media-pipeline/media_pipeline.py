@@ -0,0 +1,235 @@
+"""
+Chained pipeline: convert + remove silence + split on silence in one go.
+
+    python media_pipeline.py video.mp4 --stages to-mp3,remove-long-silence,split-silence
+
+The sequential flow (convert_mp4_to_mp3 -> remove_silence -> split_on_silence)
+decodes the media three times and leaves a full .mp3 and a full _no_silence.mp3
+behind. Here silence is detected once on the decoded source, then a single
+ffmpeg run selects the kept audio, encodes it and (for split-silence) cuts the
+parts with the segment muxer. Only the final outputs are written; silence events
+come through a pipe.
+
+Stages (order-independent, optional "=seconds" sets the silence length):
+  to-mp3 | to-ogg              output codec (default: to-mp3)
+  remove-silence[=2]           cut out silences of 2s+
+  remove-long-silence[=5]      cut out silences of 5s+
+  split-silence[=2]            start a new part at every remaining silence of 2s+
+  normalize                    two-pass loudness normalization (cached measurement)
+
+"-" reads stdin / writes stdout (-o -). A plain conversion streams straight
+through ffmpeg; silence stages and normalize need the whole input first, so
+stdin is spooled to a temporary file for them. Split output is a folder (-o DIR).
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+from _ffmpeg_config import encoder_thread_args, get_ffmpeg, setup_context_menu_log, thread_args
+from _governor import apply as apply_governor
+from _silence import detect_silence, get_audio_duration, parse_threshold, silence_intervals
+from _stdio import input_args, is_stream, needs_file, output_args, spooled_input, stdout_is_data
+
+# codec stage -> (extension, ffmpeg encoder args); same settings as the single tools
+ENCODERS = {
+    "to-mp3": (".mp3", ["-c:a", "libmp3lame"]),
+    "to-ogg": (".ogg", ["-c:a", "libvorbis", "-ar", "48000", "-q:a", "4"]),
+}
+
+DEFAULT_STAGES = "to-mp3,remove-long-silence,split-silence"
+
+# silence stage -> default minimum silence length (s)
+SILENCE_STAGES = {
+    "remove-silence": 2.0,
+    "remove-long-silence": 5.0,
+    "split-silence": 2.0,
+}
+
+
+def parse_stages(spec):
+    """'to-mp3,remove-silence=3,split-silence' -> (codec, remove_d or None, split_d or None, normalize)."""
+    codec = "to-mp3"
+    remove_d = None
+    split_d = None
+    normalize = False
+    for item in filter(None, (s.strip() for s in spec.split(","))):
+        name, _, value = item.partition("=")
+        if name == "normalize":
+            normalize = True
+        elif name in ENCODERS:
+            codec = name
+        elif name in SILENCE_STAGES:
+            d = float(value) if value else SILENCE_STAGES[name]
+            if d <= 0:
+                raise ValueError(f"Silence length must be positive: {item}")
+            if name == "split-silence":
+                split_d = d
+            else:
+                remove_d = d if remove_d is None else min(remove_d, d)
+        else:
+            raise ValueError(f"Unknown stage: {name}")
+    return codec, remove_d, split_d, normalize
+
+
+def plan_parts(intervals, total_duration, remove_d, split_d):
+    """
+    Turn silence intervals into output parts, each a list of kept (start, end) ranges.
+    Mirrors running remove_* and then split_on_silence on its output: a silence long
+    enough to be removed is just cut out; a shorter one that still reaches split_d
+    is cut out and starts a new part; anything else stays in the audio.
+    """
+    parts = [[]]
+    pos = 0.0
+    for start, end in intervals:
+        length = end - start
+        removed = remove_d is not None and length >= remove_d
+        split = split_d is not None and length >= split_d and not removed
+        if not (removed or split):
+            continue
+        if start > pos:
+            parts[-1].append((pos, start))
+        if split and parts[-1]:
+            parts.append([])
+        pos = max(pos, end)
+    if pos < total_duration:
+        parts[-1].append((pos, total_duration))
+    return [p for p in parts if p]
+
+
+def run(cmd):
+    subprocess.run(cmd, check=True)
+
+
+def _select_expr(ranges, lo, hi):
+    """Binary search over the sorted kept ranges: ffmpeg evaluates only the taken if() branch."""
+    if hi - lo == 1:
+        start, end = ranges[lo]
+        return f"between(t,{start:.3f},{end:.3f})"
+    mid = (lo + hi) // 2
+    return f"if(lt(t,{ranges[mid][0]:.3f}),{_select_expr(ranges, lo, mid)},{_select_expr(ranges, mid, hi)})"
+
+
+def _select_filter(ranges):
+    return f"aselect='{_select_expr(ranges, 0, len(ranges))}',asetpts=N/SR/TB"
+
+
+@contextmanager
+def _filter_script(audio_filter):
+    """
+    The filter in a file for -filter_script: with thousands of kept ranges it is
+    far longer than a Windows command line (32767 characters).
+    """
+    fd, path = tempfile.mkstemp(suffix=".txt")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(audio_filter)
+        yield path
+    finally:
+        os.remove(path)
+
+
+def run_pipeline(input_path, stages=DEFAULT_STAGES, silence_threshold=-30, detect_jobs=1, output=None, input_format=None):
+    codec, remove_d, split_d, normalize = parse_stages(stages)
+    ext, encoder_args = ENCODERS[codec]
+    encoder_args = [*encoder_args, *encoder_thread_args()]
+    if is_stream(output):
+        if split_d is not None:
+            raise ValueError("split-silence writes a folder of parts; give -o DIR instead of -o -")
+        stdout_is_data()
+    if is_stream(input_path):
+        if output is None:
+            raise ValueError("Reading from stdin (-) needs -o (a file, a folder for split-silence, or -)")
+        silence = remove_d is not None or split_d is not None
+        if silence or normalize or needs_file(input_path, input_format):
+            with spooled_input(input_path, input_format) as src:
+                return run_pipeline(src, stages, silence_threshold, detect_jobs, output)
+    elif not os.path.exists(input_path):
+        print(f"File not found: {input_path}")
+        sys.exit(1)
+    if normalize:
+        from _loudnorm import SOURCE, loudnorm_filter
+        # to-ogg sets -ar 48000 itself
+        norm = loudnorm_filter(input_path, sample_rate=None if codec == "to-ogg" else SOURCE)
+    base = os.path.splitext(input_path)[0]
+    print(f"Input : {input_path}")
+    print(f"Stages: {codec}"
+          + (f", remove silence >= {remove_d}s" if remove_d else "")
+          + (f", split on silence >= {split_d}s" if split_d else "")
+          + (", normalize" if normalize else ""))
+
+    cmd = [get_ffmpeg(), *thread_args(), "-y", "-hide_banner", "-loglevel", "error",
+           *input_args(input_path, input_format), "-vn"]
+    if remove_d is None and split_d is None:
+        output = output or base + ext
+        run(cmd + (["-af", norm] if normalize else []) + encoder_args + output_args(output, ext))
+        print(f"Created: {output}")
+        return
+
+    detect_d = min(d for d in (remove_d, split_d) if d is not None)
+    starts, ends = detect_silence(input_path, detect_d, silence_threshold, jobs=detect_jobs)
+    total_duration = get_audio_duration(input_path)
+    parts = plan_parts(silence_intervals(starts, ends, total_duration), total_duration, remove_d, split_d)
+    if not parts:
+        print("The whole file is silence; nothing to write.")
+        sys.exit(1)
+
+    kept = [r for part in parts for r in part]
+    kept_duration = sum(end - start for start, end in kept)
+    print(f"Silences found: {len(starts)}, kept: {kept_duration:.2f}s of {total_duration:.2f}s")
+    audio_filter = _select_filter(kept) + (f",{norm}" if normalize else "")
+    with _filter_script(audio_filter) as script:
+        _encode_kept(cmd + ["-filter_script:a", script] + encoder_args, parts, base, ext, output, split_d)
+
+
+def _encode_kept(cmd, parts, base, ext, output, split_d):
+    """Run the select-and-encode command: one file, or the parts folder with split-silence."""
+    if split_d is None:
+        output = output or f"{base}_no_silence{ext}"
+        run(cmd + output_args(output, ext))
+        print(f"Created: {output}")
+        return
+
+    # Part boundaries on the output timeline (after removed audio is gone)
+    boundaries = []
+    t = 0.0
+    for part in parts[:-1]:
+        t += sum(end - start for start, end in part)
+        boundaries.append(f"{t:.3f}")
+    output_dir = output or f"{base}_parts"
+    os.makedirs(output_dir, exist_ok=True)
+    cmd += ["-f", "segment", "-reset_timestamps", "1", "-segment_start_number", "1"]
+    if boundaries:
+        cmd += ["-segment_times", ",".join(boundaries)]
+    run(cmd + [os.path.join(output_dir, f"part_%03d{ext}")])
+    print(f"Created {len(parts)} part(s) in: {output_dir}")
+
+
+def main():
+    setup_context_menu_log()
+    apply_governor()
+    ap = argparse.ArgumentParser(description="Convert, remove silence and split in one pass (no intermediate files).")
+    ap.add_argument("input", help="Input media file, or - for stdin")
+    ap.add_argument("-o", "--output", help="Output file (- for stdout), or the parts folder with split-silence")
+    ap.add_argument("--input-format", help="Input container when reading stdin (mp4, mp3, ...)")
+    ap.add_argument("--stages", default=DEFAULT_STAGES,
+                    help="Comma-separated stages, e.g. to-mp3,remove-long-silence=5,split-silence=2")
+    ap.add_argument("--threshold", type=parse_threshold, default=-30,
+                    help="Silence threshold in dB (default -30) or 'auto' (estimated from the noise floor)")
+    ap.add_argument("--detect-jobs", type=int, default=1, help="Parallel chunked silence detection with N processes")
+    args = ap.parse_args()
+    try:
+        run_pipeline(args.input, args.stages, args.threshold, args.detect_jobs, args.output, args.input_format)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
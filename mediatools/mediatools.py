@@ -0,0 +1,232 @@
+"""
+Single entry point for all tools: mediatools <subcommand> [args...]
+
+Only the module of the chosen subcommand is imported, so a right-click on
+"Convert to OGG" never pays for argparse/tempfile/re of the silence tools.
+Keep the top of this file free of heavy imports: it is on the cold-start path
+of every click.
+
+    mediatools to-mp3 video.mp4
+    mediatools split-silence audio.mp3 2.0
+    mediatools batch --action ogg "D:\\Videos"
+    mediatools --bench-startup 10
+    mediatools --check-coarse
+    mediatools --check-loudness
+"""
+import sys
+import os
+
+
+def _project_root():
+    if getattr(sys, "frozen", False):
+        return os.path.dirname(os.path.abspath(sys.executable))
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+if _project_root() not in sys.path:
+    sys.path.insert(0, _project_root())
+from _subcommands import SUBCOMMANDS
+
+# Cold start target for "mediatools <subcommand>" up to the tool's main(), in ms.
+# Override with "startup_budget_ms" in config.json.
+STARTUP_BUDGET_MS = 250
+
+# Files the --check-* commands use when none are given
+SAMPLE_MP3S = ("add-music-to-mp3/mp3/*.mp3", "add-music-to-mp3/*.mp3")
+# --check-coarse: (threshold dB, min silence s) pairs, boundary tolerance (s)
+COARSE_SETTINGS = ((-30, 0.5), (-45, 0.5), (-60, 1.0), (-30, 2.0))
+COARSE_TOLERANCE = 0.05
+# --check-loudness: LU between analyze-audio and ffmpeg ebur128 (which prints one decimal)
+LOUDNESS_TOLERANCE = 0.2
+
+
+def _load_tool(name):
+    """Import the module behind a subcommand (only that one)."""
+    folder, module, _ = SUBCOMMANDS[name]
+    root = _project_root()
+    for p in (root, os.path.join(root, folder)):
+        if p not in sys.path:
+            sys.path.insert(0, p)
+    import importlib
+    return importlib.import_module(module)
+
+
+def _usage():
+    lines = ["Usage: mediatools <subcommand> [args...]", "", "Subcommands:"]
+    for name, (_, _, text) in SUBCOMMANDS.items():
+        lines.append(f"  {name:<22}{text}")
+    lines.append("")
+    lines.append("  --version              Print version")
+    lines.append("  --bench-startup [N]    Measure cold start of every subcommand (N runs each)")
+    lines.append("  --check-coarse [MP3s]  Compare --mode coarse with the full silence pass")
+    lines.append("  --check-loudness [F..] Compare analyze-audio's loudness with ffmpeg ebur128")
+    return "\n".join(lines)
+
+
+def _startup_budget_ms():
+    root = _project_root()
+    if root not in sys.path:
+        sys.path.insert(0, root)
+    from _ffmpeg_config import _load_config
+    try:
+        return float(_load_config().get("startup_budget_ms", STARTUP_BUDGET_MS))
+    except (TypeError, ValueError):
+        return float(STARTUP_BUDGET_MS)
+
+
+def bench_startup(runs=5):
+    """
+    Spawn "mediatools --import-only <subcommand>" repeatedly and report the
+    median wall time against the startup budget. Returns exit code 0 when every
+    subcommand imports and is within budget, else 1.
+    """
+    import statistics
+    import subprocess
+    import time
+
+    if getattr(sys, "frozen", False):
+        base = [sys.executable]
+    else:
+        base = [sys.executable, os.path.abspath(__file__)]
+    budget = _startup_budget_ms()
+    print(f"Startup budget: {budget:.0f} ms (median of {runs} run(s))")
+    over = 0
+    for name in SUBCOMMANDS:
+        samples = []
+        try:
+            for _ in range(runs):
+                t0 = time.perf_counter()
+                subprocess.run(base + ["--import-only", name], check=True)
+                samples.append((time.perf_counter() - t0) * 1000.0)
+        except subprocess.CalledProcessError as e:
+            over += 1
+            print(f"  {name:<22}FAILED (import exited with {e.returncode})")
+            continue
+        median = statistics.median(samples)
+        status = "OK" if median <= budget else "OVER"
+        if median > budget:
+            over += 1
+        print(f"  {name:<22}{median:8.1f} ms  (min {min(samples):.1f})  {status}")
+    return 1 if over else 0
+
+
+def _sample_mp3s(root):
+    import glob
+
+    return sorted(p for pattern in SAMPLE_MP3S for p in glob.glob(os.path.join(root, pattern)))
+
+
+def _same_times(a, b):
+    return len(a) == len(b) and all(abs(x - y) <= COARSE_TOLERANCE for x, y in zip(a, b))
+
+
+def check_coarse(paths=None):
+    """
+    Run silence detection on each MP3 twice, the full silencedetect pass and
+    --mode coarse, for every COARSE_SETTINGS pair, and report where they
+    disagree by more than COARSE_TOLERANCE. Without paths the sample MP3s of
+    the repo are used. Returns exit code 0 when all agree, else 1.
+    """
+    import subprocess
+
+    from _silence import detect_silence
+
+    paths = paths or _sample_mp3s(_project_root())
+    if not paths:
+        print("No MP3 files to check.")
+        return 1
+    failed = 0
+    for path in paths:
+        for threshold, duration in COARSE_SETTINGS:
+            try:
+                full = detect_silence(path, duration, threshold)
+                coarse = detect_silence(path, duration, threshold, mode="coarse")
+            except (OSError, subprocess.CalledProcessError) as e:
+                print(f"  {os.path.basename(path)}: {e}")
+                return 1
+            same = _same_times(full[0], coarse[0]) and _same_times(full[1], coarse[1])
+            if not same:
+                failed += 1
+            status = "OK" if same else f"DIFF full {full} coarse {coarse}"
+            print(f"  {os.path.basename(path)} ({threshold} dB, {duration} s): {status}")
+    print(f"{failed} disagreement(s)")
+    return 1 if failed else 0
+
+
+def check_loudness(paths=None):
+    """
+    Integrated loudness of each file from analyze-audio (K-weighting applied in
+    the FFT domain, see _analysis) next to ffmpeg's ebur128 meter. Without paths
+    the sample MP3s of the repo are used. Returns exit code 0 when all are within
+    LOUDNESS_TOLERANCE, else 1.
+    """
+    import re
+    import subprocess
+
+    from _analysis import analyze
+    from _ffmpeg_config import get_ffmpeg
+
+    paths = paths or _sample_mp3s(_project_root())
+    if not paths:
+        print("No files to check.")
+        return 1
+    failed = 0
+    for path in paths:
+        cmd = [get_ffmpeg(), "-hide_banner", "-nostats", "-i", path, "-vn", "-af", "ebur128", "-f", "null", "-"]
+        try:
+            ours = analyze(path, thresholds=())["loudness"]["integrated"]
+            result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                    text=True, errors="replace", check=True)
+        except (OSError, RuntimeError, subprocess.CalledProcessError) as e:
+            print(f"  {os.path.basename(path)}: {e}")
+            return 1
+        # the summary printed last holds the integrated value
+        found = re.findall(r"I:\s+(-?[\d.]+) LUFS", result.stderr)
+        reference = float(found[-1]) if found else None
+        if ours is None or reference is None:
+            same = ours is None and reference in (None, -70.0)
+        else:
+            same = abs(ours - reference) <= LOUDNESS_TOLERANCE
+        if not same:
+            failed += 1
+        print(f"  {os.path.basename(path)}: analyze {ours} LUFS, ebur128 {reference} LUFS  {'OK' if same else 'DIFF'}")
+    print(f"{failed} disagreement(s)")
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] in ("-h", "--help"):
+        print(_usage())
+        return 0 if argv else 1
+    cmd = argv[0]
+    if cmd in ("-V", "--version"):
+        root = _project_root()
+        if root not in sys.path:
+            sys.path.insert(0, root)
+        from _ffmpeg_config import VERSION
+        print(f"mediatools {VERSION}")
+        return 0
+    if cmd == "--bench-startup":
+        runs = int(argv[1]) if len(argv) > 1 else 5
+        return bench_startup(runs)
+    if cmd == "--check-coarse":
+        return check_coarse(argv[1:])
+    if cmd == "--check-loudness":
+        return check_loudness(argv[1:])
+    if cmd == "--import-only":
+        _load_tool(argv[1])
+        return 0
+    if cmd not in SUBCOMMANDS:
+        print(f"Unknown subcommand: {cmd}\n")
+        print(_usage())
+        return 1
+    tool = _load_tool(cmd)
+    # Tools parse sys.argv themselves; present them their usual argv.
+    sys.argv = [f"mediatools {cmd}"] + argv[1:]
+    tool.main()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,20 @@
+import argparse
 import os
+import shutil
 import subprocess
 import sys
-import re
 import tempfile
 from pathlib import Path
 
 _root = Path(__file__).resolve().parent.parent
 if str(_root) not in sys.path:
     sys.path.insert(0, str(_root))
-from _ffmpeg_config import get_ffmpeg, get_ffprobe, setup_context_menu_log
+import _result_cache
+from _ffmpeg_config import encoder_thread_args, get_ffmpeg, setup_context_menu_log, thread_args
+from _governor import apply as apply_governor
+from _loudnorm import loudnorm_filter
+from _silence import MODES, SilenceScan, parse_threshold, remove_with_streams, shape_params
+from _stdio import STREAM, is_stream
 
 
 def run(cmd, capture_output=False):
@@ -24,64 +30,22 @@ def run(cmd, capture_output=False):
     return None
 
 
-def detect_silence(input_path, silence_duration=2.0, silence_threshold=-30):
-    """
-    تشخیص بخش‌های سکوت در فایل صوتی
-    silence_duration: حداقل مدت سکوت برای حذف (ثانیه)
-    silence_threshold: آستانه سکوت بر حسب dB (مثبت = سکوت)
-    """
-    cmd = [
-        get_ffmpeg(),
-        "-i", input_path,
-        "-af", f"silencedetect=noise={silence_threshold}dB:d={silence_duration}",
-        "-f", "null",
-        "-"
-    ]
-    
-    result = subprocess.run(
-        cmd,
-        capture_output=True,
-        text=True,
-        stderr=subprocess.STDOUT
-    )
-    
-    # استخراج نقاط شروع و پایان سکوت
-    silence_starts = []
-    silence_ends = []
-    
-    # الگو برای پیدا کردن silence_start و silence_end
-    start_pattern = r"silence_start: ([\d.]+)"
-    end_pattern = r"silence_end: ([\d.]+)"
-    
-    for line in result.stderr.split('\n'):
-        start_match = re.search(start_pattern, line)
-        if start_match:
-            silence_starts.append(float(start_match.group(1)))
-        
-        end_match = re.search(end_pattern, line)
-        if end_match:
-            silence_ends.append(float(end_match.group(1)))
-    
-    return silence_starts, silence_ends
-
-
-def get_audio_duration(input_path):
-    """دریافت مدت زمان فایل صوتی"""
-    cmd = [
-        get_ffprobe(),
-        "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        input_path
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-    return float(result.stdout.strip())
-
-
-def remove_silence(input_path, silence_duration=2.0):
+def remove_silence(input_path, silence_duration=2.0, detect_jobs=1, silence_threshold=-30, normalize=False, mode="level", output=None, input_format=None,
+                   pad=0.0, merge_gap=0.0, min_segment=0.0):
     """
     حذف سکوت‌های 2 ثانیه‌ای یا بیشتر از فایل صوتی
+    هر بخش غیر سکوت به محض تشخیص سکوت بعدی استخراج می‌شود،
+    در حالی که ffmpeg هنوز بقیه فایل را بررسی می‌کند
     """
+    if is_stream(input_path) or is_stream(output):
+        # ورودی/خروجی استاندارد (-): یک مرحله silenceremove روی pipe، یا از طریق فایل موقت
+        remove_with_streams(
+            lambda src, dst: remove_silence(src, silence_duration, detect_jobs, silence_threshold, normalize, mode, output=dst,
+                pad=pad, merge_gap=merge_gap, min_segment=min_segment),
+            input_path, output or STREAM, silence_duration, silence_threshold, normalize, mode, input_format,
+            shaped=bool(pad or merge_gap or min_segment),
+        )
+        return
     if not os.path.exists(input_path):
         print(f"فایل پیدا نشد: {input_path}")
         sys.exit(1)
@@ -89,87 +53,35 @@ def remove_silence(input_path, silence_duration=2.0):
     print(f"در حال پردازش: {input_path}")
     print(f"در حال جستجوی سکوت‌های {silence_duration} ثانیه‌ای یا بیشتر...")
     
-    # تشخیص سکوت‌ها
-    silence_starts, silence_ends = detect_silence(input_path, silence_duration)
-    
-    if not silence_starts:
-        print("سکوت‌ای پیدا نشد. فایل بدون تغییر کپی می‌شود.")
-        base, ext = os.path.splitext(input_path)
-        output_path = f"{base}_no_silence{ext}"
-        cmd = [
-            get_ffmpeg(),
-            "-y",
-            "-i", input_path,
-            "-c", "copy",
-            output_path
-        ]
-        run(cmd)
-        print(f"فایل خروجی: {output_path}")
+    base, ext = os.path.splitext(input_path)
+    output_path = output or f"{base}_no_silence{ext}"
+    params = {"silence_duration": silence_duration, "threshold": silence_threshold, "normalize": normalize}
+    if mode != "level":
+        params["mode"] = mode
+    shape_params(params, pad, merge_gap, min_segment)
+    if _result_cache.serve(input_path, "remove_silence", params, [output_path]):
+        # همین محتوا (با هر نامی) قبلاً با همین تنظیمات پردازش شده است
+        print(f"فایل خروجی (از نتایج قبلی): {output_path}")
         return
-
-    # دریافت مدت زمان کل فایل
-    total_duration = get_audio_duration(input_path)
-    
-    # ساخت لیست بخش‌های غیر سکوت
-    segments = []
-    current_pos = 0.0
-    
-    # اضافه کردن بخش‌های غیر سکوت
-    for i, silence_start in enumerate(silence_starts):
-        # اگر قبل از سکوت، بخش صوتی وجود دارد
-        if silence_start > current_pos:
-            segments.append((current_pos, silence_start))
-        
-        # به‌روزرسانی موقعیت فعلی به پایان سکوت
-        if i < len(silence_ends):
-            current_pos = silence_ends[i]
-        else:
-            current_pos = silence_start
-    
-    # اضافه کردن بخش آخر (اگر باقی مانده باشد)
-    if current_pos < total_duration:
-        segments.append((current_pos, total_duration))
-    
-    if not segments:
-        print("تمام فایل سکوت است!")
-        sys.exit(1)
-    
-    print(f"تعداد بخش‌های غیر سکوت پیدا شده: {len(segments)}")
-    
-    # اگر فقط یک بخش باشد، می‌توانیم مستقیماً کپی کنیم
-    if len(segments) == 1:
-        start, end = segments[0]
-        duration = end - start
-        base, ext = os.path.splitext(input_path)
-        output_path = f"{base}_no_silence{ext}"
-        
-        cmd = [
-            get_ffmpeg(),
-            "-y",
-            "-ss", str(start),
-            "-i", input_path,
-            "-t", str(duration),
-            "-c", "copy",
-            output_path
-        ]
-        run(cmd)
-        print(f"فایل خروجی: {output_path}")
-        return
-    
-    # برای چند بخش، باید آن‌ها را استخراج و به هم بچسبانیم
+    scan = SilenceScan(input_path, silence_duration, silence_threshold, jobs=detect_jobs, mode=mode)
+    # با نرمال‌سازی، چسباندن نهایی یک انکود با فیلتر loudnorm است (به جای کپی)
+    output_args = ["-af", loudnorm_filter(input_path), *encoder_thread_args()] if normalize else ["-c", "copy"]
     temp_dir = tempfile.mkdtemp()
     segment_files = []
     
     try:
-        # استخراج هر بخش
-        for i, (start, end) in enumerate(segments):
+        # استخراج هر بخش همزمان با ادامه تشخیص سکوت
+        for i, (start, end) in enumerate(scan.planned(pad, merge_gap, min_segment)):
             duration = end - start
-            segment_file = os.path.join(temp_dir, f"segment_{i:04d}.mp3")
+            segment_file = os.path.join(temp_dir, f"segment_{i:04d}{ext}")
             segment_files.append(segment_file)
             
             cmd = [
                 get_ffmpeg(),
+                *thread_args(),
                 "-y",
+                "-hide_banner",
+                "-loglevel", "error",
                 "-ss", str(start),
                 "-i", input_path,
                 "-t", str(duration),
@@ -178,6 +90,22 @@ def remove_silence(input_path, silence_duration=2.0):
             ]
             run(cmd)
         
+        if not segment_files:
+            print("تمام فایل سکوت است!")
+            sys.exit(1)
+        
+        if scan.silence_count == 0:
+            print("سکوت‌ای پیدا نشد. فایل بدون تغییر کپی می‌شود.")
+        else:
+            print(f"تعداد بخش‌های غیر سکوت پیدا شده: {len(segment_files)}")
+        
+        # اگر فقط یک بخش باشد، همان فایل خروجی است
+        if len(segment_files) == 1 and not normalize:
+            shutil.move(segment_files[0], output_path)
+            _result_cache.save(input_path, "remove_silence", params, [output_path])
+            print(f"فایل خروجی: {output_path}")
+            return
+        
         # ساخت فایل لیست برای concat
         concat_list = os.path.join(temp_dir, "concat_list.txt")
         with open(concat_list, 'w', encoding='utf-8') as f:
@@ -187,47 +115,66 @@ def remove_silence(input_path, silence_duration=2.0):
                 f.write(f"file '{abs_path}'\n")
         
         # چسباندن بخش‌ها
-        base, ext = os.path.splitext(input_path)
-        output_path = f"{base}_no_silence{ext}"
-        
         cmd = [
             get_ffmpeg(),
+            *thread_args(),
             "-y",
             "-f", "concat",
             "-safe", "0",
             "-i", concat_list,
-            "-c", "copy",
+            *output_args,
             output_path
         ]
         run(cmd)
+        _result_cache.save(input_path, "remove_silence", params, [output_path])
         
         print(f"فایل خروجی: {output_path}")
-        print(f"تعداد بخش‌های حذف شده: {len(silence_starts)}")
+        print(f"تعداد بخش‌های حذف شده: {scan.silence_count}")
         
     finally:
         # پاک کردن فایل‌های موقت
-        import shutil
         shutil.rmtree(temp_dir, ignore_errors=True)
 
 
 def main():
     setup_context_menu_log()
-    if len(sys.argv) < 2:
-        print("استفاده: python remove_silence.py <فایل_mp3>")
+    apply_governor()
+    ap = argparse.ArgumentParser(description="حذف سکوت‌های 2 ثانیه‌ای یا بیشتر")
+    ap.add_argument("input", help="فایل mp3 (- برای ورودی استاندارد)")
+    ap.add_argument("silence_duration", nargs="?", default="2.0", help="حداقل مدت سکوت (ثانیه، پیش‌فرض 2.0)")
+    ap.add_argument("-o", "--output", help="فایل خروجی (- برای خروجی استاندارد؛ پیش‌فرض کنار فایل ورودی)")
+    ap.add_argument("--input-format", help="قالب ورودی وقتی از - خوانده می‌شود (mp3، m4a، ...)")
+    ap.add_argument("--detect-jobs", type=int, default=1, help="تشخیص موازی سکوت با N پردازش (برای فایل‌های خیلی طولانی)")
+    ap.add_argument("--normalize", action="store_true", help="نرمال‌سازی بلندی صدا (loudnorm دو مرحله‌ای، اندازه‌گیری کش می‌شود)")
+    ap.add_argument("--threshold", default="-30", help="آستانه سکوت بر حسب dB یا auto (تخمین از کف نویز فایل)")
+    ap.add_argument("--mode", choices=MODES, default="level",
+                    help="level: سکوت بر اساس آستانه dB؛ vad: تشخیص گفتار (نویز، هوم و موسیقی زمینه هم حذف می‌شوند؛ نیاز به numpy)؛ "
+                         "coarse: مثل level ولی برای MP3 فقط بخش‌های احتمالاً ساکت decode می‌شوند (سریع‌تر)")
+    ap.add_argument("--pad", type=float, default=0.0, help="ثانیه سکوتی که دو طرف هر بخش نگه داشته می‌شود (پیش‌فرض 0)")
+    ap.add_argument("--merge-gap", type=float, default=0.0, help="بخش‌هایی که فاصله‌شان حداکثر این مقدار (ثانیه) است یکی می‌شوند")
+    ap.add_argument("--min-segment", type=float, default=0.0, help="بخش‌های کوتاه‌تر از این مقدار (ثانیه) نویز حساب و حذف می‌شوند")
+    args = ap.parse_args()
+    try:
+        silence_threshold = parse_threshold(args.threshold)
+    except ValueError:
+        print("آستانه نامعتبر است؛ یک عدد (dB) یا auto بدهید.")
         sys.exit(1)
     
-    input_file = sys.argv[1]
     silence_duration = 2.0  # حذف سکوت‌های 2 ثانیه‌ای یا بیشتر
-    
-    if len(sys.argv) >= 3:
-        try:
-            silence_duration = float(sys.argv[2])
-        except ValueError:
-            print("هشدار: مدت سکوت نامعتبر است. از مقدار پیش‌فرض 2.0 استفاده می‌شود.")
-    
-    remove_silence(input_file, silence_duration)
+    try:
+        silence_duration = float(args.silence_duration)
+    except ValueError:
+        print("هشدار: مدت سکوت نامعتبر است. از مقدار پیش‌فرض 2.0 استفاده می‌شود.")
+    
+    if args.mode == "vad":
+        from _vad import available
+        if not available():
+            print("حالت vad به numpy نیاز دارد: pip install numpy")
+            sys.exit(1)
+    
+    remove_silence(args.input, silence_duration, args.detect_jobs, silence_threshold=silence_threshold, normalize=args.normalize, mode=args.mode,
+        output=args.output, input_format=args.input_format, pad=args.pad, merge_gap=args.merge_gap, min_segment=args.min_segment)
 
 
 if __name__ == "__main__":
     main()
-
@@ -18,6 +18,7 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parent))
 from _ffmpeg_config import VERSION
+from _subcommands import subcommand_for
 
 # Scripts and dirs we expect under project root
 REQUIRED = [
@@ -30,10 +31,29 @@ REQUIRED = [
     "remove-silence-mp3/remove_silence.py",
     "remove-long-silence-mp3/remove_long_silence.py",
     "split-on-silence-mp3/split_on_silence.py",
+    "media-pipeline/media_pipeline.py",
+    "analyze-audio/analyze_audio.py",
+    "mediatools/mediatools.py",
     "_ffmpeg_config.py",
+    "_silence.py",
+    "_cache.py",
+    "_loudnorm.py",
+    "_checkpoint.py",
+    "_media_probe.py",
+    "_result_cache.py",
+    "_governor.py",
+    "_vad.py",
+    "_stdio.py",
+    "_chapters.py",
+    "_coarse.py",
+    "_chunked.py",
+    "_segments.py",
+    "_staging.py",
+    "_archive.py",
+    "_analysis.py",
+    "_subcommands.py",
 ]
 
-
 def _is_frozen():
     """Return True if running as a compiled PyInstaller EXE."""
     return getattr(sys, "frozen", False)
@@ -208,8 +228,14 @@ def main():
         p = script_dir / f"{name}.exe"
         return str(p) if p.exists() else ""
 
+    # One multi-tool EXE starts faster per click than a onefile EXE per tool
+    mediatools = exe_path("mediatools")
+
     def reg_cmd(target):
         """Generate the registry command value."""
+        sub = subcommand_for(Path(target).stem)
+        if is_frozen and mediatools and sub:
+            return f'\\"{esc(mediatools)}\\" \\"{sub}\\" \\"%1\\"'
         if is_frozen:
             # Point directly to the compiled EXE
             return f'\\"{esc(target)}\\" \\"%1\\"'
@@ -218,6 +244,8 @@ def main():
 
     def reg_cmd_dir(target, action):
         """Generate the registry command value for directory/batch actions."""
+        if is_frozen and mediatools:
+            return f'\\"{esc(mediatools)}\\" \\"batch\\" \\"--action\\" \\"{action}\\" \\"%1\\"'
         if is_frozen:
             return f'\\"{esc(target)}\\" \\"--action\\" \\"{action}\\" \\"%1\\"'
         else:
@@ -6,7 +6,14 @@ from pathlib import Path
 _root = Path(__file__).resolve().parent.parent
 if str(_root) not in sys.path:
     sys.path.insert(0, str(_root))
-from _ffmpeg_config import get_ffmpeg, get_ffprobe, setup_context_menu_log
+import _result_cache
+from _ffmpeg_config import get_ffmpeg, setup_context_menu_log
+from _governor import apply as apply_governor
+from _media_probe import MP4_EXTS, duration_seconds, mp4_keyframes
+from _stdio import is_stream, pop_option, spooled_input
+
+# Added to a keyframe time for -ss: far below one frame, above float/format rounding
+KEYFRAME_SEEK_EPSILON = 1e-4
 
 
 def run(cmd):
@@ -14,17 +21,8 @@ def run(cmd):
 
 
 def ffprobe_duration_seconds(input_path):
-    cmd = [
-        get_ffprobe(),
-        "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        "--",
-        input_path,
-    ]
-    result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-    s = (result.stdout or "").strip()
-    return float(s)
+    # MP3/MP4: read from the headers without starting ffprobe when they are conclusive
+    return duration_seconds(input_path)
 
 
 def format_hhmmss_mmm(seconds):
@@ -39,11 +37,27 @@ def format_hhmmss_mmm(seconds):
     return f"{h:02d}:{m:02d}:{s:02d}.{millis:03d}"
 
 
-def split_midpoint_with_overlap(input_path):
+def split_midpoint_with_overlap(input_path, output_prefix=None, input_format=None):
+    if is_stream(input_path):
+        # The duration is needed before cutting: spool stdin to a temporary file
+        if not output_prefix or not input_format:
+            print("Reading from stdin (-) needs -o PREFIX and --input-format (mp4, mp3, ...).")
+            sys.exit(1)
+        with spooled_input(input_path, input_format) as src:
+            split_midpoint_with_overlap(src, output_prefix)
+        return
     if not os.path.exists(input_path):
         print(f"File not found: {input_path}")
         sys.exit(1)
 
+    base, ext = os.path.splitext(input_path)
+    base = output_prefix or base
+    out1 = f"{base}_part1{ext}"
+    out2 = f"{base}_part2{ext}"
+    if _result_cache.serve(input_path, "split_midpoint", {}, [out1, out2]):
+        print(f"Same content was split before; reused: {out1}, {out2}")
+        return
+
     duration = ffprobe_duration_seconds(input_path)
     if duration <= 0:
         print("Media duration is zero or invalid.")
@@ -52,15 +66,25 @@ def split_midpoint_with_overlap(input_path):
     midpoint = duration / 2.0
     start2 = max(midpoint - 1.0, 0.0)
 
+    # Stream copy can only start part 2 on a keyframe; pick the one nearest the
+    # planned start and keep the 1s overlap, so the cut is exact and predictable.
+    keyframes = mp4_keyframes(input_path) if input_path.lower().endswith(MP4_EXTS) else None
+    if keyframes:
+        inner = [k for k in keyframes if 0.0 < k < duration] or [start2]
+        start2 = min(inner, key=lambda k: abs(k - start2))
+        midpoint = min(start2 + 1.0, duration)
+
     t1 = format_hhmmss_mmm(midpoint)
     ss2 = format_hhmmss_mmm(start2)
-
-    base, ext = os.path.splitext(input_path)
-    out1 = f"{base}_part1{ext}"
-    out2 = f"{base}_part2{ext}"
+    if keyframes:
+        # Seconds, not rounded to ms: a seek point even slightly before the
+        # keyframe would make ffmpeg start on the previous one.
+        ss2 = f"{start2 + KEYFRAME_SEEK_EPSILON:.6f}"
 
     print(f"Input : {input_path}")
     print(f"Duration: {duration:.3f}s, Midpoint: {midpoint:.3f}s, Part2 starts at: {start2:.3f}s")
+    if keyframes:
+        print("Cut aligned to a keyframe (exact stream copy).")
     print(f"Output1: {out1}")
     print(f"Output2: {out2}")
 
@@ -90,13 +114,17 @@ def split_midpoint_with_overlap(input_path):
     ]
     run(cmd2)
 
+    _result_cache.save(input_path, "split_midpoint", {}, [out1, out2])
     print("Done.")
 
 
 def main():
     setup_context_menu_log()
-    input_file = sys.argv[1]
-    split_midpoint_with_overlap(input_file)
+    apply_governor()
+    args = sys.argv[1:]
+    output_prefix = pop_option(args, "-o", "--output")
+    input_format = pop_option(args, "--input-format")
+    split_midpoint_with_overlap(args[0], output_prefix, input_format)
 
 
 if __name__ == "__main__":
@@ -1,13 +1,21 @@
+import argparse
 import os
 import subprocess
 import sys
-import re
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from pathlib import Path
 
 _root = Path(__file__).resolve().parent.parent
 if str(_root) not in sys.path:
     sys.path.insert(0, str(_root))
-from _ffmpeg_config import get_ffmpeg, get_ffprobe, setup_context_menu_log
+from _chapters import KINDS as VIRTUAL_KINDS, chapters_from_segments, output_path as chapters_path, write_chapters
+from _checkpoint import Checkpoint
+import _result_cache
+from _ffmpeg_config import encoder_thread_args, get_ffmpeg, setup_context_menu_log, thread_args
+from _governor import apply as apply_governor
+from _loudnorm import loudnorm_filter
+from _silence import MODES, SilenceScan, parse_threshold, shape_params
+from _stdio import is_stream, spooled_input
 
 
 def run(cmd, capture_output=False):
@@ -23,166 +31,262 @@ def run(cmd, capture_output=False):
     return None
 
 
-def detect_silence(input_path, silence_duration=2.0, silence_threshold=-30):
-    """
-    تشخیص بخش‌های سکوت در فایل صوتی
-    silence_duration: حداقل مدت سکوت برای تقسیم (ثانیه)
-    silence_threshold: آستانه سکوت بر حسب dB (مثبت = سکوت)
-    """
+def extract_part(input_path, start, end, output_file, audio_args=("-c", "copy")):
+    """استخراج یک قطعه؛ پیش‌فرض کپی مستقیم (بدون انکود مجدد)"""
     cmd = [
         get_ffmpeg(),
+        *thread_args(),
+        "-y",
+        "-hide_banner",
+        "-loglevel", "error",
+        "-ss", str(start),
         "-i", input_path,
-        "-af", f"silencedetect=noise={silence_threshold}dB:d={silence_duration}",
-        "-f", "null",
-        "-"
+        "-t", str(end - start),
+        *audio_args,
+        output_file
     ]
-    
-    result = subprocess.run(
-        cmd,
-        capture_output=True,
-        text=True,
-        stderr=subprocess.STDOUT
-    )
-    
-    # استخراج نقاط شروع و پایان سکوت
-    silence_starts = []
-    silence_ends = []
-    
-    # الگو برای پیدا کردن silence_start و silence_end
-    start_pattern = r"silence_start: ([\d.]+)"
-    end_pattern = r"silence_end: ([\d.]+)"
-    
-    for line in result.stderr.split('\n'):
-        start_match = re.search(start_pattern, line)
-        if start_match:
-            silence_starts.append(float(start_match.group(1)))
-        
-        end_match = re.search(end_pattern, line)
-        if end_match:
-            silence_ends.append(float(end_match.group(1)))
-    
-    return silence_starts, silence_ends
+    run(cmd)
 
 
-def get_audio_duration(input_path):
-    """دریافت مدت زمان فایل صوتی"""
-    cmd = [
-        get_ffprobe(),
-        "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        input_path
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-    return float(result.stdout.strip())
+def split_virtual(input_path, silence_duration=2.0, detect_jobs=1, silence_threshold=-30, mode="level", kind="cue",
+                  pad=0.0, merge_gap=0.0, min_segment=0.0):
+    """
+    تقسیم مجازی: به جای کپی کردن هر قطعه در یک فایل جدا، فقط نشانگر فصل‌ها
+    از همان فهرست قطعات نوشته می‌شود (cue، فایل ffmetadata یا فصل‌های
+    جاسازی‌شده در یک کپی remux شده از فایل؛ بدون انکود مجدد)
+    """
+    output_path = chapters_path(input_path, kind)
+    params = {"silence_duration": silence_duration, "threshold": silence_threshold, "normalize": False, "virtual": kind}
+    if mode != "level":
+        params["mode"] = mode
+    shape_params(params, pad, merge_gap, min_segment)
+    # cue و ffmetadata نام فایل را در خود دارند یا ارزان‌اند؛ فقط خروجی embed کش می‌شود
+    if kind == "embed" and _result_cache.serve(input_path, "split_on_silence", params, [output_path]):
+        print(f"فایل با فصل‌ها (از نتایج قبلی): {output_path}")
+        return
+    scan = SilenceScan(input_path, silence_duration, silence_threshold, jobs=detect_jobs, mode=mode)
+    segments = scan.segment_list(pad, merge_gap, min_segment)
+    if not segments:
+        print("هیچ بخش صوتی پیدا نشد! فایل ممکن است فقط سکوت باشد.")
+        sys.exit(1)
+    chapters = chapters_from_segments(segments, scan.total_duration)
+    write_chapters(kind, input_path, chapters, output_path)
+    if kind == "embed":
+        _result_cache.save(input_path, "split_on_silence", params, [output_path])
+    for i, (start, end, _) in enumerate(chapters, 1):
+        print(f"  فصل {i}: {start:.2f}s تا {end:.2f}s ({end - start:.2f}s)")
+    print(f"\n✓ تقسیم مجازی کامل شد! تعداد فصل‌ها: {len(chapters)}")
+    print(f"فایل خروجی: {output_path}")
 
 
-def split_on_silence(input_path, silence_duration=2.0):
+def split_on_silence(input_path, silence_duration=2.0, workers=None, detect_jobs=1, silence_threshold=-30, normalize=False, mode="level",
+                     output_dir=None, input_format=None, virtual=None, pad=0.0, merge_gap=0.0, min_segment=0.0):
     """
     تقسیم فایل صوتی به قطعات جداگانه بر اساس سکوت‌های 2 ثانیه‌ای یا بیشتر
     هر قطعه به عنوان یک فایل جداگانه ذخیره می‌شود
+    هر قطعه به محض تشخیص سکوت بعدی به صف استخراج اضافه می‌شود و
+    تا workers قطعه همزمان استخراج می‌شوند (پیش‌فرض: تعداد هسته‌ها).
+    شماره‌گذاری و گزارش پیشرفت به ترتیب قطعات است؛ با اولین خطا کار متوقف
+    و قطعات ناقص پاک می‌شوند.
+    برنامه قطعات و قطعات کامل‌شده در .checkpoint.json پوشه خروجی ثبت می‌شود؛
+    اجرای دوباره فقط قطعات ناموجود یا ناقص را می‌سازد.
+    ورودی - (ورودی استاندارد) اول در یک فایل موقت ذخیره می‌شود و output_dir لازم است.
+    virtual (cue/ffmetadata/embed) به جای فایل قطعات فقط فصل‌ها را می‌نویسد (split_virtual).
     """
+    if is_stream(input_path):
+        if virtual:
+            print("تقسیم مجازی به فایل ورودی واقعی نیاز دارد (فصل‌ها به همان فایل اشاره می‌کنند).")
+            sys.exit(1)
+        if not output_dir:
+            print("برای ورودی - پوشه خروجی را با --output-dir بدهید.")
+            sys.exit(1)
+        with spooled_input(input_path, input_format or "mp3") as src:
+            split_on_silence(src, silence_duration, workers, detect_jobs, silence_threshold, normalize, mode, output_dir,
+                             pad=pad, merge_gap=merge_gap, min_segment=min_segment)
+        return
     if not os.path.exists(input_path):
         print(f"فایل پیدا نشد: {input_path}")
         sys.exit(1)
     
+    if virtual:
+        print(f"در حال پردازش: {input_path}")
+        split_virtual(input_path, silence_duration, detect_jobs, silence_threshold, mode, virtual, pad, merge_gap, min_segment)
+        return
+    
+    workers = max(1, workers or os.cpu_count() or 1)
     print(f"در حال پردازش: {input_path}")
     print(f"در حال جستجوی سکوت‌های {silence_duration} ثانیه‌ای یا بیشتر برای تقسیم...")
     
-    # تشخیص سکوت‌ها
-    silence_starts, silence_ends = detect_silence(input_path, silence_duration)
-    
-    # دریافت مدت زمان کل فایل
-    total_duration = get_audio_duration(input_path)
-    
-    # ساخت لیست بخش‌های غیر سکوت (قطعات)
-    segments = []
-    current_pos = 0.0
-    
-    # اضافه کردن بخش‌های غیر سکوت
-    for i, silence_start in enumerate(silence_starts):
-        # اگر قبل از سکوت، بخش صوتی وجود دارد
-        if silence_start > current_pos:
-            segments.append((current_pos, silence_start))
-        
-        # به‌روزرسانی موقعیت فعلی به پایان سکوت
-        if i < len(silence_ends):
-            current_pos = silence_ends[i]
-        else:
-            current_pos = silence_start
-    
-    # اضافه کردن بخش آخر (اگر باقی مانده باشد)
-    if current_pos < total_duration:
-        segments.append((current_pos, total_duration))
-    
-    if not segments:
-        print("هیچ بخش صوتی پیدا نشد! فایل ممکن است فقط سکوت باشد.")
-        sys.exit(1)
-    
-    print(f"تعداد قطعات پیدا شده: {len(segments)}")
-    
     # ساخت پوشه خروجی
     base, ext = os.path.splitext(input_path)
-    output_dir = f"{base}_parts"
+    output_dir = output_dir or f"{base}_parts"
+    params = {"silence_duration": silence_duration, "threshold": silence_threshold, "normalize": normalize}
+    if mode != "level":
+        params["mode"] = mode
+    shape_params(params, pad, merge_gap, min_segment)
+    if _result_cache.serve(input_path, "split_on_silence", params, [output_dir]):
+        # همین محتوا (با هر نامی) قبلاً با همین تنظیمات تقسیم شده است
+        print(f"قطعات از نتایج قبلی ساخته شدند: {output_dir}")
+        return
     os.makedirs(output_dir, exist_ok=True)
     
     print(f"پوشه خروجی: {output_dir}")
-    print("\nدر حال استخراج قطعات...")
+    print(f"\nدر حال استخراج قطعات ({workers} همزمان)...")
     
-    # استخراج هر قطعه به عنوان فایل جداگانه
-    for i, (start, end) in enumerate(segments, 1):
-        duration = end - start
-        
-        # نام فایل خروجی با شماره ترتیب
-        output_file = os.path.join(output_dir, f"part_{i:03d}{ext}")
-        
-        print(f"  قطعه {i}/{len(segments)}: {start:.2f}s تا {end:.2f}s ({duration:.2f}s) -> {os.path.basename(output_file)}")
+    # با نرمال‌سازی هر قطعه با فیلتر loudnorm (بهره ثابت برای کل فایل) انکود می‌شود
+    audio_args = ("-af", loudnorm_filter(input_path), *encoder_thread_args()) if normalize else ("-c", "copy")
+    checkpoint = Checkpoint(output_dir, input_path, params)
+    scan = None
+    if checkpoint.plan_complete:
+        # برنامه قطعات از اجرای قبلی کامل است؛ تشخیص سکوت لازم نیست
+        print("ادامه اجرای قبلی از روی checkpoint...")
+        segments = checkpoint.segments
+    else:
+        scan = SilenceScan(input_path, silence_duration, silence_threshold, jobs=detect_jobs, mode=mode)
+        segments = scan.planned(pad, merge_gap, min_segment)
+    parts = []  # (شماره، شروع، پایان، فایل خروجی، future) به ترتیب
+    errors = []
+    reported = 0
+    reused = 0
+    
+    def report_finished():
+        # چاپ پیشرفت فقط به ترتیب شماره قطعات
+        nonlocal reported
+        while reported < len(parts) and parts[reported][4].done() and not parts[reported][4].exception():
+            i, start, end, output_file, _ = parts[reported]
+            print(f"  قطعه {i}: {start:.2f}s تا {end:.2f}s ({end - start:.2f}s) -> {os.path.basename(output_file)}")
+            reported += 1
+    
+    def on_done(future, i, output_file):
+        if future.cancelled():
+            return
+        if future.exception():
+            errors.append(future.exception())
+            return
+        try:
+            checkpoint.mark_done(i, output_file)
+        except OSError as e:
+            # ffmpeg خطایی نداد ولی فایل قطعه ساخته نشد
+            errors.append(e)
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            # استخراج هر قطعه همزمان با ادامه تشخیص سکوت
+            for i, (start, end) in enumerate(segments, 1):
+                if errors:
+                    break
+                # نام فایل خروجی با شماره ترتیب
+                output_file = os.path.join(output_dir, f"part_{i:03d}{ext}")
+                checkpoint.add_segment(i, start, end)
+                if checkpoint.part_ok(i, output_file):
+                    # قطعه در اجرای قبلی کامل ساخته شده است
+                    future = Future()
+                    future.set_result(None)
+                    reused += 1
+                else:
+                    future = pool.submit(extract_part, input_path, start, end, output_file, audio_args)
+                    future.add_done_callback(lambda f, i=i, o=output_file: on_done(f, i, o))
+                parts.append((i, start, end, output_file, future))
+                report_finished()
+            if scan is not None and not errors:
+                checkpoint.finish_plan(len(parts), scan.total_duration)
+            
+            pending = {p[4] for p in parts}
+            while pending and not errors:
+                _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                report_finished()
+        finally:
+            if errors:
+                for p in parts:
+                    p[4].cancel()
+    # پیشرفتی که هنوز در checkpoint نوشته نشده
+    checkpoint.flush()
         
-        cmd = [
-            get_ffmpeg(),
-            "-y",
-            "-hide_banner",
-            "-loglevel", "error",
-            "-ss", str(start),
-            "-i", input_path,
-            "-t", str(duration),
-            "-c", "copy",
-            output_file
-        ]
-        run(cmd)
+    if errors:
+        # پاک کردن قطعاتی که کامل نشده‌اند
+        for _, _, _, output_file, future in parts:
+            failed = future.cancelled() or future.exception() is not None
+            if failed and os.path.exists(output_file):
+                os.remove(output_file)
+        print(f"\n✗ خطا در استخراج قطعات: {errors[0]}")
+        print(f"قطعات ناقص پاک شدند؛ {reported} قطعه اول سالم است.")
+        print("با اجرای دوباره فقط قطعات باقی‌مانده ساخته می‌شوند.")
+        sys.exit(1)
+    
+    count = len(parts)
+    if count == 0:
+        print("هیچ بخش صوتی پیدا نشد! فایل ممکن است فقط سکوت باشد.")
+        checkpoint.remove()
+        if not os.listdir(output_dir):
+            os.rmdir(output_dir)
+        sys.exit(1)
     
+    checkpoint.mark_complete()
+    _result_cache.save(input_path, "split_on_silence", params, [output_dir])
+    if reused:
+        print(f"\n{reused} قطعه از اجرای قبلی سالم بود و دوباره ساخته نشد.")
+    total_duration = checkpoint.total_duration
+    total_segments_duration = sum(end - start for _, start, end, _, _ in parts)
     print(f"\n✓ تقسیم کامل شد!")
-    print(f"تعداد قطعات ساخته شده: {len(segments)}")
+    print(f"تعداد قطعات ساخته شده: {count}")
     print(f"مسیر پوشه خروجی: {output_dir}")
     print(f"مدت زمان کل فایل اصلی: {total_duration/60:.2f} دقیقه")
-    
-    # محاسبه مدت زمان کل قطعات
-    total_segments_duration = sum(end - start for start, end in segments)
     print(f"مدت زمان کل قطعات: {total_segments_duration/60:.2f} دقیقه")
 
 
 def main():
     setup_context_menu_log()
-    if len(sys.argv) < 2:
-        print("استفاده: python split_on_silence.py <فایل_mp3> [مدت_سکوت]")
-        print("مثال: python split_on_silence.py audio.mp3 2.0")
+    apply_governor()
+    ap = argparse.ArgumentParser(
+        description="تقسیم فایل صوتی بر اساس سکوت",
+        epilog="مثال: python split_on_silence.py audio.mp3 2.0 --workers 8",
+    )
+    ap.add_argument("input", help="فایل mp3 (- برای ورودی استاندارد)")
+    ap.add_argument("silence_duration", nargs="?", default="2.0", help="حداقل مدت سکوت (ثانیه، پیش‌فرض 2.0)")
+    ap.add_argument("--workers", "-j", type=int, default=None, help="تعداد استخراج همزمان (پیش‌فرض: تعداد هسته‌ها)")
+    ap.add_argument("--output-dir", help="پوشه قطعات (پیش‌فرض: <نام فایل>_parts؛ برای ورودی - لازم است)")
+    ap.add_argument("--input-format", help="قالب ورودی وقتی از - خوانده می‌شود (mp3، m4a، ...)")
+    ap.add_argument("--virtual", choices=VIRTUAL_KINDS,
+                    help="بدون ساختن فایل قطعات: cue (فایل .cue)، ffmetadata (فایل فصل‌ها) یا embed (یک کپی با فصل‌های جاسازی‌شده)")
+    ap.add_argument("--detect-jobs", type=int, default=1, help="تشخیص موازی سکوت با N پردازش (برای فایل‌های خیلی طولانی)")
+    ap.add_argument("--normalize", action="store_true", help="نرمال‌سازی بلندی صدا (loudnorm دو مرحله‌ای، اندازه‌گیری کش می‌شود)")
+    ap.add_argument("--threshold", default="-30", help="آستانه سکوت بر حسب dB یا auto (تخمین از کف نویز فایل)")
+    ap.add_argument("--mode", choices=MODES, default="level",
+                    help="level: سکوت بر اساس آستانه dB؛ vad: تشخیص گفتار (نویز، هوم و موسیقی زمینه هم حذف می‌شوند؛ نیاز به numpy)؛ "
+                         "coarse: مثل level ولی برای MP3 فقط بخش‌های احتمالاً ساکت decode می‌شوند (سریع‌تر)")
+    ap.add_argument("--pad", type=float, default=0.0, help="ثانیه سکوتی که دو طرف هر قطعه نگه داشته می‌شود (پیش‌فرض 0)")
+    ap.add_argument("--merge-gap", type=float, default=0.0, help="قطعه‌هایی که فاصله‌شان حداکثر این مقدار (ثانیه) است یکی می‌شوند")
+    ap.add_argument("--min-segment", type=float, default=0.0, help="قطعه‌های کوتاه‌تر از این مقدار (ثانیه) نویز حساب و حذف می‌شوند")
+    args = ap.parse_args()
+    try:
+        silence_threshold = parse_threshold(args.threshold)
+    except ValueError:
+        print("آستانه نامعتبر است؛ یک عدد (dB) یا auto بدهید.")
         sys.exit(1)
     
-    input_file = sys.argv[1]
     silence_duration = 2.0  # تقسیم بر اساس سکوت‌های 2 ثانیه‌ای یا بیشتر (پیش‌فرض)
+    try:
+        silence_duration = float(args.silence_duration)
+        if silence_duration < 0:
+            print("هشدار: مدت سکوت نمی‌تواند منفی باشد. از مقدار پیش‌فرض 2.0 استفاده می‌شود.")
+            silence_duration = 2.0
+    except ValueError:
+        print("هشدار: مدت سکوت نامعتبر است. از مقدار پیش‌فرض 2.0 استفاده می‌شود.")
     
-    if len(sys.argv) >= 3:
-        try:
-            silence_duration = float(sys.argv[2])
-            if silence_duration < 0:
-                print("هشدار: مدت سکوت نمی‌تواند منفی باشد. از مقدار پیش‌فرض 2.0 استفاده می‌شود.")
-                silence_duration = 2.0
-        except ValueError:
-            print("هشدار: مدت سکوت نامعتبر است. از مقدار پیش‌فرض 2.0 استفاده می‌شود.")
+    if args.virtual and args.normalize:
+        print("--normalize با --virtual کار نمی‌کند (تقسیم مجازی صدا را تغییر نمی‌دهد).")
+        sys.exit(1)
     
-    split_on_silence(input_file, silence_duration)
+    if args.mode == "vad":
+        from _vad import available
+        if not available():
+            print("حالت vad به numpy نیاز دارد: pip install numpy")
+            sys.exit(1)
+    
+    split_on_silence(args.input, silence_duration, args.workers, args.detect_jobs, silence_threshold=silence_threshold, normalize=args.normalize, mode=args.mode,
+        output_dir=args.output_dir, input_format=args.input_format, virtual=args.virtual,
+        pad=args.pad, merge_gap=args.merge_gap, min_segment=args.min_segment)
 
 
 if __name__ == "__main__":
     main()
-